@@ -1,7 +1,7 @@
 from PyQt5.QtCore import pyqtSignal
 from .BaseModel import BaseModel
 import os
-from Otherfunction import readmodel, singleimgcolor, trianglegoodobbox, pictureedgblack, twopicturedege, combineABC, fillwhite
+from Otherfunction import readmodel, pipelinetrace, trianglegoodobbox, pictureedgblack, twopicturedege, combineABC, fillwhite
 import vtk
 
 class AipredictOBBModel(BaseModel):
@@ -17,6 +17,11 @@ class AipredictOBBModel(BaseModel):
         self.lower_opacity = 1.0  # 下顎模型透明度，預設為不透明
         self.output_folder = ""  # 輸出文件夾路徑
         self.angle = 0  # 模型旋轉角度
+        self.inference_backend = "tf"  # GAN推論後端（"tf" 或 "onnx"）
+        self.intra_op_threads = 0  # 推論的intra-op執行緒數（0 表示由執行環境決定）
+        self.inference_cache_dir = ""  # GAN推論快取資料夾（空字串時使用輸出文件夾下的 gan_cache，未設定輸出文件夾時使用使用者快取資料夾）
+        self.inference_cache_size = 512 * 1024 * 1024  # 推論快取容量上限（位元組），0 表示停用快取
+        self.enable_profiling = False  # 是否以 cProfile 剖析 AI 預測流程（計時報告一律輸出）
 
     # 設置參考文件（上顎或下顎）
     def set_reference_file(self, file_path, position_type):
@@ -47,74 +52,94 @@ class AipredictOBBModel(BaseModel):
         base_name = os.path.splitext(os.path.basename(image_file_cleaned))[0]
         base_name_up = os.path.splitext(os.path.basename(upimage_file_cleaned))[0]
         
-        renderer.ResetCamera()  # 重置攝像機
-        renderer.GetRenderWindow().Render()  # 渲染窗口
-        renderer.GetRenderWindow().SetSize(256, 256)  # 設置渲染窗口大小為256x256
-        self.lower_file_modify = self.output_folder + "/" + base_name + "_modtify.ply"  # 修改後的下顎文件路徑
+        tracer = pipelinetrace.PipelineTracer(base_name, self.enable_profiling).start()  # 各階段計時（可選 cProfile）
+        try:
+            renderer.ResetCamera()  # 重置攝像機
+            renderer.GetRenderWindow().Render()  # 渲染窗口
+            renderer.GetRenderWindow().SetSize(256, 256)  # 設置渲染窗口大小為256x256
+            self.lower_file_modify = self.output_folder + "/" + base_name + "_modtify.ply"  # 修改後的下顎文件路徑
 
-        # 根據是否有上下顎文件執行不同邏輯
-        if self.lower_file and self.output_folder and self.model_folder and self.upper_file:
-            # 處理上下顎都存在的情況
-            self.upper_opacity = 0  # 隱藏上顎
-            self.upper_actor.GetProperty().SetOpacity(self.upper_opacity)
-            # 生成下顎的深度圖（使用OBB方法）
-            output_file_path_down = self.combine_three_depth_obb(renderer,base_name)
-            self.upper_opacity = 1  # 顯示上顎
-            self.lower_opacity = 0  # 隱藏下顎
-            self.upper_actor.GetProperty().SetOpacity(self.upper_opacity)
-            self.lower_actor.GetProperty().SetOpacity(self.lower_opacity)
-            # 生成上顎的深度圖（使用OBB方法）
-            output_file_path_up = self.combine_three_depth_obb(renderer,base_name_up)
-            # 標記邊界點（上顎用黃色，下顎用預設顏色）
-            pictureedgblack.mark_boundary_points(output_file_path_up, self.output_folder + "/edgeUp", color=(255, 255, 0))
-            pictureedgblack.mark_boundary_points(output_file_path_down, self.output_folder + "/edgeDown")
-            # 合併上下顎邊界圖，並匯出第三張咬合間隙的圖
-            twopicturedege.combine_image(
-                self.output_folder + "/edgeDown/" + base_name + "down",
-                self.output_folder + "/edgeUp/" + base_name_up,
-                self.output_folder + "/combinetwoedge/",
-                output_file_path_down,
-                output_file_path_up
-            )
-            predictthree_pic = self.output_folder + "/predict.png"  # 預測圖路徑
-            # 合併三張圖片（上下顎深度圖與邊界圖）
-            combineABC.merge_images(output_file_path_down, output_file_path_up, 
-                                    self.output_folder + "/combinetwoedge/" + base_name + "down.png", 
-                                    predictthree_pic)
-            output_file_path_ai = self.output_folder + '/ai_' + base_name + ".png"  # AI生成圖路徑
-            # 使用GAN模型生成AI深度圖
-            singleimgcolor.apply_gan_model(self.model_folder, predictthree_pic, output_file_path_ai)
-            output_stl_path = self.output_folder + '/ai_' + base_name + ".stl"  # STL文件路徑
-            self.upper_opacity = 0  # 隱藏上顎
-            self.lower_opacity = 1  # 顯示下顎
-            self.upper_actor.GetProperty().SetOpacity(self.upper_opacity)
-            self.lower_actor.GetProperty().SetOpacity(self.lower_opacity)
-            self.SaveDownAsPLY( self.lower_file_modify)  # 保存當前渲染為PLY文件
-            # 使用OBB重建器生成3D模型
-            reconstructor = trianglegoodobbox.DentalModelReconstructor(output_file_path_ai, self.lower_file_modify, output_stl_path)
-            reconstructor.reconstruct()
-            smoothed_stl_path = self.output_folder + '/ai_' + base_name + "_smooth.stl"  # 平滑後STL路徑
-            self.smooth_stl(output_stl_path, smoothed_stl_path)  # 平滑處理STL模型
-            readmodel.render_file_in_second_window(render2, smoothed_stl_path)  # 在第二窗口渲染平滑後模型
+            # 根據是否有上下顎文件執行不同邏輯
+            if self.lower_file and self.output_folder and self.model_folder and self.upper_file:
+                # 處理上下顎都存在的情況
+                self.upper_opacity = 0  # 隱藏上顎
+                self.upper_actor.GetProperty().SetOpacity(self.upper_opacity)
+                # 生成下顎的深度圖（使用OBB方法）
+                with tracer.span("depth_capture_down"):
+                    output_file_path_down = self.combine_three_depth_obb(renderer,base_name)
+                self.upper_opacity = 1  # 顯示上顎
+                self.lower_opacity = 0  # 隱藏下顎
+                self.upper_actor.GetProperty().SetOpacity(self.upper_opacity)
+                self.lower_actor.GetProperty().SetOpacity(self.lower_opacity)
+                # 生成上顎的深度圖（使用OBB方法）
+                with tracer.span("depth_capture_up"):
+                    output_file_path_up = self.combine_three_depth_obb(renderer,base_name_up)
+                # 標記邊界點（上顎用黃色，下顎用預設顏色）
+                with tracer.span("edge_marking"):
+                    pictureedgblack.mark_boundary_points(output_file_path_up, self.output_folder + "/edgeUp", color=(255, 255, 0))
+                    pictureedgblack.mark_boundary_points(output_file_path_down, self.output_folder + "/edgeDown")
+                # 合併上下顎邊界圖，並匯出第三張咬合間隙的圖
+                with tracer.span("twopicturedege"):
+                    twopicturedege.combine_image(
+                        self.output_folder + "/edgeDown/" + base_name + "down",
+                        self.output_folder + "/edgeUp/" + base_name_up,
+                        self.output_folder + "/combinetwoedge/",
+                        output_file_path_down,
+                        output_file_path_up
+                    )
+                predictthree_pic = self.output_folder + "/predict.png"  # 預測圖路徑
+                # 合併三張圖片（上下顎深度圖與邊界圖）
+                with tracer.span("merge_images"):
+                    predict_array = combineABC.merge_images(output_file_path_down, output_file_path_up, 
+                                                            self.output_folder + "/combinetwoedge/" + base_name + "down.png", 
+                                                            predictthree_pic)
+                output_file_path_ai = self.output_folder + '/ai_' + base_name + ".png"  # AI生成圖路徑
+                # 使用GAN模型生成AI深度圖（拼接陣列直接送入模型，不再讀回 PNG）
+                with tracer.span("gan_inference"):
+                    self.predict_ai_depth(predict_array, output_file_path_ai)
+                output_stl_path = self.output_folder + '/ai_' + base_name + ".stl"  # STL文件路徑
+                self.upper_opacity = 0  # 隱藏上顎
+                self.lower_opacity = 1  # 顯示下顎
+                self.upper_actor.GetProperty().SetOpacity(self.upper_opacity)
+                self.lower_actor.GetProperty().SetOpacity(self.lower_opacity)
+                with tracer.span("export_ply"):
+                    self.SaveDownAsPLY( self.lower_file_modify)  # 保存當前渲染為PLY文件
+                # 使用OBB重建器生成3D模型
+                with tracer.span("reconstruction"):
+                    reconstructor = trianglegoodobbox.DentalModelReconstructor(output_file_path_ai, self.lower_file_modify, output_stl_path)
+                    reconstructor.reconstruct()
+                smoothed_stl_path = self.output_folder + '/ai_' + base_name + "_smooth.stl"  # 平滑後STL路徑
+                with tracer.span("smooth_stl"):
+                    self.smooth_stl(output_stl_path, smoothed_stl_path)  # 平滑處理STL模型
+                with tracer.span("render_result"):
+                    readmodel.render_file_in_second_window(render2, smoothed_stl_path)  # 在第二窗口渲染平滑後模型
 
-        elif self.lower_file and self.output_folder and self.model_folder:
-            # 僅處理下顎的情況
-            self.upper_opacity = 0  # 隱藏上顎（如果存在）
-            # 保存深度圖
-            output_file_path = self.save_depth_map(renderer)
-            output_file_path_ai = self.output_folder + '/ai_' + base_name + ".png"  # AI生成圖路徑
-            # 使用GAN模型生成AI深度圖
-            singleimgcolor.apply_gan_model(self.model_folder, output_file_path, output_file_path_ai)
-            output_stl_path = self.output_folder + '/ai_' + base_name + ".stl"  # STL文件路徑
-            self.SaveDownAsPLY(self.lower_file_modify)  # 保存當前渲染為PLY文件
-            # 使用OBB重建器生成3D模型
-            reconstructor = trianglegoodobbox.DentalModelReconstructor(output_file_path_ai, self.lower_file_modify, output_stl_path)
-            reconstructor.reconstruct()
-            smoothed_stl_path = self.output_folder + '/ai_' + base_name + "_smooth.stl"  # 平滑後STL路徑
-            self.smooth_stl(output_stl_path, smoothed_stl_path)  # 平滑處理STL模型
-            readmodel.render_file_in_second_window(render2, smoothed_stl_path)  # 在第二窗口渲染平滑後模型
+            elif self.lower_file and self.output_folder and self.model_folder:
+                # 僅處理下顎的情況
+                self.upper_opacity = 0  # 隱藏上顎（如果存在）
+                # 保存深度圖
+                with tracer.span("depth_capture"):
+                    output_file_path = self.save_depth_map(renderer)
+                output_file_path_ai = self.output_folder + '/ai_' + base_name + ".png"  # AI生成圖路徑
+                # 使用GAN模型生成AI深度圖
+                with tracer.span("gan_inference"):
+                    self.predict_ai_depth(output_file_path, output_file_path_ai)
+                output_stl_path = self.output_folder + '/ai_' + base_name + ".stl"  # STL文件路徑
+                with tracer.span("export_ply"):
+                    self.SaveDownAsPLY(self.lower_file_modify)  # 保存當前渲染為PLY文件
+                # 使用OBB重建器生成3D模型
+                with tracer.span("reconstruction"):
+                    reconstructor = trianglegoodobbox.DentalModelReconstructor(output_file_path_ai, self.lower_file_modify, output_stl_path)
+                    reconstructor.reconstruct()
+                smoothed_stl_path = self.output_folder + '/ai_' + base_name + "_smooth.stl"  # 平滑後STL路徑
+                with tracer.span("smooth_stl"):
+                    self.smooth_stl(output_stl_path, smoothed_stl_path)  # 平滑處理STL模型
+                with tracer.span("render_result"):
+                    readmodel.render_file_in_second_window(render2, smoothed_stl_path)  # 在第二窗口渲染平滑後模型
 
-        # self.model_updated.emit()  # 發送信號通知模型已更新
+            # self.model_updated.emit()  # 發送信號通知模型已更新
+        finally:
+            self.finish_trace(tracer)  # 輸出計時報告（某個階段失敗時也會停止 cProfile 並寫出報告）
         renderer.GetRenderWindow().SetSize(768, 768)  # 恢復渲染窗口大小為768x768
         return True
 
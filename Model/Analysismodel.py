@@ -52,10 +52,12 @@ class AnalysisModel(BaseModel):
         r_value = os.path.basename(os.path.normpath(self.result_file))
         # 定義輸出文件路徑（以修復圖檔名稱為基礎的txt文件）
         output_folder = os.path.join(self.output_folder, f"{r_value}.txt")
-        # 調用 elismated.cal_all 計算所有分析數值並保存
+        # 調用 elismated.cal_all 計算所有分析數值並保存（逐筆記錄於 CSV，重跑時只計算新增或修改過的圖檔）
+        store_path = os.path.join(self.output_folder, f"{r_value}_metrics.csv")
         elismated.cal_all(self.groudtruth_file, self.result_file,
-                          output_folder, self.mask_file)
+                          output_folder, self.mask_file, store_path=store_path)
         # 調用 compare.compare_image_folders 比較圖像資料夾並保存結果
         compare.compare_image_folders(self.groudtruth_file, self.result_file,
-                                      self.output_folder, image_size=(256, 256))
+                                      self.output_folder, image_size=(256, 256),
+                                      mask_folder=self.mask_file or None)
         return True  # 返回True表示操作完成（未檢查實際執行結果）
\ No newline at end of file
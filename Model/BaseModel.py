@@ -5,9 +5,11 @@
 # ✔ 控制 PyQt 與 VTK 的渲染同步，支援 UI 即時更新
 # ✔ 進行前處理（例如填充白色背景、影像邊界處理）
 # ✔ 重置模型狀態（方便切換病例或重新處理）
+# ✔ 透過可插拔的推論後端（TensorFlow 會話 / ONNX Runtime）執行 GAN 預測
 from PyQt5.QtCore import QObject
 import os
-from Otherfunction import readmodel, pictureedgblack, fillwhite, trianglegoodobbox  # 匯入外部模組
+from Otherfunction import readmodel, pictureedgblack, fillwhite, trianglegoodobbox, ganbackend, gancache  # 匯入外部模組
+import cv2
 
 class BaseModel(QObject):
     """
@@ -165,6 +167,61 @@ class BaseModel(QObject):
         fillwhite.process_image_pair(bound_image, output_file_path, output_file_path)
         return output_file_path
 
+    # ------------------------------
+    # AI 推論
+    # ------------------------------
+    def predict_ai_depth(self, input_image, output_file_path):
+        """
+        以設定的推論後端（self.inference_backend）執行 GAN，並將結果保存為深度圖。
+        input_image 可為 OpenCV 陣列或圖像路徑；返回灰階深度圖陣列。
+        若輸入與檢查點都未改變，直接從推論快取讀回結果而不重新推論。
+        """
+        if isinstance(input_image, str):
+            input_path = input_image
+            input_image = cv2.imread(input_path, cv2.IMREAD_UNCHANGED)
+            if input_image is None:
+                raise ValueError(f"Failed to read input image: {input_path}")
+
+        cache = self._get_inference_cache()
+        key = None
+        if cache is not None:
+            checkpoint_id = ganbackend.checkpoint_identity(self.model_folder, self.inference_backend)
+            key = gancache.InferenceCache.make_key(input_image, checkpoint_id)
+            ai_image = cache.get(key)
+            if ai_image is not None:  # 命中快取，略過推論
+                cv2.imwrite(output_file_path, ai_image)
+                return ai_image
+
+        backend = ganbackend.get_backend(self.model_folder, self.inference_backend, self.intra_op_threads)
+        ai_image = backend.predict(input_image)
+        if cache is not None:
+            cache.put(key, ai_image)
+        cv2.imwrite(output_file_path, ai_image)  # 保存AI深度圖供重建器使用
+        return ai_image
+
+    def finish_trace(self, tracer):
+        """結束 AI 預測流程的計時，於輸出資料夾寫出 <檔名>_timing.json 並印出各階段耗時；呼叫端應放在 finally 中，確保例外時也會停止 cProfile"""
+        tracer.stop()
+        self.last_trace = tracer  # 保留最近一次的計時結果，供 UI 或批次腳本讀取
+        if self.output_folder:
+            report_path = tracer.write_report(os.path.join(self.output_folder, "timing"))
+            print(f"已輸出計時報告: {report_path}")
+        print(tracer.format_table())
+
+    def _get_inference_cache(self):
+        """回傳推論快取（未設定資料夾時放在輸出資料夾下的 gan_cache，輸出資料夾也未設定時放在使用者快取資料夾，不寫入目前工作目錄）；inference_cache_size 為 0 時停用"""
+        if not getattr(self, 'inference_cache_size', 0):
+            return None
+        cache_dir = getattr(self, 'inference_cache_dir', '')
+        if not cache_dir:
+            cache_dir = os.path.join(self.output_folder, "gan_cache") if self.output_folder else ganbackend.user_cache_dir("gan_cache")
+        cache = getattr(self, '_inference_cache', None)
+        if cache is None or cache.cache_dir != cache_dir:
+            cache = gancache.InferenceCache(cache_dir, self.inference_cache_size)
+            self._inference_cache = cache
+        cache.max_bytes = self.inference_cache_size
+        return cache
+
     def set_output_folder(self, folder_path):
         """設定輸出結果的資料夾"""
         if os.path.isdir(folder_path):
@@ -10,6 +10,8 @@ def merge_images(image_A, image_B, image_C, output_path):
         image_B: 第二張圖像的路徑
         image_C: 第三張圖像的路徑
         output_path: 輸出拼接圖像的保存路徑
+    返回:
+        拼接後的 NumPy 陣列（OpenCV 排列），可直接傳給 `singleimgcolor.apply_gan_model_array`
     """
     # 讀取三張圖像，保留原始通道（包括透明度）
     im_A = cv2.imread(image_A, cv2.IMREAD_UNCHANGED)
@@ -33,6 +35,7 @@ def merge_images(image_A, image_B, image_C, output_path):
     # 保存拼接後的圖像到指定路徑
     cv2.imwrite(output_path, im_ABC)
     print(f"Saved merged image at {output_path}")  # 打印保存成功的訊息
+    return im_ABC  # 返回拼接結果，避免後續再讀回 PNG
 
 # # 示例用法
 # image_A = "path/to/image_A.png"
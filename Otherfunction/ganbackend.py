@@ -0,0 +1,303 @@
+# 主要目的：此程式碼提供可插拔的 GAN 推論後端，讓 AI 預測流程不必每次推論都重新建立 TensorFlow 1.x 會話。`TFSessionBackend` 只載入一次檢查點並保留會話；`OnnxBackend` 會把 `model_folder` 中的檢查點凍結並轉換為 ONNX（只轉換一次，結果快取在使用者快取資料夾 `user_cache_dir` 中，不寫入可能唯讀的模型資料夾），之後以 ONNX Runtime 在 CPU 上執行，不需匯入 TensorFlow。兩者都可設定 intra-op 執行緒數，並透過 `get_backend` 依（模型資料夾、後端、執行緒數）重複使用，檢查點識別（路徑與修改時間）改變時重建。`compare_backends` 用於比對兩個後端在樣本深度圖上的輸出差異，並依最大絕對差與 PSNR 門檻判定轉換是否通過。
+
+import os  # 導入 os 模組，用於檔案路徑操作。
+import re  # 導入 re 模組，用於解析 checkpoint 檔案。
+import abc  # 導入 abc 模組，用於定義後端的抽象介面。
+import hashlib  # 導入 hashlib，用於以模型資料夾路徑命名轉換結果。
+import cv2  # 導入 OpenCV，用於色彩空間轉換。
+import numpy as np  # 導入 NumPy 庫，用於數值運算和陣列處理。
+
+_BACKENDS = {}  # 已建立的後端快取，鍵為 (模型資料夾, 後端名稱, 執行緒數)。
+
+def user_cache_dir(*parts):  # 取得使用者層級的快取資料夾。
+    """
+    返回使用者快取資料夾下的子資料夾（Windows 為 %LOCALAPPDATA%，其他系統為 $XDG_CACHE_HOME 或 ~/.cache），不存在時建立。
+
+    參數:
+        parts: 字串，子資料夾名稱（例如 "onnx"）。
+
+    返回:
+        字串，快取資料夾路徑。
+    """
+    base = os.environ.get("LOCALAPPDATA") if os.name == "nt" else os.environ.get("XDG_CACHE_HOME")
+    path = os.path.join(base or os.path.join(os.path.expanduser("~"), ".cache"), "pyqt5_dental", *parts)
+    os.makedirs(path, exist_ok=True)  # 確保快取資料夾存在。
+    return path
+
+def latest_checkpoint(model_dir):  # 不依賴 TensorFlow 讀取最新檢查點路徑。
+    """
+    解析模型資料夾中的 `checkpoint` 檔案，取得最新檢查點的路徑。
+
+    參數:
+        model_dir: 字串，包含匯出檢查點的模型資料夾。
+
+    返回:
+        字串，最新檢查點的路徑前綴（例如 `.../export.ckpt`）；找不到時返回 None。
+    """
+    state_file = os.path.join(model_dir, "checkpoint")  # TensorFlow 的檢查點狀態檔。
+    if not os.path.exists(state_file):  # 沒有狀態檔時無法判斷最新檢查點。
+        return None
+    with open(state_file, "r", encoding="utf-8") as f:  # 讀取狀態檔。
+        match = re.search(r'^model_checkpoint_path:\s*"(.*)"', f.read(), re.MULTILINE)  # 找出最新檢查點名稱。
+    if not match:  # 格式不符。
+        return None
+    checkpoint_path = match.group(1)  # 可能是相對或絕對路徑。
+    if not os.path.isabs(checkpoint_path):  # 相對路徑以模型資料夾為基準。
+        checkpoint_path = os.path.join(model_dir, checkpoint_path)
+    if not os.path.exists(checkpoint_path + ".index") and not os.path.exists(checkpoint_path + ".meta"):  # 檢查點檔案不存在（資料夾被搬移時常見）。
+        checkpoint_path = os.path.join(model_dir, os.path.basename(checkpoint_path))  # 改在模型資料夾內尋找。
+    return checkpoint_path
+
+def checkpoint_mtime(checkpoint_path):  # 取得檢查點檔案的修改時間，用於判斷轉換結果是否過期。
+    for suffix in (".index", ".meta"):  # 依序檢查索引檔與圖結構檔。
+        if os.path.exists(checkpoint_path + suffix):
+            return os.path.getmtime(checkpoint_path + suffix)
+    return 0.0
+
+def checkpoint_identity(model_dir, backend="tf"):  # 以檢查點路徑、修改時間與後端組成模型識別（供推論快取使用）。
+    """
+    不載入模型即可取得的檢查點識別；檢查點更新或改用其他後端時識別會改變。
+
+    參數:
+        model_dir: 字串，包含匯出檢查點的模型資料夾。
+        backend: 字串，推論後端名稱。
+
+    返回:
+        字串，例如 "/models/gan/export.ckpt|1718000000.0|tf"。
+    """
+    checkpoint_path = latest_checkpoint(model_dir)  # 最新檢查點。
+    if checkpoint_path is None:  # 沒有 checkpoint 狀態檔時，以資料夾內最新檔案的時間代替。
+        mtimes = [os.path.getmtime(os.path.join(model_dir, name)) for name in os.listdir(model_dir)]
+        return f"{os.path.abspath(model_dir)}|{max(mtimes, default=0.0)}|{backend}"
+    return f"{os.path.abspath(checkpoint_path)}|{checkpoint_mtime(checkpoint_path)}|{backend}"
+
+def find_generator_tensors(graph, scope="generator"):  # 找出生成器子圖的浮點輸入與輸出張量。
+    """
+    在 pix2pix 匯出的圖中找出生成器範圍（scope）對外的輸入與輸出張量。
+
+    參數:
+        graph: tf.Graph，已載入 .meta 的計算圖。
+        scope: 字串，生成器的變數範圍名稱，預設為 "generator"。
+
+    返回:
+        (input_tensor, output_tensor): 生成器的輸入與輸出，皆為 [0, 1] 的 NHWC 浮點影像（pix2pix 的 preprocess/deprocess 位於該範圍內）。
+    """
+    prefix = scope + "/"  # 範圍前綴。
+    inputs, outputs = {}, {}  # 以張量名稱去重。
+    for op in graph.get_operations():  # 走訪圖中所有節點。
+        inside = op.name.startswith(prefix)  # 節點是否位於生成器內。
+        for tensor in op.inputs:  # 檢查每個輸入張量。
+            if tensor.dtype.name != "float32" or tensor.shape.ndims != 4:  # 只考慮 NHWC 浮點影像（排除變數參照）。
+                continue
+            tensor_inside = tensor.op.name.startswith(prefix)  # 張量是否由生成器產生。
+            if inside and not tensor_inside:  # 由外部流入生成器。
+                inputs[tensor.name] = tensor
+            elif not inside and tensor_inside and not op.name.startswith("save"):  # 由生成器流出（排除存檔節點）。
+                outputs[tensor.name] = tensor
+    if len(inputs) != 1 or len(outputs) != 1:  # 無法唯一確定時拋出錯誤。
+        raise ValueError(f"Cannot locate generator tensors in scope '{scope}': inputs={list(inputs)}, outputs={list(outputs)}")
+    return next(iter(inputs.values())), next(iter(outputs.values()))
+
+def convert_checkpoint_to_onnx(model_dir, onnx_path, scope="generator", opset=13):  # 將檢查點轉換為 ONNX 模型。
+    """
+    凍結模型資料夾中的最新檢查點，只保留生成器子圖，並轉換為 ONNX 檔案。
+
+    參數:
+        model_dir: 字串，包含匯出檢查點的模型資料夾。
+        onnx_path: 字串，輸出的 ONNX 檔案路徑。
+        scope: 字串，生成器的變數範圍名稱。
+        opset: 整數，ONNX opset 版本。
+    """
+    try:
+        import tf2onnx  # ONNX 轉換工具（僅轉換時需要）。
+    except ImportError as e:
+        print(f"Error importing tf2onnx: {e}")
+        print("Install tf2onnx: python -m pip install tf2onnx onnxruntime")
+        raise
+    from .singleimgcolor import tf  # 使用 TensorFlow 1.x 兼容模式（僅轉換時匯入）。
+
+    checkpoint_path = latest_checkpoint(model_dir) or tf.train.latest_checkpoint(model_dir)  # 最新檢查點。
+    if not checkpoint_path:  # 檢查是否存在檢查點。
+        raise ValueError(f"No checkpoint found in {model_dir}")
+
+    # 載入並凍結生成器
+    graph = tf.Graph()  # 使用獨立的圖，避免污染預設圖。
+    with graph.as_default(), tf.Session(graph=graph) as sess:
+        saver = tf.train.import_meta_graph(checkpoint_path + ".meta", clear_devices=True)  # 導入圖結構。
+        saver.restore(sess, checkpoint_path)  # 恢復權重。
+        gen_input, gen_output = find_generator_tensors(graph, scope)  # 生成器的輸入與輸出。
+        frozen = tf.graph_util.convert_variables_to_constants(sess, graph.as_graph_def(), [gen_output.op.name])  # 將變數凍結為常數。
+
+    # 以 placeholder 取代生成器輸入，去除 base64/PNG 解碼等前處理節點
+    sub_graph = tf.Graph()
+    with sub_graph.as_default():
+        placeholder = tf.placeholder(tf.float32, shape=gen_input.shape, name="gan_input")  # 新的數值輸入。
+        tf.import_graph_def(frozen, input_map={gen_input.name: placeholder}, name="")  # 重新導入並接上 placeholder。
+    graph_def = tf.graph_util.extract_sub_graph(sub_graph.as_graph_def(), [gen_output.op.name])  # 只保留輸出所需的節點。
+
+    # 轉換為 ONNX
+    tf2onnx.convert.from_graph_def(graph_def, input_names=["gan_input:0"], output_names=[gen_output.name],
+                                   opset=opset, output_path=onnx_path)
+    print(f"已將檢查點轉換為 ONNX: {onnx_path}")
+
+def _to_rgb(image):  # 將 OpenCV 讀取的陣列轉為 3 通道 RGB（對應圖中的通道處理）。
+    if image.ndim == 2:  # 灰階轉 RGB。
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    if image.shape[2] == 1:  # 單通道轉 RGB。
+        return cv2.cvtColor(image[:, :, 0], cv2.COLOR_GRAY2RGB)
+    if image.shape[2] == 4:  # 去除透明通道。
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2RGB)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)  # BGR 轉 RGB。
+
+class GanBackend(abc.ABC):
+    """GAN 推論後端的共同介面：`predict` 接收 OpenCV 排列的 uint8 陣列，返回灰階 uint8 深度圖。"""
+
+    name = ""  # 後端名稱。
+
+    def __init__(self, model_dir, intra_op_threads=0):  # 初始化共同屬性。
+        self.model_dir = model_dir  # 模型資料夾。
+        self.intra_op_threads = intra_op_threads  # intra-op 執行緒數（0 表示由執行環境決定）。
+        self.checkpoint_path = latest_checkpoint(model_dir)  # 最新檢查點。
+        self.identity = checkpoint_identity(model_dir, self.name)  # 建立時的檢查點識別（路徑與修改時間），用於判斷是否需要重建。
+
+    @abc.abstractmethod
+    def predict(self, input_image):  # 執行推論（子類別必須實作）。
+        pass
+
+    def close(self):  # 釋放資源。
+        pass
+
+class TFSessionBackend(GanBackend):
+    """以 TensorFlow 1.x 會話執行推論；檢查點只載入一次，之後重複使用同一會話。"""
+
+    name = "tf"
+
+    def __init__(self, model_dir, intra_op_threads=0):
+        super().__init__(model_dir, intra_op_threads)
+        from . import singleimgcolor  # 延遲匯入 TensorFlow。
+        self._singleimgcolor = singleimgcolor
+        tf = singleimgcolor.tf
+        if not self.checkpoint_path:  # 讀不到 checkpoint 檔時交給 TensorFlow 判斷。
+            self.checkpoint_path = tf.train.latest_checkpoint(model_dir)
+        if not self.checkpoint_path:  # 檢查是否存在檢查點。
+            raise ValueError(f"No checkpoint found in {model_dir}")
+
+        config = tf.ConfigProto(intra_op_parallelism_threads=intra_op_threads)  # 設定 intra-op 執行緒數。
+        self.graph = tf.Graph()  # 獨立的圖。
+        with self.graph.as_default():
+            saver = tf.train.import_meta_graph(self.checkpoint_path + ".meta")  # 導入圖結構。
+            self.sess = tf.Session(graph=self.graph, config=config)  # 建立持久會話。
+            saver.restore(self.sess, self.checkpoint_path)  # 恢復權重。
+
+    def predict(self, input_image):
+        return self._singleimgcolor.run_session(self.sess, input_image)  # 重複使用已載入的會話。
+
+    def close(self):
+        self.sess.close()  # 關閉會話。
+
+class OnnxBackend(GanBackend):
+    """以 ONNX Runtime 在 CPU 上執行生成器；第一次使用時將檢查點轉換為 ONNX 並快取在使用者快取資料夾。"""
+
+    name = "onnx"
+
+    def __init__(self, model_dir, intra_op_threads=0, scope="generator", cache_dir=None):
+        super().__init__(model_dir, intra_op_threads)
+        self.cache_dir = cache_dir or user_cache_dir("onnx")  # 轉換結果的存放位置（預設為使用者快取資料夾）。
+        try:
+            import onnxruntime as ort  # ONNX Runtime 推論引擎。
+        except ImportError as e:
+            print(f"Error importing onnxruntime: {e}")
+            print("Install ONNX Runtime: python -m pip install onnxruntime tf2onnx")
+            raise
+
+        self.onnx_path = self.converted_path()  # 轉換後的 ONNX 路徑。
+        if self.is_stale():  # 尚未轉換或檢查點已更新時才重新轉換。
+            convert_checkpoint_to_onnx(model_dir, self.onnx_path, scope)
+            self.checkpoint_path = latest_checkpoint(model_dir) or self.checkpoint_path
+
+        options = ort.SessionOptions()  # 會話設定。
+        options.intra_op_num_threads = intra_op_threads  # 設定 intra-op 執行緒數。
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL  # 啟用所有圖最佳化。
+        self.session = ort.InferenceSession(self.onnx_path, options, providers=["CPUExecutionProvider"])  # 建立 CPU 推論會話。
+        self.input_name = self.session.get_inputs()[0].name  # 輸入名稱。
+
+    def converted_path(self):  # 轉換結果的快取路徑（以檢查點名稱與模型資料夾路徑的雜湊命名，不同模型不會互相覆蓋）。
+        base_name = os.path.basename(self.checkpoint_path) if self.checkpoint_path else "generator"
+        folder_id = hashlib.sha256(os.path.abspath(self.model_dir).encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f"{base_name}-{folder_id}.onnx")
+
+    def is_stale(self):  # 判斷快取的 ONNX 是否需要重新轉換。
+        if not os.path.exists(self.onnx_path):
+            return True
+        return self.checkpoint_path is not None and checkpoint_mtime(self.checkpoint_path) > os.path.getmtime(self.onnx_path)
+
+    def predict(self, input_image):
+        rgb = _to_rgb(input_image)  # 轉為 RGB。
+        batch = (rgb.astype(np.float32) / 255.0)[np.newaxis]  # 與 convert_image_dtype 相同：[0, 255] -> [0, 1]，並加上批次維度。
+        output = self.session.run(None, {self.input_name: batch})[0][0]  # 執行推論並去除批次維度。
+        output = np.clip(output * 255.5, 0, 255).astype(np.uint8)  # 與 convert_image_dtype(float -> uint8) 相同。
+        img = cv2.cvtColor(output, cv2.COLOR_RGB2GRAY) if output.shape[2] == 3 else output[:, :, 0].copy()  # 轉為灰階。
+        img[img < 20] = 0  # 將低於閾值 20 的像素設為 0（去除噪點）。
+        return img
+
+BACKENDS = {TFSessionBackend.name: TFSessionBackend, OnnxBackend.name: OnnxBackend}  # 可用的後端。
+
+def get_backend(model_dir, backend="tf", intra_op_threads=0):  # 取得（或建立）指定的推論後端。
+    """
+    取得推論後端；同一模型資料夾、後端與執行緒數只建立一次，檢查點識別（checkpoint_identity）改變時自動重建，
+    包括以相同檔名覆寫檢查點（只有修改時間改變）的情況。
+
+    參數:
+        model_dir: 字串，包含匯出檢查點的模型資料夾。
+        backend: 字串，"tf" 或 "onnx"。
+        intra_op_threads: 整數，intra-op 執行緒數（0 表示由執行環境決定）。
+
+    返回:
+        GanBackend 物件。
+    """
+    if backend not in BACKENDS:  # 檢查後端名稱。
+        raise ValueError(f"Unsupported inference backend: {backend}. Supported backends are {', '.join(BACKENDS)}")
+    identity = checkpoint_identity(model_dir, backend)  # 目前的檢查點識別。
+    key = (os.path.abspath(model_dir), backend, intra_op_threads)  # 快取鍵。
+    cached = _BACKENDS.get(key)
+    if cached is not None and cached.identity == identity:  # 檢查點路徑與修改時間都未變更時重複使用。
+        return cached
+    if cached is not None:  # 檢查點已更新，釋放舊的後端。
+        cached.close()
+    _BACKENDS[key] = BACKENDS[backend](model_dir, intra_op_threads)
+    return _BACKENDS[key]
+
+def compare_backends(model_dir, image_paths, reference="tf", candidate="onnx", intra_op_threads=0,
+                     max_abs_diff=2, min_psnr=40.0):  # 比對兩個後端的輸出並判定是否通過。
+    """
+    在樣本深度圖上比對兩個後端的輸出差異（轉換後的一致性檢查）；每張圖像的最大絕對差不超過 max_abs_diff
+    且 PSNR 不低於 min_psnr 時才算通過。
+
+    參數:
+        model_dir: 字串，模型資料夾。
+        image_paths: 列表，樣本輸入圖像路徑。
+        reference: 字串，參考後端名稱。
+        candidate: 字串，待比對的後端名稱。
+        intra_op_threads: 整數，intra-op 執行緒數。
+        max_abs_diff: 整數，允許的逐像素最大絕對差（灰階 0 到 255）。
+        min_psnr: 浮點數，允許的最低 PSNR（dB）；輸出完全相同時 PSNR 為無限大。
+
+    返回:
+        (passed, results)：passed 為所有圖像是否都通過；results 為每張圖像一筆字典（path、max_abs_diff、mean_abs_diff、psnr、passed）。
+    """
+    ref_backend = get_backend(model_dir, reference, intra_op_threads)  # 參考後端。
+    cand_backend = get_backend(model_dir, candidate, intra_op_threads)  # 待比對後端。
+    results = []
+    for path in image_paths:
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)  # 讀取樣本圖像。
+        if image is None:
+            raise ValueError(f"Failed to read input image: {path}")
+        diff = np.abs(ref_backend.predict(image).astype(np.int16) - cand_backend.predict(image).astype(np.int16))  # 逐像素差異。
+        mse = float(np.mean(diff.astype(np.float64) ** 2))  # 均方誤差。
+        psnr = float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)  # 峰值信噪比。
+        passed = int(diff.max()) <= max_abs_diff and psnr >= min_psnr  # 是否符合門檻。
+        results.append({"path": path, "max_abs_diff": int(diff.max()), "mean_abs_diff": float(diff.mean()),
+                        "psnr": psnr, "passed": passed})
+        print(f"{os.path.basename(path)}: max diff = {diff.max()}, mean diff = {diff.mean():.4f}, "
+              f"PSNR = {psnr:.2f} dB, {'PASS' if passed else 'FAIL'}")
+    return bool(results) and all(result["passed"] for result in results), results  # 沒有樣本時不算通過。
@@ -0,0 +1,73 @@
+# 主要目的：此程式碼定義 `InferenceCache` 類，為 GAN 推論結果提供以內容定址的磁碟快取。快取鍵由輸入陣列（形狀、型別與像素內容）的 SHA-256 雜湊與檢查點識別（檢查點路徑、修改時間、推論後端）組成，因此只要輸入深度圖與模型不變，重跑 `save_ai_file`（例如只調整後續縫合或平滑參數）時即可直接讀回結果而略過推論。快取以 .npy 檔保存，命中時更新檔案時間，超過容量上限時依最近最少使用（LRU）順序刪除最舊的檔案。
+
+import os  # 導入 os 模組，用於檔案路徑操作。
+import hashlib  # 導入 hashlib，用於計算內容雜湊。
+import numpy as np  # 導入 NumPy 庫，用於陣列讀寫。
+
+class InferenceCache:
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):  # 初始化方法，接收快取資料夾與容量上限（位元組）。
+        self.cache_dir = cache_dir  # 快取資料夾。
+        self.max_bytes = max_bytes  # 容量上限，預設 512 MB。
+        os.makedirs(cache_dir, exist_ok=True)  # 確保快取資料夾存在。
+
+    @staticmethod
+    def make_key(input_image, checkpoint_id):  # 計算快取鍵。
+        """
+        以輸入陣列內容與檢查點識別計算快取鍵。
+
+        參數:
+            input_image: NumPy 陣列，GAN 的輸入圖像。
+            checkpoint_id: 字串，檢查點識別（見 `ganbackend.checkpoint_identity`）。
+
+        返回:
+            字串，SHA-256 十六進位雜湊。
+        """
+        input_image = np.ascontiguousarray(input_image)  # 確保記憶體連續，雜湊才與排列無關。
+        digest = hashlib.sha256()
+        digest.update(checkpoint_id.encode("utf-8"))  # 模型識別。
+        digest.update(f"{input_image.shape}|{input_image.dtype.str}".encode("ascii"))  # 形狀與型別。
+        digest.update(input_image.tobytes())  # 像素內容。
+        return digest.hexdigest()
+
+    def _path(self, key):  # 快取檔案路徑。
+        return os.path.join(self.cache_dir, key + ".npy")
+
+    def get(self, key):  # 讀取快取；未命中時返回 None。
+        path = self._path(key)
+        if not os.path.exists(path):  # 未命中。
+            return None
+        try:
+            result = np.load(path, allow_pickle=False)  # 讀取快取結果。
+        except (OSError, ValueError):  # 檔案損毀（例如寫入中斷），視為未命中並刪除。
+            os.remove(path)
+            return None
+        os.utime(path)  # 更新存取時間，作為 LRU 順序。
+        return result
+
+    def put(self, key, result):  # 寫入快取並在超過上限時淘汰舊項目。
+        path = self._path(key)
+        tmp_path = path + ".tmp"  # 先寫入暫存檔，避免讀到寫了一半的檔案。
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(result), allow_pickle=False)
+        os.replace(tmp_path, path)  # 原子性地替換為正式檔案。
+        self.evict()
+
+    def evict(self):  # 依 LRU 順序刪除檔案直到總大小低於上限。
+        entries = []
+        for name in os.listdir(self.cache_dir):  # 收集所有快取檔案。
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)  # 目前總大小。
+        for _, size, path in sorted(entries):  # 由最久未使用的開始刪除。
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):  # 清空快取。
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npy"):
+                os.remove(os.path.join(self.cache_dir, name))
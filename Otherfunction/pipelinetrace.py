@@ -0,0 +1,139 @@
+# 主要目的：此程式碼提供 AI 預測流程的輕量級計時與剖析工具。`PipelineTracer` 以 context manager（`span`）包住每個階段（深度圖擷取、邊界標記、`twopicturedege`、GAN 推論、重建、`smooth_stl` 等），記錄各階段耗時；可選擇同時以 cProfile 剖析整個案例。每個案例輸出一份 JSON 報告，`summarize_reports` / `format_summary_table` 則將批次執行的多份報告彙整成摘要表。此模組不依賴 PyQt，GUI 與無介面（headless）模式皆可使用。
+
+import os  # 導入 os 模組，用於檔案路徑操作。
+import io  # 導入 io 模組，用於擷取 pstats 文字輸出。
+import json  # 導入 json 模組，用於讀寫報告。
+import time  # 導入 time 模組，用於高精度計時。
+import cProfile  # 導入 cProfile，用於函數層級剖析。
+import pstats  # 導入 pstats，用於整理剖析結果。
+from contextlib import contextmanager  # 導入 contextmanager，用於定義 span。
+
+REPORT_SUFFIX = "_timing.json"  # 案例報告檔名後綴。
+
+class PipelineTracer:
+    def __init__(self, case_name, profile=False):  # 初始化方法，接收案例名稱與是否啟用 cProfile。
+        self.case_name = case_name  # 案例名稱（通常為模型檔名）。
+        self.profile = profile  # 是否啟用 cProfile。
+        self.spans = []  # 已完成的階段紀錄（依結束順序）。
+        self._stack = []  # 目前進行中的階段名稱（支援巢狀）。
+        self._profiler = cProfile.Profile() if profile else None  # cProfile 物件。
+        self._start = None  # 案例開始時間。
+        self.total = 0.0  # 案例總耗時（秒）。
+
+    def start(self):  # 開始計時（及剖析）。
+        self._start = time.perf_counter()
+        if self._profiler is not None:
+            self._profiler.enable()
+        return self
+
+    def stop(self):  # 結束計時（及剖析）。
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._start is not None:
+            self.total = time.perf_counter() - self._start
+        return self
+
+    @contextmanager
+    def span(self, name):  # 記錄一個階段的耗時。
+        """
+        以 `with tracer.span("gan_inference"):` 包住一個階段；巢狀階段以 "外層/內層" 命名。
+        即使階段中拋出例外也會記錄耗時。
+        """
+        path = "/".join(self._stack + [name])  # 完整階段名稱。
+        self._stack.append(name)
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - begin
+            self._stack.pop()
+            self.spans.append({"name": path, "seconds": elapsed, "depth": len(self._stack)})
+
+    def to_dict(self, top_n=30):  # 將結果轉為可序列化的字典。
+        report = {
+            "case": self.case_name,
+            "total_seconds": self.total,
+            "spans": self.spans,
+        }
+        if self._profiler is not None:  # 附上 cProfile 前 N 名（依累計時間）。
+            stream = io.StringIO()
+            pstats.Stats(self._profiler, stream=stream).sort_stats("cumulative").print_stats(top_n)
+            report["profile"] = stream.getvalue()
+        return report
+
+    def write_report(self, output_folder):  # 寫出案例 JSON 報告（與 .prof 檔）。
+        """
+        將案例報告寫到 `<output_folder>/<case>_timing.json`；啟用 cProfile 時另存 `<case>.prof`（可用 snakeviz 等工具檢視）。
+
+        返回:
+            字串，JSON 報告路徑。
+        """
+        os.makedirs(output_folder, exist_ok=True)
+        report_path = os.path.join(output_folder, self.case_name + REPORT_SUFFIX)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        if self._profiler is not None:
+            self._profiler.dump_stats(os.path.join(output_folder, self.case_name + ".prof"))
+        return report_path
+
+    def format_table(self):  # 單一案例的文字表格。
+        lines = [f"{self.case_name}: {self.total:.3f} s"]
+        for span in sorted(self.spans, key=lambda s: s["name"]):
+            label = "  " * span["depth"] + span["name"].split("/")[-1]  # 以縮排表示巢狀階段。
+            lines.append(f"  {label:<32}{span['seconds']:>10.3f} s")
+        return "\n".join(lines)
+
+def load_reports(folder):  # 讀取資料夾（含子資料夾）中的所有案例報告。
+    reports = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.endswith(REPORT_SUFFIX):
+                with open(os.path.join(root, name), "r", encoding="utf-8") as f:
+                    reports.append(json.load(f))
+    return reports
+
+def summarize_reports(reports):  # 將多個案例報告彙整為各階段統計。
+    """
+    彙整批次執行的案例報告。
+
+    參數:
+        reports: 列表，`PipelineTracer.to_dict()` 或 JSON 報告的內容；也可傳入報告所在資料夾路徑。
+
+    返回:
+        字典，階段名稱 -> {count, total, mean, min, max, share}；share 為該階段佔所有案例總時間的比例。
+    """
+    if isinstance(reports, str):  # 傳入資料夾時先讀取報告。
+        reports = load_reports(reports)
+    grand_total = sum(report["total_seconds"] for report in reports) or 1.0  # 所有案例總耗時。
+    summary = {}
+    for report in reports:
+        for span in report["spans"]:
+            stats = summary.setdefault(span["name"], {"count": 0, "total": 0.0, "min": float("inf"), "max": 0.0})
+            stats["count"] += 1
+            stats["total"] += span["seconds"]
+            stats["min"] = min(stats["min"], span["seconds"])
+            stats["max"] = max(stats["max"], span["seconds"])
+    for stats in summary.values():
+        stats["mean"] = stats["total"] / stats["count"]
+        stats["share"] = stats["total"] / grand_total
+    return summary
+
+def format_summary_table(summary):  # 將彙整結果轉為文字表格（依總耗時排序）。
+    header = f"{'stage':<32}{'count':>7}{'mean(s)':>10}{'min(s)':>10}{'max(s)':>10}{'total(s)':>11}{'share':>8}"
+    lines = [header, "-" * len(header)]
+    for name, stats in sorted(summary.items(), key=lambda item: item[1]["total"], reverse=True):
+        lines.append(f"{name:<32}{stats['count']:>7}{stats['mean']:>10.3f}{stats['min']:>10.3f}"
+                     f"{stats['max']:>10.3f}{stats['total']:>11.3f}{stats['share']:>8.1%}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":  # 批次執行後彙整：python -m Otherfunction.pipelinetrace <報告資料夾>
+    import argparse
+    parser = argparse.ArgumentParser(description="彙整 AI 預測流程的計時報告")
+    parser.add_argument("report_folder", help="包含 *_timing.json 的資料夾（會遞迴搜尋）")
+    parser.add_argument("--output", help="可選，將彙整結果另存為 JSON")
+    args = parser.parse_args()
+    summary = summarize_reports(args.report_folder)
+    print(format_summary_table(summary))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
@@ -1,4 +1,4 @@
-# 主要目的：此程式碼定義了一個命令列工具，使用 TensorFlow 1.x 的靜態圖執行模式，從指定的模型目錄載入預訓練的生成對抗網絡（GAN）模型，處理輸入的 PNG 灰階圖像，生成修復後的圖像並保存為 PNG 檔案。它適用於牙科圖像修復流程，通過命令列參數指定模型目錄、輸入圖像和輸出圖像路徑，並包含基本的圖像後處理（例如去除低於閾值的像素）。
+# 主要目的：此程式碼定義了一個命令列工具，使用 TensorFlow 1.x 的靜態圖執行模式，從指定的模型目錄載入預訓練的生成對抗網絡（GAN）模型，處理輸入的 PNG 灰階圖像，生成修復後的圖像並保存為 PNG 檔案。它適用於牙科圖像修復流程，通過命令列參數指定模型目錄、輸入圖像和輸出圖像路徑，並包含基本的圖像後處理（例如去除低於閾值的像素）。推論時會在圖中定位 PNG 解碼後與編碼前的數值張量，讓 NumPy 陣列直接進出模型，省去 base64 與 PNG 的重複編解碼；找不到時才退回原本的字串路徑。
 
 from __future__ import absolute_import
 from __future__ import division
@@ -27,15 +27,79 @@ parser.add_argument("--input_file", help="Input PNG image file")  # 添加輸入
 parser.add_argument("--output_file", help="Output PNG image file")  # 添加輸出 PNG 圖像檔案參數。
 a = parser.parse_args()  # 解析命令列參數，儲存到變數 a。
 
-def apply_gan_model(model_dir, input_file, output_file):  # 定義應用 GAN 模型的函數。
+def find_raw_tensors(graph):  # 在匯出的圖中尋找 PNG 解碼後與編碼前的數值張量。
+    """
+    在 pix2pix 匯出的圖中尋找數值化的輸入/輸出張量，略過 base64 與 PNG 編解碼。
+
+    參數:
+        graph: tf.Graph，已載入 .meta 的計算圖。
+
+    返回:
+        (input_tensor, output_tensor): 輸入為 DecodePng 的輸出（uint8，HxWxC），
+        輸出為 EncodePng 的輸入（uint8，HxWxC）；若圖中找不到則返回 (None, None)。
+    """
+    decode_ops = [op for op in graph.get_operations() if op.type == "DecodePng"]  # 找出所有 PNG 解碼節點。
+    encode_ops = [op for op in graph.get_operations() if op.type == "EncodePng"]  # 找出所有 PNG 編碼節點。
+    if len(decode_ops) != 1 or len(encode_ops) != 1:  # 必須各只有一個，才能確定對應的輸入與輸出。
+        return None, None
+    return decode_ops[0].outputs[0], encode_ops[0].inputs[0]  # 解碼後的影像張量與編碼前的影像張量。
+
+def _resolve_io_tensors(graph):  # 從圖的 collections 取得輸入/輸出張量，並決定是否走數值路徑。
+    input_vars = json.loads(tf.get_collection("inputs")[0].decode())  # 從圖中獲取輸入張量名稱（JSON 格式）。
+    output_vars = json.loads(tf.get_collection("outputs")[0].decode())  # 從圖中獲取輸出張量名稱（JSON 格式）。
+    input_tensor = graph.get_tensor_by_name(input_vars["input"])  # 獲取輸入張量。
+    output_tensor = graph.get_tensor_by_name(output_vars["output"])  # 獲取輸出張量。
+
+    if input_tensor.dtype != tf.string and output_tensor.dtype != tf.string:  # 已重新匯出為數值簽名，直接使用。
+        return input_tensor, output_tensor, True
+    raw_input, raw_output = find_raw_tensors(graph)  # 嘗試在圖中定位解碼後/編碼前的張量。
+    if raw_input is not None:  # 找到數值張量。
+        return raw_input, raw_output, True
+    return input_tensor, output_tensor, False  # 找不到時退回 base64 字串路徑。
+
+def _to_model_input(image):  # 將 OpenCV 讀取的陣列轉為模型預期的 RGB 排列。
+    if image.ndim == 2:  # 灰階圖像，補上通道維度（圖中會轉為 RGB）。
+        return image[:, :, np.newaxis]
+    if image.shape[2] == 3:  # OpenCV 為 BGR，PNG 解碼結果為 RGB。
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    if image.shape[2] == 4:  # 含透明通道的 BGRA 轉為 RGBA。
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA)
+    return image
+
+def _to_gray_output(image):  # 將模型輸出的 RGB 陣列轉為灰階深度圖。
+    image = np.asarray(image, dtype=np.uint8)  # 確保為 uint8 陣列。
+    if image.ndim == 4:  # 去除批次維度。
+        image = image[0]
+    if image.ndim == 3 and image.shape[2] == 3:  # RGB 轉灰階（與 cv2.imdecode 的灰階轉換一致）。
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    if image.ndim == 3:  # 單通道輸出，去除通道維度。
+        return image[:, :, 0].copy()
+    return image.copy()
+
+def _run_base64(sess, input_tensor, output_tensor, input_image):  # 舊的 base64 PNG 字串推論路徑（僅在找不到數值張量時使用）。
+    _, buffer = cv2.imencode(".png", input_image)  # 將輸入陣列編碼為 PNG。
+    input_value = np.array(base64.urlsafe_b64encode(buffer.tobytes()).decode("ascii"))  # 轉為 base64 字串。
+    output_value = sess.run(output_tensor, feed_dict={input_tensor: np.expand_dims(input_value, axis=0)})[0]  # 運行模型。
+    b64data = output_value.decode("ascii")  # 獲取輸出的 base64 字串。
+    b64data += "=" * (-len(b64data) % 4)  # 補齊 base64 字串的填充字符（=）。
+    output_data = base64.urlsafe_b64decode(b64data.encode("ascii"))  # 解碼 base64 字串為二進制數據。
+    img = cv2.imdecode(np.frombuffer(output_data, np.uint8), cv2.IMREAD_GRAYSCALE)  # 將陣列解碼為灰階圖像。
+    if img is None:  # 檢查圖像是否成功解碼。
+        raise ValueError("Failed to decode image data. Check model output format.")
+    return img
+
+def apply_gan_model_array(model_dir, input_image):  # 以 NumPy 陣列直接進行 GAN 推論。
+    """
+    直接以數值張量執行 GAN 模型，不經過 PNG/base64 編解碼。
+
+    參數:
+        model_dir: 字串，包含匯出檢查點的模型資料夾。
+        input_image: NumPy 陣列（uint8），OpenCV 排列（灰階、BGR 或 BGRA），例如 `combineABC.merge_images` 的結果。
+
+    返回:
+        NumPy 陣列（uint8，灰階），已去除低於閾值 20 的噪點。
+    """
     try:
-        with open(input_file, "rb") as f:  # 以二進制讀取模式打開輸入圖像檔案。
-            input_data = f.read()  # 讀取圖像的二進制數據。
-
-        # 將輸入圖像數據編碼為 base64 並轉為 JSON 格式
-        input_instance = dict(input=base64.urlsafe_b64encode(input_data).decode("ascii"), key="0")  # 將圖像數據編碼為 base64 字串。
-        input_instance = json.loads(json.dumps(input_instance))  # 將字典轉為 JSON 字串後再解析回字典（確保格式一致）。
-
         with tf.Session() as sess:  # 創建 TensorFlow 1.x 會話。
             checkpoint_path = tf.train.latest_checkpoint(model_dir)  # 獲取模型目錄中最新的檢查點檔案。
             if not checkpoint_path:  # 檢查是否存在檢查點。
@@ -44,39 +108,47 @@ def apply_gan_model(model_dir, input_file, output_file):  # 定義應用 GAN 模
             # 載入模型圖結構和權重
             saver = tf.train.import_meta_graph(checkpoint_path + ".meta")  # 導入模型的圖結構（.meta 檔案）。
             saver.restore(sess, checkpoint_path)  # 恢復模型的權重。
-
-            # 獲取模型的輸入和輸出張量
-            input_vars = json.loads(tf.get_collection("inputs")[0].decode())  # 從圖中獲取輸入張量名稱（JSON 格式）。
-            output_vars = json.loads(tf.get_collection("outputs")[0].decode())  # 從圖中獲取輸出張量名稱（JSON 格式）。
-            input_tensor = tf.get_default_graph().get_tensor_by_name(input_vars["input"])  # 獲取輸入張量。
-            output_tensor = tf.get_default_graph().get_tensor_by_name(output_vars["output"])  # 獲取輸出張量。
-
-            # 準備輸入數據
-            input_value = np.array(input_instance["input"])  # 將輸入 JSON 中的 base64 字串轉為 NumPy 陣列。
-            # 執行模型推斷
-            output_value = sess.run(output_tensor, feed_dict={input_tensor: np.expand_dims(input_value, axis=0)})[0]  # 將輸入數據擴展維度並運行模型。
-
-        # 處理模型輸出
-        output_instance = dict(output=output_value.decode("ascii"), key="0")  # 將輸出數據轉為字典格式。
-        b64data = output_instance["output"]  # 獲取輸出的 base64 字串。
-        b64data += "=" * (-len(b64data) % 4)  # 補齊 base64 字串的填充字符（=）。
-        output_data = base64.urlsafe_b64decode(b64data.encode("ascii"))  # 解碼 base64 字串為二進制數據。
-        nparr = np.frombuffer(output_data, np.uint8)  # 將二進制數據轉為 NumPy 陣列。
-        img = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)  # 將陣列解碼為灰階圖像。
-
-        if img is None:  # 檢查圖像是否成功解碼。
-            raise ValueError("Failed to decode image data. Check model output format.")  # 若解碼失敗，拋出錯誤。
-
-        # 圖像後處理
-        img[img < 20] = 0  # 將低於閾值 20 的像素設為 0（去除噪點）。
-        _, buffer = cv2.imencode(".png", img)  # 將圖像編碼為 PNG 格式的二進制數據。
-        with open(output_file, "wb") as f:  # 以二進制寫入模式打開輸出檔案。
-            f.write(buffer.tobytes())  # 將編碼後的圖像數據寫入檔案。
+            return run_session(sess, input_image)  # 執行推論並返回灰階結果。
 
     except Exception as e:  # 捕獲所有異常。
-        print(f"Error in apply_gan_model: {e}")  # 打印錯誤訊息。
+        print(f"Error in apply_gan_model_array: {e}")  # 打印錯誤訊息。
         raise  # 重新拋出異常以便調試。
 
+def run_session(sess, input_image):  # 在已載入權重的會話上執行一次推論。
+    """
+    在已恢復檢查點的會話上執行 GAN 推論（供 `ganbackend.TFSessionBackend` 重複使用同一會話）。
+
+    參數:
+        sess: tf.Session，圖與權重已載入。
+        input_image: NumPy 陣列（uint8），OpenCV 排列。
+
+    返回:
+        NumPy 陣列（uint8，灰階），已去除低於閾值 20 的噪點。
+    """
+    with sess.graph.as_default():  # 確保 collections 從該會話的圖中讀取。
+        # 獲取模型的輸入和輸出張量（優先使用數值張量）
+        input_tensor, output_tensor, is_raw = _resolve_io_tensors(sess.graph)
+
+    if is_raw:  # 數值路徑：陣列直接進入圖中。
+        input_value = _to_model_input(input_image)  # 轉為 RGB 排列。
+        if input_tensor.shape.ndims == 4:  # 數值簽名帶批次維度時補上。
+            input_value = np.expand_dims(input_value, axis=0)
+        img = _to_gray_output(sess.run(output_tensor, feed_dict={input_tensor: input_value}))  # 執行推論並轉灰階。
+    else:  # 舊圖無法定位數值張量時，退回 base64 路徑。
+        img = _run_base64(sess, input_tensor, output_tensor, input_image)
+
+    # 圖像後處理
+    img[img < 20] = 0  # 將低於閾值 20 的像素設為 0（去除噪點）。
+    return img
+
+def apply_gan_model(model_dir, input_file, output_file):  # 定義應用 GAN 模型的函數（檔案介面）。
+    input_image = cv2.imread(input_file, cv2.IMREAD_UNCHANGED)  # 讀取輸入 PNG 圖像（保留原始通道）。
+    if input_image is None:  # 檢查圖像是否成功讀取。
+        raise ValueError(f"Failed to read input image: {input_file}")
+    img = apply_gan_model_array(model_dir, input_image)  # 以數值張量執行推論。
+    cv2.imwrite(output_file, img)  # 保存輸出的灰階深度圖。
+    return img  # 返回輸出陣列，供後續流程直接使用。
+
 
 # model_path = "D:/Weekly_Report/Thesis_Weekly_Report/paper/paper_Implementation/pyqt5/aimodel/DAISdepthr=2andcollision/"                # 模型資料夾
 # input_img = "D:/Weekly_Report/Thesis_Weekly_Report/paper/paper_Implementation/pyqt5/toKMU/AIoutput/onlay-14_LowerJawGOICPdown/flipped_256x768.png"          # 輸入圖片
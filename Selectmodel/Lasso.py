@@ -1,10 +1,34 @@
-# 主要目的：此程式碼定義了兩個基於 VTK 的類：`LassoInteractor` 和 `LassoAreaColor`，用於在牙科 3D 模型處理場景中實現套索（lasso）選取功能。`LassoInteractor` 繼承自 `vtk.vtkInteractorStyle`，允許用戶通過滑鼠左鍵拖曳繪製多邊形選取範圍，生成 2D 遮罩並映射到 3D 模型點；`LassoAreaColor` 負責將選取的點以紅色高亮顯示，支援與 `HighlightInteractorStyle` 和 `AimodelView` 結合，提供交互式模型編輯功能。
+# 主要目的：此程式碼定義了兩個基於 VTK 的類：`LassoInteractor` 和 `LassoAreaColor`，用於在牙科 3D 模型處理場景中實現套索（lasso）選取功能。`LassoInteractor` 繼承自 `vtk.vtkInteractorStyle`，允許用戶通過滑鼠左鍵拖曳繪製多邊形選取範圍（外框以 2D 折線演員疊加顯示，每次只把新頂點附加到同一個折線單元，但每加入一個頂點仍會重新渲染窗口一次），生成 2D 遮罩，再以相機的複合投影矩陣一次投影所有模型點並查詢遮罩（可選擇以 Z-buffer 深度測試只選取可見點）；`LassoAreaColor` 以頂點布林遮罩保存選取狀態（支援向量化的聯集、差集與反轉，清除為 O(1)），並透過唯一的高亮演員將選取的點以紅色顯示，支援與 `HighlightInteractorStyle` 和 `AimodelView` 結合，提供交互式模型編輯功能。
 
 import numpy as np  # 導入 NumPy 庫，用於數值運算和陣列處理。
 import vtkmodules.all as vtk  # 導入 VTK 庫，用於 3D 模型處理和視覺化。
 from vtkmodules.util import numpy_support as nps  # 導入 VTK NumPy 支援模組，用於 VTK 和 NumPy 陣列轉換。
 from vtkmodules.vtkCommonCore import vtkCommand  # 導入 VTK 命令模組，用於事件處理。
 import cv2  # 導入 OpenCV 庫，用於 2D 遮罩處理。
+from .selectionindex import SelectionIndex  # 導入共用的選取索引。
+
+def project_to_display(renderer, points):  # 一次將所有世界坐標點投影到螢幕坐標。
+    """
+    使用相機的複合投影矩陣（view + projection）以 NumPy 一次投影所有點，取代逐點呼叫 vtkCoordinate。
+    參數:
+        renderer: VTK 渲染器
+        points: NumPy 陣列 [N, 3]，世界坐標
+    返回:
+        (x, y, z, valid)；x, y 為螢幕像素坐標（整數），z 為深度值（0~1，與 Z-buffer 相同），valid 表示點在相機前方
+    """
+    w, h = renderer.GetRenderWindow().GetSize()  # 渲染窗口尺寸。
+    vp = renderer.GetViewport()  # 渲染器在窗口中的位置（正規化坐標）。
+    matrix = renderer.GetActiveCamera().GetCompositeProjectionTransformMatrix(renderer.GetTiledAspectRatio(), -1, 1)  # 世界坐標 -> 正規化裝置坐標。
+    m = np.array([[matrix.GetElement(i, j) for j in range(4)] for i in range(4)])
+    clip = points @ m[:3, :3].T + m[:3, 3]  # 齊次坐標的 x, y, z。
+    wc = points @ m[3, :3] + m[3, 3]  # 齊次坐標的 w。
+    valid = wc > 0  # 只保留相機前方的點。
+    wc = np.where(valid, wc, 1.0)
+    ndc = clip / wc[:, None]  # 正規化裝置坐標（-1~1）。
+    x = np.floor((ndc[:, 0] + 1.0) * 0.5 * (vp[2] - vp[0]) * w + vp[0] * w).astype(np.int64)  # 與 vtkViewport::ViewToDisplay 相同的換算。
+    y = np.floor((ndc[:, 1] + 1.0) * 0.5 * (vp[3] - vp[1]) * h + vp[1] * h).astype(np.int64)
+    z = (ndc[:, 2] + 1.0) * 0.5  # 深度值。
+    return x, y, z, valid
 
 class LassoInteractor(vtk.vtkInteractorStyle):  # 定義 LassoInteractor 類，繼承 VTK 交互樣式。
     class vtkInternal(object):  # 內部類，模擬 C++ 的私有變數，用於儲存和管理多邊形點。
@@ -29,22 +53,12 @@ class LassoInteractor(vtk.vtkInteractorStyle):  # 定義 LassoInteractor 類，
         
         def Clear(self):  # 清除點列表。
             self._points = []  # 重置點列表。
-        
-        def DrawPixels(self, StartPos, EndPos, pixels, size):  # 繪製線段像素到像素陣列。
-            length = int(round(np.linalg.norm(StartPos - EndPos)))  # 計算起始點和結束點的歐幾里得距離。
-            if length == 0:  # 如果距離為 0，不繪製。
-                return
-            x1, y1 = StartPos  # 獲取起始點的 x, y 坐標。
-            x2, y2 = EndPos  # 獲取結束點的 x, y 坐標。
-            x = [int(round(v)) for v in np.linspace(x1, x2, length)]  # 生成線性插值的 x 坐標。
-            y = [int(round(v)) for v in np.linspace(y1, y2, length)]  # 生成線性插值的 y 坐標。
-            indices = np.array([row * size[0] + col for col, row in zip(x, y)])  # 計算像素索引（行優先）。
-            pixels[indices] = 255 ^ pixels[indices]  # 將對應像素值取反（模擬繪製效果）。
-
-    def __init__(self, poly_data, renderer):  # 初始化方法，接收 PolyData 和渲染器。
+
+    def __init__(self, poly_data, renderer, index=None):  # 初始化方法，接收 PolyData、渲染器與可選的共用選取索引。
         super().__init__()  # 調用父類的初始化方法。
         self.renderer = renderer  # 儲存傳入的 VTK 渲染器。
         self.poly_data = poly_data  # 儲存傳入的 PolyData（3D 模型數據，例如牙齒模型）。
+        self.index = index or SelectionIndex(poly_data)  # 共用的選取索引（頂點陣列）。
         self.colorActors = []  # 初始化高亮演員列表，儲存選取區域的可視化演員。
         self.setup()  # 調用設置方法，初始化內部變數。
         self.AddObserver("MouseMoveEvent", self.onMouseMove)  # 綁定滑鼠移動事件。
@@ -56,28 +70,54 @@ class LassoInteractor(vtk.vtkInteractorStyle):  # 定義 LassoInteractor 類，
         self.Moving = False  # 初始化移動狀態為 False，表示未在繪製。
         self.StartPosition = np.zeros(2, dtype=np.int32)  # 初始化起始位置（螢幕坐標）。
         self.EndPosition = np.zeros(2, dtype=np.int32)  # 初始化結束位置（螢幕坐標）。
-        self.PixelArray = vtk.vtkUnsignedCharArray()  # 初始化像素數據陣列（RGB）。
-        self.DrawPolygonPixels = True  # 初始化為繪製多邊形像素。
+        self.DrawPolygonPixels = True  # 初始化為繪製多邊形外框。
+        self.OutlinePoints = vtk.vtkPoints()  # 外框折線的頂點（螢幕坐標）。
+        self.OutlineLines = vtk.vtkCellArray()  # 外框的單元：第 0 個為封閉邊 [最後一點, 0]，第 1 個為依序連接所有頂點的折線。
+        self.OutlinePolyData = vtk.vtkPolyData()  # 外框折線。
+        self.OutlinePolyData.SetPoints(self.OutlinePoints)
+        self.OutlinePolyData.SetLines(self.OutlineLines)
+        coordinate = vtk.vtkCoordinate()  # 頂點以螢幕像素坐標表示。
+        coordinate.SetCoordinateSystemToDisplay()
+        mapper = vtk.vtkPolyDataMapper2D()  # 2D 映射器，直接疊加在 3D 場景上，不需讀寫整個畫面的像素。
+        mapper.SetInputData(self.OutlinePolyData)
+        mapper.SetTransformCoordinate(coordinate)
+        self.OutlineActor = vtk.vtkActor2D()  # 外框的 2D 演員。
+        self.OutlineActor.SetMapper(mapper)
+        self.OutlineActor.GetProperty().SetColor(1.0, 1.0, 1.0)  # 白色外框。
+        self.OutlineActor.GetProperty().SetLineWidth(2)
+        self.VisibleOnly = False  # 是否只選取可見的點（以 Z-buffer 深度測試）。
+        self.DepthTolerance = 1e-3  # 深度測試的容差（Z-buffer 深度值）。
 
     def interactorSetter(self, interactor):  # 設置交互器。
         self.SetInteractor(interactor)  # 動態設置 VTK 交互器，避免建構子直接初始化。
 
-    def DrawPolygon(self):  # 繪製多邊形到渲染窗口。
-        tmpPixelArray = vtk.vtkUnsignedCharArray()  # 創建臨時像素數據陣列。
-        tmpPixelArray.DeepCopy(self.PixelArray)  # 深拷貝當前像素數據。
-        pixels = nps.vtk_to_numpy(tmpPixelArray)  # 將像素數據轉為 NumPy 陣列。
-        renWin = self.GetInteractor().GetRenderWindow()  # 獲取渲染窗口。
-        size = renWin.GetSize()  # 獲取渲染窗口的尺寸（寬、高）。
-        for i in range(self.Internal.GetNumberOfPoints() - 1):  # 迭代多邊形的邊。
-            StartPos = self.Internal.GetPoint(i)  # 獲取起始點。
-            EndPos = self.Internal.GetPoint(i + 1)  # 獲取結束點。
-            self.Internal.DrawPixels(StartPos, EndPos, pixels, size)  # 繪製邊的像素。
-        if self.Internal.GetNumberOfPoints() >= 3:  # 如果點數 >= 3，封閉多邊形。
-            StartPos = self.Internal.GetPoint(0)  # 獲取第一個點。
-            EndPos = self.Internal.GetPoint(self.Internal.GetNumberOfPoints() - 1)  # 獲取最後一個點。
-            self.Internal.DrawPixels(StartPos, EndPos, pixels, size)  # 繪製封閉邊。
-        renWin.SetPixelData(0, 0, size[0] - 1, size[1] - 1, pixels.flatten(), 0, 0)  # 更新渲染窗口的像素數據。
-        renWin.Frame()  # 刷新渲染窗口。
+    def DrawPolygon(self):  # 更新多邊形外框並重新渲染。
+        """
+        將新增的頂點附加到同一個折線單元的末端（InsertCellPoint / UpdateCellCount），並改寫固定大小的封閉邊，
+        更新外框的成本與套索長度無關。每加入一個頂點（滑鼠移動超過 10 像素）仍會重新渲染整個窗口一次，
+        成本與場景大小相關；但不再讀寫整個畫面的像素。
+        """
+        n = self.Internal.GetNumberOfPoints()
+        if self.OutlineLines.GetNumberOfCells() == 0:  # 第一次繪製時建立封閉邊與空的折線（此時至少已有一個頂點）。
+            self.OutlineLines.InsertNextCell(2, [0, 0])
+            self.OutlineLines.InsertNextCell(0)
+        while self.OutlinePoints.GetNumberOfPoints() < n:  # 只加入新增的頂點。
+            point_id = self.OutlinePoints.GetNumberOfPoints()
+            x, y = self.Internal.GetPoint(point_id)
+            self.OutlinePoints.InsertNextPoint(float(x), float(y), 0.0)
+            self.OutlineLines.InsertCellPoint(point_id)  # 折線是最後一個單元，直接附加新頂點。
+            self.OutlineLines.UpdateCellCount(point_id + 1)
+        self.OutlineLines.ReplaceCellAtId(0, 2, [n - 1, 0] if n >= 3 else [0, 0])  # 點數 >= 3 時連回第一點以封閉多邊形。
+        self.OutlinePoints.Modified()
+        self.OutlineLines.Modified()
+        self.GetInteractor().GetRenderWindow().Render()  # 重新渲染整個窗口（外框為 2D 疊加層）。
+
+    def ClearOutline(self):  # 移除外框。
+        self.OutlinePoints.Reset()
+        self.OutlinePoints.Modified()
+        self.OutlineLines.Reset()  # 清空單元，下次繪製時重新建立。
+        self.OutlineLines.Modified()
+        self.renderer.RemoveActor2D(self.OutlineActor)
 
     def DrawPolygonPixelsOn(self):  # 啟用多邊形像素繪製。
         self.DrawPolygonPixels = True  # 設置繪製多邊形像素狀態為 True。
@@ -92,30 +132,23 @@ class LassoInteractor(vtk.vtkInteractorStyle):  # 定義 LassoInteractor 類，
         if self.GetInteractor() is None:  # 如果交互器未設置，直接返回。
             return
         self.Moving = True  # 設置移動狀態為 True，表示開始繪製。
-        renWin = self.GetInteractor().GetRenderWindow()  # 獲取渲染窗口。
         eventPos = self.GetInteractor().GetEventPosition()  # 獲取滑鼠點擊位置（螢幕坐標）。
         self.StartPosition[0], self.StartPosition[1] = eventPos[0], eventPos[1]  # 設置起始位置。
         self.EndPosition = self.StartPosition  # 初始結束位置等於起始位置。
-        self.PixelArray.Initialize()  # 初始化像素數據陣列。
-        self.PixelArray.SetNumberOfComponents(3)  # 設置像素數據為 RGB（3 分量）。
-        size = renWin.GetSize()  # 獲取渲染窗口尺寸。
-        self.PixelArray.SetNumberOfTuples(size[0] * size[1])  # 設置像素數據大小（寬 * 高）。
-        self.pixels = None  # 初始化像素數據變數（未使用，可能是遺留代碼）。
-        renWin.GetPixelData(0, 0, size[0] - 1, size[1] - 1, 1, self.PixelArray, 0)  # 獲取當前窗口的像素數據。
         self.Internal.Clear()  # 清除多邊形點列表。
         self.Internal.AddPoint(self.StartPosition[0], self.StartPosition[1])  # 添加起始點。
+        self.ClearOutline()  # 清除上一次的外框。
+        if self.DrawPolygonPixels:  # 如果啟用了多邊形外框繪製，加入 2D 外框演員。
+            self.renderer.AddActor2D(self.OutlineActor)
         self.InvokeEvent(vtk.vtkCommand.StartInteractionEvent)  # 觸發開始交互事件。
         super().OnLeftButtonDown()  # 調用父類的左鍵按下處理。
 
     def onLeftButtonUp(self, obj, event):  # 處理左鍵釋放事件。
         if self.GetInteractor() is None or not self.Moving:  # 如果交互器未設置或未在繪製，直接返回。
             return
-        if self.DrawPolygonPixels:  # 如果啟用了多邊形像素繪製。
-            renWin = self.GetInteractor().GetRenderWindow()  # 獲取渲染窗口。
-            size = renWin.GetSize()  # 獲取渲染窗口尺寸。
-            pixels = nps.vtk_to_numpy(self.PixelArray)  # 將像素數據轉為 NumPy 陣列。
-            renWin.SetPixelData(0, 0, size[0] - 1, size[1] - 1, pixels.flatten(), 0, 0)  # 更新渲染窗口像素數據。
-            renWin.Frame()  # 刷新渲染窗口。
+        if self.DrawPolygonPixels:  # 如果啟用了多邊形外框繪製，移除外框並重新渲染。
+            self.ClearOutline()
+            self.GetInteractor().GetRenderWindow().Render()
         self.Moving = False  # 設置移動狀態為 False，表示結束繪製。
         self.InvokeEvent(vtkCommand.SelectionChangedEvent)  # 觸發選取變更事件。
         self.InvokeEvent(vtkCommand.EndPickEvent)  # 觸發結束拾取事件。
@@ -141,28 +174,32 @@ class LassoInteractor(vtk.vtkInteractorStyle):  # 定義 LassoInteractor 類，
         newPoint = self.EndPosition  # 獲取當前滑鼠位置。
         if np.linalg.norm(lastPoint - newPoint) > 10:  # 如果新點與最後一點距離大於 10 像素。
             self.Internal.AddPoint(*newPoint)  # 添加新點到多邊形點列表。
-            if self.DrawPolygonPixels:  # 如果啟用了多邊形像素繪製。
+            if self.DrawPolygonPixels:  # 如果啟用了多邊形外框繪製。
                 self.DrawPolygon()  # 繪製多邊形。
         super().OnMouseMove()  # 調用父類的滑鼠移動處理。
 
     def SetDrawPolygonPixels(self, drawPolygonPixels):  # 設置是否繪製多邊形像素。
         self.DrawPolygonPixels = drawPolygonPixels  # 更新繪製多邊形像素狀態。
 
+    def SetVisibleOnly(self, visibleOnly):  # 設置是否只選取可見的點（被遮擋的背面點不選取）。
+        self.VisibleOnly = visibleOnly
+
     def getSelectArea(self, select_point):  # 處理選取的多邊形區域。
         w, h = self.renderer.GetRenderWindow().GetSize()  # 獲取渲染窗口尺寸。
         mask = np.zeros((h, w), dtype=np.uint8)  # 創建全黑的 2D 遮罩（高 x 寬）。
         cv2.fillPoly(mask, [np.array(select_point, dtype=np.int32)], 255)  # 在遮罩上繪製多邊形（白色填充）。
-        coord = vtk.vtkCoordinate()  # 創建 VTK 坐標轉換物件。
-        coord.SetCoordinateSystemToWorld()  # 設置坐標系統為世界坐標。
-        selected_ids = vtk.vtkIdTypeArray()  # 創建 VTK ID 陣列，儲存選取的點 ID。
-        selected_ids.SetNumberOfComponents(1)  # 設置 ID 陣列為單分量。
-        for ptId in range(self.poly_data.GetNumberOfPoints()):  # 迭代模型的所有點。
-            world_point = self.poly_data.GetPoint(ptId)  # 獲取點的世界坐標。
-            coord.SetValue(world_point)  # 設置坐標值為世界坐標。
-            display_point = coord.GetComputedDisplayValue(self.renderer)  # 將世界坐標轉為螢幕坐標。
-            x, y = int(display_point[0]), int(display_point[1])  # 轉為整數坐標。
-            if 0 <= x < w and 0 <= y < h and mask[y, x] == 255:  # 如果點在遮罩範圍內且為白色。
-                selected_ids.InsertNextValue(ptId)  # 將點 ID 添加到選取列表。
+        self.index.update()  # 模型被修改後才重建索引。
+        points = self.index.points  # 模型所有點的世界坐標。
+        x, y, z, valid = project_to_display(self.renderer, points)  # 一次投影所有點。
+        inside = valid & (x >= 0) & (x < w) & (y >= 0) & (y < h)  # 在窗口範圍內的點。
+        ids = np.flatnonzero(inside)
+        ids = ids[mask[y[ids], x[ids]] == 255]  # 在遮罩範圍內（白色）的點。
+        if self.VisibleOnly and len(ids):  # 深度測試：只保留沒有被遮擋的點。
+            zbuffer = vtk.vtkFloatArray()
+            self.renderer.GetRenderWindow().GetZbufferData(0, 0, w - 1, h - 1, zbuffer)  # 讀取整個窗口的 Z-buffer。
+            depth = nps.vtk_to_numpy(zbuffer).reshape(h, w)
+            ids = ids[z[ids] <= depth[y[ids], x[ids]] + self.DepthTolerance]
+        selected_ids = nps.numpy_to_vtkIdTypeArray(ids.astype(nps.ID_TYPE_CODE), deep=True)  # 轉為 VTK ID 陣列，儲存選取的點 ID。
         self.setClipRange(selected_ids)  # 設置選取範圍的點 ID。
 
     def setClipRange(self, selected_ids):  # 設置選取範圍的點 ID。
@@ -176,36 +213,75 @@ class LassoAreaColor:  # 定義 LassoAreaColor 類，用於高亮顯示選取點
         self.poly_data = poly_data  # 儲存傳入的 PolyData。
         self.renderer = renderer  # 儲存傳入的渲染器。
         self.interactor = interactor  # 儲存傳入的交互器。
-        self.colorActors = []  # 初始化高亮演員列表。
-
-    def show_all_area(self, select_ids):  # 高亮顯示選取的點。
-        points = vtk.vtkPoints()  # 創建 VTK 點集。
-        for i in range(select_ids.GetNumberOfTuples()):  # 迭代選取的點 ID。
-            try:
-                point_id = select_ids.GetValue(i)  # 獲取點 ID。
-                x, y, z = self.poly_data.GetPoint(point_id)  # 獲取點的世界坐標。
-                points.InsertNextPoint(x, y, z)  # 將點添加到點集。
-            except Exception as e:
-                print(f"[ERROR] point_id={point_id}: {e}")  # 打印錯誤訊息。
-        poly_data = vtk.vtkPolyData()  # 創建 VTK PolyData。
-        poly_data.SetPoints(points)  # 設置點集。
-        vertex_filter = vtk.vtkVertexGlyphFilter()  # 創建頂點過濾器，將點轉為可視化圖元。
-        vertex_filter.SetInputData(poly_data)  # 設置輸入 PolyData。
-        vertex_filter.Update()  # 更新過濾器。
-        mapper = vtk.vtkPolyDataMapper()  # 創建 VTK 映射器。
-        mapper.SetInputConnection(vertex_filter.GetOutputPort())  # 設置輸入為過濾器輸出。
-        actor = vtk.vtkActor()  # 創建 VTK 演員。
-        actor.SetMapper(mapper)  # 設置演員的映射器。
-        actor.GetProperty().SetColor(1.0, 0.0, 0.0)  # 設置顏色為紅色（RGB: 1, 0, 0）。
-        actor.GetProperty().SetPointSize(5)  # 設置點大小為 5 像素。
-        self.colorActors.append(actor)  # 將演員添加到高亮演員列表。
-        self.renderer.AddActor(actor)  # 將演員添加到渲染器。
-        self.renderer.GetRenderWindow().Render()  # 渲染窗口。
+        self.mask = None  # 選取狀態：頂點的布林遮罩（None 表示沒有選取，清除只需 O(1)）。
+        self.highlight = vtk.vtkPolyData()  # 高亮用的 PolyData：共用模型的點，只有選取頂點的頂點單元。
+        mapper = vtk.vtkPolyDataMapper()  # 映射器只建立一次。
+        mapper.SetInputData(self.highlight)
+        self.actor = vtk.vtkActor()  # 唯一的高亮演員，重複選取不會增加演員。
+        self.actor.SetMapper(mapper)
+        self.actor.GetProperty().SetColor(1.0, 0.0, 0.0)  # 設置顏色為紅色（RGB: 1, 0, 0）。
+        self.actor.GetProperty().SetPointSize(5)  # 設置點大小為 5 像素。
+        self.actor.VisibilityOff()
+        self.colorActors = [self.actor]  # 高亮演員列表（只有一個）。
+        self.renderer.AddActor(self.actor)
+
+    def _to_mask(self, select_ids):  # 將點 ID（vtkIdTypeArray 或序列）轉為布林遮罩。
+        n = self.poly_data.GetNumberOfPoints()
+        if isinstance(select_ids, vtk.vtkDataArray):
+            ids = nps.vtk_to_numpy(select_ids) if select_ids.GetNumberOfTuples() else np.zeros(0, dtype=np.int64)
+        else:
+            ids = np.asarray(select_ids, dtype=np.int64)
+        mask = np.zeros(n, dtype=bool)
+        mask[ids[(ids >= 0) & (ids < n)]] = True  # 忽略無效的點 ID。
+        return mask
+
+    def select(self, select_ids, mode="union"):  # 以向量化的集合運算更新選取狀態。
+        """
+        參數:
+            select_ids: 選取的點 ID（vtkIdTypeArray 或序列）
+            mode: "replace" 取代、"union" 聯集、"subtract" 差集
+        """
+        new = self._to_mask(select_ids)
+        current = self.mask if self.mask is not None and len(self.mask) == len(new) else None  # 模型點數改變時舊選取失效。
+        if mode == "subtract":
+            self.mask = current & ~new if current is not None else None
+        elif mode == "union" and current is not None:
+            self.mask = current | new
+        else:
+            self.mask = new
+        self.update_highlight()
+
+    def invert(self):  # 反轉選取。
+        self.mask = ~self.mask if self.mask is not None else np.ones(self.poly_data.GetNumberOfPoints(), dtype=bool)
+        self.update_highlight()
+
+    def clear(self):  # 清除選取（O(1)：只丟棄遮罩並隱藏演員）。
+        self.mask = None
+        self.actor.VisibilityOff()
+
+    def selected_ids(self):  # 返回目前選取的點 ID（vtkIdTypeArray，與 LassoInteractor.selected_ids 相同格式）。
+        ids = np.flatnonzero(self.mask) if self.mask is not None else np.zeros(0, dtype=np.int64)
+        return nps.numpy_to_vtkIdTypeArray(ids.astype(nps.ID_TYPE_CODE), deep=True)
+
+    def update_highlight(self):  # 依遮罩更新唯一的高亮演員。
+        ids = np.flatnonzero(self.mask) if self.mask is not None else np.zeros(0, dtype=np.int64)
+        verts = vtk.vtkCellArray()  # 每個選取頂點一個頂點單元。
+        verts.SetData(nps.numpy_to_vtkIdTypeArray(np.arange(len(ids) + 1, dtype=nps.ID_TYPE_CODE), deep=True),
+                      nps.numpy_to_vtkIdTypeArray(ids.astype(nps.ID_TYPE_CODE), deep=True))
+        self.highlight.SetPoints(self.poly_data.GetPoints())  # 共用模型的點，不複製座標。
+        self.highlight.SetVerts(verts)
+        self.actor.SetVisibility(len(ids) > 0)
+        self.render()
+
+    def show_all_area(self, select_ids, mode="union"):  # 高亮顯示選取的點（預設與目前的選取取聯集）。
+        self.select(select_ids, mode)
+
+    def render(self):  # 重新渲染窗口。
+        self.renderer.GetRenderWindow().Render()
         if self.interactor is not None:  # 如果交互器存在，再次渲染（可能為兼容性）。
             self.interactor.GetRenderWindow().Render()
 
-    def unRenderAllSelectors(self):  # 移除所有高亮演員。
-        for colorActor in self.colorActors:  # 迭代高亮演員列表。
-            self.renderer.RemoveActor(colorActor)  # 移除每個演員。
+    def unRenderAllSelectors(self):  # 清除選取並隱藏高亮演員。
+        self.clear()
         if self.interactor:  # 如果交互器存在，重新渲染。
-            self.interactor.GetRenderWindow().Render()
\ No newline at end of file
+            self.interactor.GetRenderWindow().Render()
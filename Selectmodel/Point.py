@@ -1,6 +1,9 @@
-# 主要目的：此程式碼定義了兩個基於 VTK 的類：`TrimVisualize` 和 `PointInteractor`，用於牙科 3D 模型處理場景中的交互式點選和線段可視化。`TrimVisualize` 負責將點連接到線段並以綠色線條顯示；`PointInteractor` 繼承自 `vtk.vtkInteractorStyleTrackballCamera`，允許用戶通過左鍵點選 3D 模型表面上的點，計算最短路徑並投影到表面，支援封閉區域選擇、撤銷（undo）和重做（redo）功能，適用於 `HighlightInteractorStyle` 和 `AimodelView` 的交互式模型編輯。
+# 主要目的：此程式碼定義了兩個基於 VTK 的類：`TrimVisualize` 和 `PointInteractor`，用於牙科 3D 模型處理場景中的交互式點選和線段可視化。`TrimVisualize` 負責將點連接到線段並以綠色線條顯示；`PointInteractor` 繼承自 `vtk.vtkInteractorStyleTrackballCamera`，允許用戶通過左鍵點選 3D 模型表面上的點，將相鄰點間的線段一次批次投影到表面（拾取器與投影結構來自每個模型只建立一次的 `SelectionIndex`，整條路徑共用一個折線演員），也可切換為邊緣描繪模式，以曲率加權的 `vtkDijkstraGraphGeodesicPath` 沿表面計算測地路徑（圖與路徑皆快取），支援封閉區域選擇、撤銷（undo）和重做（redo）功能，適用於 `HighlightInteractorStyle` 和 `AimodelView` 的交互式模型編輯。
 
 import vtk  # 導入 VTK 庫，用於 3D 模型處理和視覺化。
+import numpy as np  # 導入 NumPy 庫，用於批次投影計算。
+from vtkmodules.util import numpy_support as nps  # 導入 VTK NumPy 支援模組，用於 VTK 和 NumPy 陣列轉換。
+from .selectionindex import SelectionIndex  # 導入共用的選取索引（拾取器、表面投影器）。
 
 class TrimVisualize:
     def __init__(self, renderer):  # 初始化方法，接收 VTK 渲染器。
@@ -27,6 +30,25 @@ class TrimVisualize:
         self.trim_actor.GetProperty().SetColor(0.0, 1.0, 0.0)  # 設置線段顏色為綠色（RGB: 0, 1, 0）。
         self.renderer.AddActor(self.trim_actor)  # 將演員添加到渲染器。
 
+    def set_path(self, points):  # 以一條折線顯示整條路徑（重複呼叫時只更新資料，不建立新演員）。
+        """
+        參數:
+            points: NumPy 陣列 [N, 3]，路徑上依序的點
+        """
+        self.projected_points.SetData(nps.numpy_to_vtk(np.ascontiguousarray(points, dtype=np.float64), deep=True))  # 一次設置所有點。
+        lines = vtk.vtkCellArray()  # 一個折線單元連接所有點。
+        if len(points) >= 2:
+            lines.InsertNextCell(len(points), list(range(len(points))))
+        self.poly_data_trim.SetPoints(self.projected_points)
+        self.poly_data_trim.SetLines(lines)
+        if self.trim_actor.GetMapper() is None:  # 第一次呼叫時設置映射器與演員。
+            self.trim_mapper.SetInputData(self.poly_data_trim)
+            self.trim_actor.SetMapper(self.trim_mapper)
+            self.trim_actor.GetProperty().SetLineWidth(3)  # 設置線段寬度為 3 像素。
+            self.trim_actor.GetProperty().SetColor(0.0, 1.0, 0.0)  # 設置線段顏色為綠色（RGB: 0, 1, 0）。
+            self.renderer.AddActor(self.trim_actor)
+        self.poly_data_trim.Modified()
+
     def removeLine(self):  # 移除線段可視化。
         self.renderer.RemoveActor(self.trim_actor)  # 從渲染器中移除線段演員。
         self.projected_points.Initialize()  # 重置點集。
@@ -35,24 +57,28 @@ class TrimVisualize:
         self.trim_actor = vtk.vtkActor()  # 重置演員。
 
 class PointInteractor(vtk.vtkInteractorStyleTrackballCamera):  # 定義 PointInteractor 類，繼承 VTK 軌跡球攝影機交互樣式。
-    def __init__(self, poly_data):  # 初始化方法，接收 PolyData（3D 模型數據）。
+    def __init__(self, poly_data, index=None):  # 初始化方法，接收 PolyData（3D 模型數據）與可選的共用選取索引。
         super().__init__()  # 調用父類的初始化方法。
         self.poly_data = poly_data  # 儲存傳入的 PolyData（例如上顎或下顎模型）。
-        self.dijkstra = vtk.vtkDijkstraGraphGeodesicPath()  # 初始化 Dijkstra 測地路徑計算器。
+        self.index = index or SelectionIndex(poly_data)  # 共用的選取索引（拾取器、表面投影器）。
+        self.dijkstra = vtk.vtkDijkstraGraphGeodesicPath()  # 初始化 Dijkstra 測地路徑計算器（輸入未修改時會沿用已建立的圖）。
         self.selectionPoints = vtk.vtkPoints()  # 初始化 VTK 點集，用於儲存選取點。
-        self.dijkstra.SetInputData(self.poly_data)  # 設置 Dijkstra 計算器的輸入 PolyData。
+        self.geodesicMode = False  # 邊緣描繪模式：相鄰點之間以測地路徑連接，而非投影的直線。
+        self.curvatureWeight = 1.0  # 曲率權重（0 表示純測地距離；越大越傾向沿著高曲率的邊緣走）。
+        self.geodesicMTime = None  # 建立測地圖時 PolyData 的修改時間。
+        self.geodesicCache = {}  # (起點 ID, 終點 ID) -> 路徑點，undo/redo 或重複點選時直接沿用。
         self.sphereActors = []  # 初始化球體演員列表，用於顯示選取點。
-        self.lineActors = []  # 初始化線段演員列表，用於顯示最短路徑。
+        self.segments = []  # 相鄰選取點之間投影到表面的路徑（NumPy 陣列），最後可能多一段封閉線段。
+        self.closed = False  # 路徑是否已封閉（最後一段連回第一點）。
+        self.trim = None  # 整條路徑共用的折線可視化。
         self.pathList = []  # 初始化選取點 ID 列表。
-        self.meshNumList = []  # 初始化網格數量列表（用於記錄線段數）。
-        self.pick3DCoord = vtk.vtkCellPicker()  # 初始化 VTK 單元拾取器，用於 3D 點選。
+        self.pick3DCoord = self.index.picker  # 共用選取索引中的單元拾取器，用於 3D 點選。
         self.loop = vtk.vtkImplicitSelectionLoop()  # 初始化 VTK 隱式選擇迴圈，用於封閉區域。
         self.total_length = 0  # 初始化總路徑長度（未使用，可能是遺留代碼）。
         # 新增功能：支援 undo 和 redo
         self.redoSphereActors = []  # 初始化 redo 球體演員列表。
-        self.redoLineActors = []  # 初始化 redo 線段演員列表。
+        self.redoSegments = []  # 初始化 redo 路徑線段列表。
         self.redoPathList = []  # 初始化 redo 選取點 ID 列表。
-        self.redoMeshNumList = []  # 初始化 redo 網格數量列表。
         self.total_path_point = vtk.vtkPoints()  # 初始化 VTK 點集，用於儲存所有投影點。
         self.AddObserver("LeftButtonPressEvent", self.onLeftButtonDown)  # 綁定左鍵按下事件。
 
@@ -60,14 +86,11 @@ class PointInteractor(vtk.vtkInteractorStyleTrackballCamera):  # 定義 PointInt
         self.renderer = renderer  # 儲存傳入的渲染器。
         self.interactor = interactor  # 儲存傳入的交互器。
         clickPos = interactor.GetEventPosition()  # 獲取滑鼠點擊位置（螢幕坐標）。
-        picker = vtk.vtkCellPicker()  # 創建 VTK 單元拾取器。
-        picker.Pick(clickPos[0], clickPos[1], 0, renderer)  # 在點擊位置進行 3D 拾取。
-        self.pick3DCoord.Pick(clickPos[0], clickPos[1], 0, renderer)  # 更新 3D 拾取器。
-        self.clickPath = vtk.vtkPoints()  # 初始化點選路徑點集。
-        print(f"point coord: {self.poly_data.GetPoint(picker.GetPointId())}")  # 打印拾取點的 3D 座標。
-        if picker.GetCellId() != -1:  # 如果拾取到有效單元。
-            self.pathList.append(picker.GetPointId())  # 將拾取點 ID 添加到路徑列表。
-            point_position = self.poly_data.GetPoint(picker.GetPointId())  # 獲取拾取點的 3D 座標。
+        point_id, cell_id = self.index.pick(clickPos[0], clickPos[1], renderer)  # 以共用拾取器（使用已建立的定位器）進行 3D 拾取。
+        if cell_id != -1:  # 如果拾取到有效單元。
+            print(f"point coord: {self.poly_data.GetPoint(point_id)}")  # 打印拾取點的 3D 座標。
+            self.pathList.append(point_id)  # 將拾取點 ID 添加到路徑列表。
+            point_position = self.poly_data.GetPoint(point_id)  # 獲取拾取點的 3D 座標。
             sphereSource = vtk.vtkSphereSource()  # 創建 VTK 球體源。
             sphereSource.SetCenter(point_position)  # 設置球體中心為拾取點座標。
             sphereSource.SetRadius(0.02)  # 設置球體半徑為 0.02。
@@ -79,42 +102,92 @@ class PointInteractor(vtk.vtkInteractorStyleTrackballCamera):  # 定義 PointInt
             renderer.AddActor(self.sphereActor)  # 將球體演員添加到渲染器。
             self.sphereActors.append(self.sphereActor)  # 將球體演員添加到列表。
             print(f"pathList: {self.pathList}")  # 打印當前路徑點 ID 列表。
-            for i in range(len(self.pathList)):  # 迭代路徑點，更新點選路徑。
-                self.total_path_point.InsertNextPoint(self.poly_data.GetPoint(self.pathList[i]))  # 將點添加到總路徑點集。
-                self.clickPath.InsertNextPoint(self.poly_data.GetPoint(self.pathList[i]))  # 將點添加到當前點選路徑。
-            for i in range(len(self.pathList) - 1):  # 迭代路徑點，計算相鄰點間的最短路徑。
-                self.project_line_to_surface(self.poly_data.GetPoint(self.pathList[i]), 
-                                             self.poly_data.GetPoint(self.pathList[i + 1]))  # 投影線段到表面。
+            if len(self.pathList) >= 2:  # 只計算新增的一段路徑（之前的路徑不重算）。
+                self.openPath()  # 若路徑已封閉，先移除封閉線段。
+                self.segments.append(self.traceSegment(self.pathList[-2], self.pathList[-1]))  # 計算連接兩點的路徑。
+                self.updatePath()  # 更新折線與總路徑點集。
+
+    def setGeodesicMode(self, enabled):  # 切換邊緣描繪（測地路徑）模式；只影響之後新增的線段。
+        self.geodesicMode = enabled
+
+    def traceSegment(self, start_id, end_id):  # 計算兩個選取點之間的路徑。
+        if self.geodesicMode:
+            return self.geodesic_path(start_id, end_id)  # 沿表面的測地路徑。
+        return self.project_line_to_surface(self.poly_data.GetPoint(start_id), self.poly_data.GetPoint(end_id))  # 投影到表面的直線。
+
+    def updateGeodesicGraph(self):  # 建立曲率加權的測地圖；模型被修改後才重建。
+        if self.geodesicMTime == self.poly_data.GetMTime():
+            return
+        curvatures = vtk.vtkCurvatures()  # 計算平均曲率。
+        curvatures.SetInputData(self.poly_data)
+        curvatures.SetCurvatureTypeToMean()
+        curvatures.Update()
+        curvature = np.abs(nps.vtk_to_numpy(curvatures.GetOutput().GetPointData().GetArray("Mean_Curvature")))
+        scale = np.percentile(curvature, 95) if len(curvature) else 0.0  # 以 95 百分位正規化，避免少數尖點主導。
+        curvature = np.clip(curvature / scale, 0.0, 1.0) if scale > 0 else np.zeros_like(curvature)
+        weights = nps.numpy_to_vtk((1.0 + self.curvatureWeight * curvature).astype(np.float32), deep=True)  # Dijkstra 以邊長 / 權重^2 為成本，高曲率的邊較便宜。
+        weights.SetName("GeodesicWeight")
+        graph = vtk.vtkPolyData()  # 淺拷貝 PolyData，權重只加在拷貝上，不改動原模型的標量。
+        graph.ShallowCopy(self.poly_data)
+        graph.GetPointData().SetScalars(weights)
+        self.dijkstra.SetInputData(graph)
+        self.dijkstra.SetUseScalarWeights(self.curvatureWeight > 0)
+        self.geodesicMTime = self.poly_data.GetMTime()
+        self.geodesicCache.clear()  # 模型改變後舊路徑失效。
+
+    def geodesic_path(self, start_id, end_id):  # 計算兩個頂點之間的測地路徑。
+        """
+        返回:
+            NumPy 陣列 [M, 3]，由 start_id 到 end_id 沿網格邊的路徑點
+        """
+        self.updateGeodesicGraph()
+        key = (start_id, end_id)
+        if key not in self.geodesicCache:
+            self.dijkstra.SetStartVertex(start_id)
+            self.dijkstra.SetEndVertex(end_id)
+            self.dijkstra.Update()
+            ids = nps.vtk_to_numpy(self.dijkstra.GetIdList())[::-1]  # Dijkstra 的路徑由終點排到起點，反轉為起點到終點。
+            points = nps.vtk_to_numpy(self.poly_data.GetPoints().GetData())
+            self.geodesicCache[key] = np.array(points[ids], dtype=np.float64)
+        return self.geodesicCache[key]
+
+    def getProjector(self):  # 取得表面投影器（由共用選取索引管理，模型被修改後才重建）。
+        return self.index.projector()
 
     def project_line_to_surface(self, pt1, pt2, num_samples=100):  # 將兩點間的線段投影到模型表面。
-        line_points = []  # 初始化線段點列表。
-        for i in range(num_samples):  # 生成 100 個均勻分佈的線段點。
-            t = i / (num_samples - 1)  # 計算插值參數 t。
-            x = pt1[0] + t * (pt2[0] - pt1[0])  # 插值計算 x 座標。
-            y = pt1[1] + t * (pt2[1] - pt1[1])  # 插值計算 y 座標。
-            z = pt1[2] + t * (pt2[2] - pt1[2])  # 插值計算 z 座標。
-            line_points.append((x, y, z))  # 添加插值點到列表。
-        locator = vtk.vtkCellLocator()  # 創建 VTK 單元定位器。
-        locator.SetDataSet(self.poly_data)  # 設置定位器的輸入 PolyData。
-        locator.BuildLocator()  # 構建定位器以加速查找。
-        projected_points = []  # 初始化投影點列表。
-        for point in line_points:  # 迭代線段點。
-            closest_point = [0.0, 0.0, 0.0]  # 初始化最近點座標。
-            cell_id = vtk.reference(0)  # 初始化單元 ID。
-            sub_id = vtk.reference(0)  # 初始化子單元 ID。
-            dist2 = vtk.reference(0.0)  # 初始化距離平方。
-            locator.FindClosestPoint(point, closest_point, cell_id, sub_id, dist2)  # 查找最近的表面點。
-            projected_points.append(closest_point)  # 添加投影點到列表。
-            self.total_path_point.InsertNextPoint(closest_point)  # 將投影點添加到總路徑點集。
-        create_line = TrimVisualize(self.renderer)  # 創建 TrimVisualize 實例。
-        create_line.connect_point_to_line(projected_points)  # 將投影點連接到線段並可視化。
-        self.lineActors.append(create_line.trim_actor)  # 將線段演員添加到列表。
+        """
+        返回:
+            NumPy 陣列 [num_samples, 3]，線段上均勻取樣並投影到表面的點
+        """
+        t = np.linspace(0.0, 1.0, num_samples)[:, None]  # 插值參數。
+        pt1, pt2 = np.asarray(pt1, dtype=np.float64), np.asarray(pt2, dtype=np.float64)
+        return self.getProjector().project(pt1 + t * (pt2 - pt1))  # 以共用的靜態定位器精確投影所有取樣點。
+
+    def updatePath(self):  # 以目前的線段更新折線可視化與總路徑點集。
+        if self.segments:
+            path = np.vstack([self.segments[0]] + [segment[1:] for segment in self.segments[1:]])  # 相鄰線段共用端點，只保留一次。
+        else:
+            path = np.zeros((0, 3))
+        loop = path[:-1] if self.closed else path  # 封閉時最後一點與第一點重複，迴圈中只保留一次。
+        self.total_path_point.SetData(nps.numpy_to_vtk(np.ascontiguousarray(loop), deep=True))  # 一次更新總路徑點集（供 keep_select_area 使用）。
+        if self.trim is None:
+            self.trim = TrimVisualize(self.renderer)
+        self.trim.set_path(path)  # 只更新同一個折線演員。
         self.interactor.GetRenderWindow().Render()  # 重新渲染窗口。
 
+    def openPath(self):  # 移除封閉線段。
+        if self.closed:
+            self.segments.pop()
+            self.closed = False
+
     def closeArea(self, interactor, renderer):  # 封閉選取區域並可視化。
-        pt1 = self.poly_data.GetPoint(self.pathList[-1])  # 獲取最後一個點的座標。
-        pt2 = self.poly_data.GetPoint(self.pathList[0])  # 獲取第一個點的座標。
-        self.project_line_to_surface(pt1, pt2)  # 將最後一點與第一點連接到表面。
+        self.renderer, self.interactor = renderer, interactor
+        if len(self.pathList) < 2:  # 至少需要兩個點才能封閉。
+            return
+        self.openPath()  # 避免重複封閉。
+        self.segments.append(self.traceSegment(self.pathList[-1], self.pathList[0]))  # 將最後一點與第一點連接。
+        self.closed = True
+        self.updatePath()
         self.loop.SetLoop(self.total_path_point)  # 設置隱式選擇迴圈的點集。
         clip = vtk.vtkClipPolyData()  # 創建 VTK 裁切器。
         clip.SetInputData(self.poly_data)  # 設置輸入 PolyData。
@@ -132,16 +205,16 @@ class PointInteractor(vtk.vtkInteractorStyleTrackballCamera):  # 定義 PointInt
     def unRenderAllSelectors(self, renderer, interactor):  # 移除所有選取點和線段的可視化。
         for actor in self.sphereActors:  # 迭代球體演員列表。
             renderer.RemoveActor(actor)  # 移除每個球體演員。
-        for actor in self.lineActors:  # 迭代線段演員列表。
-            renderer.RemoveActor(actor)  # 移除每個線段演員。
+        if self.trim is not None:  # 移除路徑折線。
+            self.trim.removeLine()
+            self.trim = None
         self.sphereActors.clear()  # 清空球體演員列表。
-        self.lineActors.clear()  # 清空線段演員列表。
+        self.segments.clear()  # 清空路徑線段列表。
+        self.closed = False
         self.pathList.clear()  # 清空選取點 ID 列表。
-        self.meshNumList.clear()  # 清空網格數量列表。
         self.redoSphereActors.clear()  # 清空 redo 球體演員列表。
-        self.redoLineActors.clear()  # 清空 redo 線段演員列表。
+        self.redoSegments.clear()  # 清空 redo 路徑線段列表。
         self.redoPathList.clear()  # 清空 redo 選取點 ID 列表。
-        self.redoMeshNumList.clear()  # 清空 redo 網格數量列表。
         self.total_path_point.Reset()  # 重置總路徑點集。
         interactor.GetRenderWindow().Render()  # 重新渲染窗口。
 
@@ -151,18 +224,10 @@ class PointInteractor(vtk.vtkInteractorStyleTrackballCamera):  # 定義 PointInt
         self.redoSphereActors.append(last_sphere)  # 將球體演員添加到 redo 列表。
         last_path_point = self.pathList.pop()  # 移除最後一個選取點 ID。
         self.redoPathList.append(last_path_point)  # 將選取點 ID 添加到 redo 列表。
-        self.interactor.GetRenderWindow().Render()  # 重新渲染窗口以更新畫面。
-        if len(self.meshNumList) == 0:  # 如果網格數量列表為空。
-            return  # 直接返回。
-        for i in range(self.meshNumList[-1]):  # 迭代最後一組線段數量。
-            if i == self.meshNumList[-1] - 1:  # 避免超出範圍。
-                break
-            last_line = self.lineActors.pop()  # 移除最後一個線段演員。
-            self.renderer.RemoveActor(last_line)  # 從渲染器中移除線段演員。
-            self.redoLineActors.append(last_line)  # 將線段演員添加到 redo 列表。
-        last_mesh_num = self.meshNumList.pop()  # 移除最後一個網格數量。
-        self.redoMeshNumList.append(last_mesh_num)  # 將網格數量添加到 redo 列表。
-        self.interactor.GetRenderWindow().Render()  # 重新渲染窗口。
+        self.openPath()  # 撤銷後路徑不再封閉。
+        if len(self.segments) > max(len(self.pathList) - 1, 0):  # 移除連到被撤銷點的線段。
+            self.redoSegments.append(self.segments.pop())  # 將線段添加到 redo 列表。
+        self.updatePath()  # 更新折線並重新渲染窗口。
 
     def redo(self):  # 重做上一步撤銷的操作。
         redo_sphere = self.redoSphereActors.pop()  # 移除 redo 列表中的球體演員。
@@ -170,15 +235,7 @@ class PointInteractor(vtk.vtkInteractorStyleTrackballCamera):  # 定義 PointInt
         self.sphereActors.append(redo_sphere)  # 將球體演員添加到球體演員列表。
         redo_path_point = self.redoPathList.pop()  # 移除 redo 列表中的選取點 ID。
         self.pathList.append(redo_path_point)  # 將選取點 ID 添加到路徑列表。
-        self.interactor.GetRenderWindow().Render()  # 重新渲染窗口以更新畫面。
-        if len(self.redoMeshNumList) == 0:  # 如果 redo 網格數量列表為空。
-            return  # 直接返回。
-        for i in range(self.redoMeshNumList[-1]):  # 迭代 redo 網格數量。
-            if i == self.redoMeshNumList[-1] - 1:  # 避免超出範圍。
-                break
-            redo_line = self.redoLineActors.pop()  # 移除 redo 列表中的線段演員。
-            self.renderer.AddActor(redo_line)  # 將線段演員添加到渲染器。
-            self.lineActors.append(redo_line)  # 將線段演員添加到線段演員列表。
-        redo_mesh_num = self.redoMeshNumList.pop()  # 移除 redo 列表中的網格數量。
-        self.meshNumList.append(redo_mesh_num)  # 將網格數量添加到網格數量列表。
-        self.interactor.GetRenderWindow().Render()  # 重新渲染窗口。
\ No newline at end of file
+        self.openPath()  # 重做前先移除封閉線段。
+        if len(self.pathList) >= 2 and self.redoSegments:  # 還原連到此點的線段。
+            self.segments.append(self.redoSegments.pop())
+        self.updatePath()  # 更新折線並重新渲染窗口。
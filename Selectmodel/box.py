@@ -1,13 +1,15 @@
-# 主要目的：此程式碼定義了一個基於 VTK 的 `BoxInteractor` 類，繼承自 `vtkInteractorStyleRubberBand3D`，用於在牙科 3D 模型處理場景中實現矩形框選功能。它允許用戶通過滑鼠左鍵拖曳選擇 3D 模型的區域，生成選取範圍的幾何數據並以紅色高亮顯示，支援與 `HighlightInteractorStyle` 和 `AimodelView` 結合使用，提供交互式模型編輯功能。
+# 主要目的：此程式碼定義了一個基於 VTK 的 `BoxInteractor` 類，繼承自 `vtkInteractorStyleRubberBand3D`，用於在牙科 3D 模型處理場景中實現矩形框選功能。它允許用戶通過滑鼠左鍵拖曳選擇 3D 模型的區域，以共用的 `SelectionIndex` 一次判斷所有頂點是否在選取錐體內，生成選取範圍的幾何數據並以紅色高亮顯示，支援與 `HighlightInteractorStyle` 和 `AimodelView` 結合使用，提供交互式模型編輯功能。
 
 from vtkmodules.vtkInteractionStyle import vtkInteractorStyleRubberBand3D  # 導入 VTK 的橡皮筋 3D 交互樣式，作為基類。
 import vtk  # 導入 VTK 庫，用於 3D 模型處理和視覺化。
+from .selectionindex import SelectionIndex  # 導入共用的選取索引。
 
 class BoxInteractor(vtkInteractorStyleRubberBand3D):  # 定義 BoxInteractor 類，繼承自橡皮筋 3D 交互樣式。
-    def __init__(self, poly_data, renderer):  # 初始化方法，接收 PolyData 和渲染器。
+    def __init__(self, poly_data, renderer, index=None):  # 初始化方法，接收 PolyData、渲染器與可選的共用選取索引。
         super().__init__()  # 調用父類的初始化方法。
         self.renderer = renderer  # 儲存傳入的 VTK 渲染器（來自 AimodelView）。
         self.poly_data = poly_data  # 儲存傳入的 PolyData（3D 模型數據，例如上顎或下顎模型）。
+        self.index = index or SelectionIndex(poly_data)  # 共用的選取索引（頂點陣列、單元連接陣列）。
         self.selection_frustum = None  # 初始化選取範圍的錐體（frustum），用於定義框選區域。
         self.extract_geometry = None  # 初始化幾何提取器，用於提取選取範圍的數據。
         self.selected_poly_data = None  # 初始化選取的 PolyData，儲存框選結果。
@@ -68,15 +70,10 @@ class BoxInteractor(vtkInteractorStyleRubberBand3D):  # 定義 BoxInteractor 類
         self.boxArea.AreaPick(self.start_position[0], self.start_position[1], 
                               self.end_position[0], self.end_position[1], self.renderer)  # 使用區域拾取器選擇框選範圍。
         self.selection_frustum = self.boxArea.GetFrustum()  # 獲取框選範圍的錐體（frustum）。
-        self.extract_geometry = vtk.vtkExtractGeometry()  # 創建幾何提取器。
-        self.extract_geometry.SetInputData(self.poly_data)  # 設置輸入 PolyData（3D 模型數據）。
-        self.extract_geometry.SetImplicitFunction(self.selection_frustum)  # 設置框選錐體作為提取函數。
-        self.extract_geometry.Update()  # 更新幾何提取器。
-        self.selected_poly_data = self.extract_geometry.GetOutput()  # 獲取提取的 PolyData。
-        self.geometry_filter = vtk.vtkGeometryFilter()  # 創建幾何過濾器，確保輸出為 PolyData。
-        self.geometry_filter.SetInputData(self.selected_poly_data)  # 設置輸入為提取的 PolyData。
-        self.geometry_filter.Update()  # 更新幾何過濾器。
-        return self.geometry_filter.GetOutput()  # 返回框選區域的 PolyData。
+        inside = self.index.vertices_in_frustum(self.selection_frustum)  # 以共用索引的頂點陣列一次判斷所有頂點。
+        cell_ids = self.index.cells_with_all_vertices(inside)  # 與 vtkExtractGeometry 相同，只保留完全在錐體內的單元。
+        self.selected_poly_data = self.index.extract_cells(cell_ids)  # 框選區域的 PolyData。
+        return self.selected_poly_data  # 返回框選區域的 PolyData。
 
     def show_all_area(self, input_model):  # 高亮顯示框選區域。
         mapper = vtk.vtkPolyDataMapper()  # 創建 VTK 映射器。
@@ -1,9 +1,12 @@
-# 主要目的：此程式碼定義了一個基於 VTK 的 `HighlightInteractorStyle` 類，繼承自 `vtk.vtkInteractorStyleTrackballCamera`，用於在牙科 3D 模型處理場景中實現交互式選取功能。它支援三種選取模式（矩形框 box、點選 point、套索 lasso），並提供刪除選取區域、穿透模式切換和模型高亮顯示的功能，適用於 `AimodelView` 等視圖的交互式 3D 模型編輯。
+# 主要目的：此程式碼定義了一個基於 VTK 的 `HighlightInteractorStyle` 類，繼承自 `vtk.vtkInteractorStyleTrackballCamera`，用於在牙科 3D 模型處理場景中實現交互式選取功能。它支援三種選取模式（矩形框 box、點選 point、套索 lasso），三種模式共用在 `SetPolyData` 中建立一次的 `SelectionIndex`，並提供刪除選取區域、穿透模式切換和模型高亮顯示的功能，適用於 `AimodelView` 等視圖的交互式 3D 模型編輯。
 
 import vtk  # 導入 VTK 庫，用於 3D 模型處理和視覺化。
+import numpy as np  # 導入 NumPy 庫，用於向量化的單元刪除。
 from .Point import PointInteractor  # 導入 PointInteractor 類，用於點選交互。
 from .Lasso import LassoInteractor, LassoAreaColor  # 導入 LassoInteractor 和 LassoAreaColor 類，用於套索選取和高亮顯示。
 from .box import BoxInteractor  # 導入 BoxInteractor 類，用於矩形框選取。
+from .selectionindex import SelectionIndex  # 導入共用的選取索引。
+from vtkmodules.util import numpy_support as nps  # 導入 VTK NumPy 支援模組，用於 VTK 和 NumPy 陣列轉換。
 
 class HighlightInteractorStyle(vtk.vtkInteractorStyleTrackballCamera):  # 定義 HighlightInteractorStyle 類，繼承 VTK 的軌跡球攝影機交互樣式。
     def __init__(self, interactor, renderer):  # 初始化方法，接收交互器和渲染器。
@@ -38,7 +41,8 @@ class HighlightInteractorStyle(vtk.vtkInteractorStyleTrackballCamera):  # 定義
 
     def SetPolyData(self, polydata):  # 設置 PolyData（來自 AimodelView 的上顎或下顎模型數據）。
         self.polydata = polydata  # 儲存傳入的 PolyData。
-        self.point_func = PointInteractor(self.polydata)  # 初始化點選交互物件，傳入 PolyData。
+        self.selection_index = SelectionIndex(self.polydata)  # 每個模型只建立一次的選取索引，三種選取模式共用。
+        self.point_func = PointInteractor(self.polydata, self.selection_index)  # 初始化點選交互物件，傳入 PolyData。
 
     def toggleMode(self, mode):  # 切換選取模式的通用方法。
         if self.modes[mode]:  # 如果當前模式已啟用。
@@ -54,7 +58,7 @@ class HighlightInteractorStyle(vtk.vtkInteractorStyleTrackballCamera):  # 定義
             self._deactivate_lasso()  # 清除套索相關物件和渲染數據。
         if self.box_func:  # 如果矩形框選物件已存在。
             return  # 防止重複創建，直接返回。
-        self.box_func = BoxInteractor(self.polydata, self.renderer)  # 創建矩形框選物件。
+        self.box_func = BoxInteractor(self.polydata, self.renderer, self.selection_index)  # 創建矩形框選物件（共用選取索引）。
         self.box_func.interactorSetter(self.interactor)  # 設置框選物件的交互器。
         self.toggleMode("box")  # 切換到矩形框選模式。
 
@@ -74,13 +78,14 @@ class HighlightInteractorStyle(vtk.vtkInteractorStyleTrackballCamera):  # 定義
             self._deactivate_box()  # 清除框選相關物件和渲染數據。
         if self.lasso_func:  # 如果套索選取物件已存在。
             return  # 防止重複創建，直接返回。
-        self.lasso_func = LassoInteractor(self.polydata, self.renderer)  # 創建套索選取物件。
+        self.lasso_func = LassoInteractor(self.polydata, self.renderer, self.selection_index)  # 創建套索選取物件（共用選取索引）。
         self.lassoareacolor = LassoAreaColor(self.polydata, self.renderer, self.interactor)  # 創建套索區域高亮物件。
         self.lasso_func.interactorSetter(self.interactor)  # 設置套索物件的交互器。
         self.toggleMode("lasso")  # 切換到套索選取模式。
 
     def _deactivate_lasso(self):  # 停用套索選取模式。
         self.lassoareacolor.unRenderAllSelectors()  # 移除所有套索選取的高亮區域。
+        self.renderer.RemoveActor(self.lassoareacolor.actor)  # 移除套索的高亮演員。
         self.lasso_func.interactorSetter(None)  # 清除套索物件的交互器。
         self.lasso_func = None  # 清空套索物件。
 
@@ -105,13 +110,22 @@ class HighlightInteractorStyle(vtk.vtkInteractorStyleTrackballCamera):  # 定義
                 self.keep_select_area(self.point_func.total_path_point)  # 保留點選區域。
                 self.point_func.unRenderAllSelectors(self.renderer, self.GetInteractor())  # 移除點選高亮區域。
             elif self.modes["lasso"]:  # 如果處於套索選取模式。
-                self.lassoRemove(self.polydata, self.actor, self.lasso_func.selected_ids)  # 刪除套索選取區域的內容。
+                self.lassoRemove(self.polydata, self.actor, self.lassoareacolor.selected_ids())  # 刪除目前累積的套索選取區域。
                 self.lassoareacolor.unRenderAllSelectors()  # 移除套索高亮區域。
 
+        # 反轉套索選取
+        elif self.key in ["i", "I"] and self.modes["lasso"]:  # 按下 'i' 或 'I' 鍵且處於套索選取模式。
+            self.lassoareacolor.invert()  # 反轉選取區域。
+
         # 點選取範圍封閉
         elif self.key == "Return" and self.modes["point"]:  # 按下 'Return' 鍵且處於點選模式。
             self.point_func.closeArea(self.interactor, self.renderer)  # 封閉點選區域。
 
+        # 點選模式的邊緣描繪（測地路徑）切換
+        elif self.key in ["g", "G"] and self.modes["point"]:  # 按下 'g' 或 'G' 鍵且處於點選模式。
+            self.point_func.setGeodesicMode(not self.point_func.geodesicMode)  # 切換測地路徑模式。
+            print(f"Geodesic mode: {self.point_func.geodesicMode}")  # 打印測地路徑模式狀態。
+
         # 穿透模式切換
         elif self.key in ["t", "T"]:  # 按下 't' 或 'T' 鍵。
             self.throughBtnMode = not self.throughBtnMode  # 切換穿透模式開關。
@@ -165,28 +179,12 @@ class HighlightInteractorStyle(vtk.vtkInteractorStyleTrackballCamera):  # 定義
         self.GetInteractor().GetRenderWindow().Render()  # 重新渲染窗口。
 
     def lassoRemove(self, poly_data, actor, selected_ids):  # 刪除套索選取區域的內容。
-        poly_data.BuildLinks()  # 構建 PolyData 的連結，支援頂點到單元的反向查詢。
-        points = vtk.vtkPoints()  # 創建 VTK 點集，用於儲存選取的點。
-        cell_ids = vtk.vtkIdList()  # 創建 VTK ID 列表，用於儲存單元 ID。
-        cells_to_delete = set()  # 創建集合，儲存需要刪除的單元 ID。
-        for i in range(selected_ids.GetNumberOfTuples()):  # 迭代所有選取的點 ID。
-            try:  # 嘗試處理每個點 ID。
-                point_id = selected_ids.GetValue(i)  # 獲取點的 ID。
-                x, y, z = poly_data.GetPoint(point_id)  # 獲取點的座標。
-                points.InsertNextPoint(x, y, z)  # 將點添加到點集。
-                poly_data.GetPointCells(point_id, cell_ids)  # 獲取與該點關聯的單元 ID。
-                for j in range(cell_ids.GetNumberOfIds()):  # 迭代所有關聯單元 ID。
-                    cells_to_delete.add(cell_ids.GetId(j))  # 將單元 ID 添加到刪除集合。
-            except Exception as e:  # 捕獲異常（例如無效點 ID）。
-                print(f"[ERROR] point_id={point_id}: {e}")  # 打印錯誤訊息。
-        new_cells = vtk.vtkCellArray()  # 創建新的單元陣列，用於儲存保留的單元。
-        id_list = vtk.vtkIdList()  # 創建 VTK ID 列表，用於儲存單元中的點 ID。
-        for cid in range(poly_data.GetNumberOfCells()):  # 迭代所有單元 ID。
-            if cid in cells_to_delete:  # 如果單元 ID 在刪除集合中。
-                continue  # 跳過該單元。
-            poly_data.GetCellPoints(cid, id_list)  # 獲取單元的點 ID。
-            new_cells.InsertNextCell(id_list)  # 將單元添加到新的單元陣列。
-        poly_data.SetPolys(new_cells)  # 設置 PolyData 的新單元陣列。
+        index = self.selection_index  # 使用共用選取索引的頂點到面鄰接表，不需要 BuildLinks 與逐點查詢。
+        point_ids = nps.vtk_to_numpy(selected_ids) if selected_ids.GetNumberOfTuples() else np.zeros(0, dtype=np.int64)  # 選取的點 ID。
+        point_ids = point_ids[(point_ids >= 0) & (point_ids < poly_data.GetNumberOfPoints())]  # 忽略無效的點 ID。
+        keep = np.ones(poly_data.GetNumberOfPolys(), dtype=bool)  # 需要保留的單元。
+        keep[index.faces_of_vertices(point_ids)] = False  # 刪除與選取點相鄰的單元。
+        poly_data.SetPolys(index.extract_cells(np.flatnonzero(keep)).GetPolys())  # 設置 PolyData 的新單元陣列。
         poly_data.Modified()  # 標記 PolyData 已修改。
         self.mapper.ScalarVisibilityOff()  # 關閉標量可視化，避免使用選取顏色渲染。
         self.mapper.SetInputData(poly_data)  # 設置映射器的輸入為更新後的 PolyData。
@@ -221,7 +219,8 @@ class HighlightInteractorStyle(vtk.vtkInteractorStyleTrackballCamera):  # 定義
         elif self.modes["point"]:  # 如果處於點選模式。
             self.point_func.onLeftButtonDown(obj, event, self.GetInteractor(), self.renderer)  # 處理點選事件。
         elif self.modes["lasso"]:  # 如果處於套索選取模式。
-            self.lassoareacolor.unRenderAllSelectors()  # 移除所有套索高亮區域。
+            if not (self.GetInteractor().GetShiftKey() or self.GetInteractor().GetControlKey()):  # 未按 Shift/Ctrl 時重新選取。
+                self.lassoareacolor.unRenderAllSelectors()  # 清除套索選取。
             self.lasso_func.interactorSetter(self.interactor)  # 設置套索物件的交互器。
             self.lasso_func.onLeftButtonDown(obj, event)  # 記錄套索選取起始位置。
             self.lasso_func.onMouseMove(obj, event)  # 處理滑鼠移動以繪製套索路徑。
@@ -234,4 +233,5 @@ class HighlightInteractorStyle(vtk.vtkInteractorStyleTrackballCamera):  # 定義
         elif self.modes["lasso"]:  # 如果處於套索選取模式。
             self.lasso_func.interactorSetter(self.interactor)  # 設置套索物件的交互器。
             self.lasso_func.onLeftButtonUp(obj, event)  # 記錄套索選取結束位置。
-            self.lassoareacolor.show_all_area(self.lasso_func.selected_ids)  # 顯示套索選取高亮區域。
+            mode = "union" if self.GetInteractor().GetShiftKey() else "subtract" if self.GetInteractor().GetControlKey() else "replace"  # Shift 加選、Ctrl 減選。
+            self.lassoareacolor.show_all_area(self.lasso_func.selected_ids, mode)  # 顯示套索選取高亮區域。
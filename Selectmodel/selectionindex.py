@@ -0,0 +1,118 @@
+# 主要目的：此程式碼定義 `SelectionIndex` 類，為每個模型建立一次共用的選取加速結構（頂點陣列、單元連接陣列、頂點到面的鄰接表、靜態單元定位器與使用該定位器的拾取器，以及使用同一定位器求精確最近點的表面投影器 `SurfaceProjector`），供 `HighlightInteractorStyle` 的矩形框選（`BoxInteractor`）、點選（`PointInteractor`）與套索（`LassoInteractor`）三種模式共用。模型被修改（例如刪除選取區域）後會依 PolyData 的修改時間自動重建，切換模式或重複選取時不需要重建任何結構。
+
+import vtk  # 導入 VTK 庫，用於定位器與拾取器。
+import numpy as np  # 導入 NumPy 庫，用於向量化的選取計算。
+from vtkmodules.util import numpy_support as nps  # 導入 VTK NumPy 支援模組，用於 VTK 和 NumPy 陣列轉換。
+
+class SurfaceProjector:
+    def __init__(self, locator, num_cells):  # 初始化方法，接收已建立的靜態單元定位器，不另外建立查詢結構。
+        """
+        將任意點投影到模型表面（精確的最近點）。直接使用 SelectionIndex 的 vtkStaticCellLocator，
+        每個點呼叫一次 C++ 的 FindClosestPoint（每段路徑約 100 個點，成本很低）。
+        """
+        self.locator = locator  # 共用的靜態單元定位器。
+        self.num_cells = num_cells  # 模型的單元數；為 0 時沒有表面可投影。
+
+    def project(self, points):  # 批次投影。
+        """
+        參數:
+            points: NumPy 陣列 [N, 3]
+        返回:
+            NumPy 陣列 [N, 3]，表面上的最近點（模型沒有任何單元時原樣返回）
+        """
+        points = np.asarray(points, dtype=np.float64)
+        if self.num_cells == 0:  # 空模型：沒有可投影的表面。
+            return points.copy()
+        closest = np.empty_like(points)
+        point = [0.0, 0.0, 0.0]
+        cell_id, sub_id, dist2 = vtk.reference(0), vtk.reference(0), vtk.reference(0.0)
+        for i, p in enumerate(points):
+            self.locator.FindClosestPoint(p, point, cell_id, sub_id, dist2)
+            closest[i] = point
+        return closest
+
+class SelectionIndex:
+    def __init__(self, poly_data):  # 初始化方法，接收 PolyData（3D 模型數據）。
+        self.poly_data = poly_data  # 儲存傳入的 PolyData。
+        self.mtime = None  # 建立索引時 PolyData 的修改時間。
+        self.update()
+
+    def update(self):  # 模型被修改後重建索引；未修改時不做任何事。
+        if self.mtime == self.poly_data.GetMTime():
+            return
+        points = self.poly_data.GetPoints()
+        self.points = nps.vtk_to_numpy(points.GetData()) if points is not None else np.zeros((0, 3))  # 頂點陣列（不複製）。
+        polys = self.poly_data.GetPolys()
+        self.connectivity = nps.vtk_to_numpy(polys.GetConnectivityArray())  # 單元連接陣列。
+        self.offsets = nps.vtk_to_numpy(polys.GetOffsetsArray())  # 單元偏移陣列。
+        self.cell_of = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))  # 每個連接項所屬的單元。
+        order = np.argsort(self.connectivity, kind="stable")  # 頂點到面的鄰接表（CSR 格式）。
+        self.vertex_faces = self.cell_of[order]
+        self.vertex_face_offsets = np.searchsorted(self.connectivity[order], np.arange(len(self.points) + 1))
+        self.locator = vtk.vtkStaticCellLocator()  # 靜態單元定位器。
+        self.locator.SetDataSet(self.poly_data)
+        self.locator.BuildLocator()
+        self.picker = vtk.vtkCellPicker()  # 共用的拾取器，使用已建立的定位器。
+        self.picker.AddLocator(self.locator)
+        self._projector = None  # 表面投影器，第一次使用時才建立。
+        self.mtime = self.poly_data.GetMTime()
+
+    def pick(self, x, y, renderer):  # 在螢幕坐標拾取模型。
+        """
+        返回:
+            (point_id, cell_id)；未拾取到時 cell_id 為 -1
+        """
+        self.update()
+        self.picker.Pick(x, y, 0, renderer)
+        return self.picker.GetPointId(), self.picker.GetCellId()
+
+    def projector(self):  # 取得表面投影器。
+        self.update()
+        if self._projector is None:
+            self._projector = SurfaceProjector(self.locator, len(self.offsets) - 1)
+        return self._projector
+
+    def faces_of_vertices(self, vertex_ids):  # 取得與頂點相鄰的所有面（不重複）。
+        self.update()
+        vertex_ids = np.asarray(vertex_ids, dtype=np.int64)
+        starts = self.vertex_face_offsets[vertex_ids]
+        lengths = self.vertex_face_offsets[vertex_ids + 1] - starts
+        gather = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())  # 展開每個頂點的鄰接範圍。
+        return np.unique(self.vertex_faces[gather])
+
+    def vertices_in_frustum(self, planes):  # 判斷頂點是否在選取錐體（vtkPlanes，例如 vtkAreaPicker 的 frustum）內。
+        """
+        返回:
+            布林陣列 [頂點數]；與 vtkExtractGeometry 相同，所有平面的隱式函數值皆為負時視為在內部
+        """
+        self.update()
+        normals = nps.vtk_to_numpy(planes.GetNormals())
+        origins = nps.vtk_to_numpy(planes.GetPoints().GetData())
+        inside = np.ones(len(self.points), dtype=bool)
+        for normal, origin in zip(normals, origins):  # 錐體只有 6 個平面，每個平面一次處理所有頂點。
+            inside &= (self.points - origin) @ normal < 0
+        return inside
+
+    def cells_with_all_vertices(self, vertex_mask):  # 找出所有頂點都被選取的單元。
+        self.update()
+        if len(self.connectivity) == 0:
+            return np.zeros(0, dtype=np.int64)
+        selected = np.minimum.reduceat(vertex_mask[self.connectivity].astype(np.uint8), self.offsets[:-1]) > 0
+        return np.flatnonzero(selected)
+
+    def extract_cells(self, cell_ids):  # 取出指定的單元（共用原本的點，不複製座標）。
+        """
+        返回:
+            vtkPolyData，只含指定單元的多邊形
+        """
+        self.update()
+        cell_mask = np.zeros(len(self.offsets) - 1, dtype=bool)
+        cell_mask[cell_ids] = True
+        sizes = np.diff(self.offsets)[cell_mask]
+        cells = vtk.vtkCellArray()
+        cells.SetData(nps.numpy_to_vtkIdTypeArray(np.concatenate(([0], np.cumsum(sizes))).astype(nps.ID_TYPE_CODE), deep=True),
+                      nps.numpy_to_vtkIdTypeArray(self.connectivity[cell_mask[self.cell_of]].astype(nps.ID_TYPE_CODE), deep=True))
+        subset = vtk.vtkPolyData()
+        subset.SetPoints(self.poly_data.GetPoints())
+        subset.SetPolys(cells)
+        return subset
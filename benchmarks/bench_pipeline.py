@@ -0,0 +1,431 @@
+# 主要目的：此程式碼是深度圖到網格流程的可重現基準測試。它使用 `benchmarks/synthetic.py` 產生的合成牙弓、牙冠與深度圖（不需要病患資料），在數種尺寸下計時 `readmodel` 深度圖擷取、`pictureedgblack`/`fillwhite` 後處理、`DentalModelReconstructor.reconstruct`（BB 與 OBB）、`smooth_stl`、`collision.check_collision` / `compute_contact_distances`、ICP 對齊（`AlignmentEngine` 與舊版 VTK ICP 的時間、RMS 與平均距離比較）、FSIM 與舊版參考分數的一致性檢查（`fsim.check_reference`）以及 `MeshProcessor` 各階段，並將結果寫成 JSON（含 commit 與環境資訊）。以 `--compare` 指定先前的結果檔即可列出各階段的速度變化，檢查兩個 commit 之間是否退步。
+#
+# 用法（於專案根目錄）：
+#   python -m benchmarks.bench_pipeline --sizes small medium --repeat 3 --output bench_results.json
+#   python -m benchmarks.bench_pipeline --compare old_results.json --output new_results.json
+
+import os  # 導入 os 模組，用於檔案路徑操作。
+import sys  # 導入 sys 模組，用於設定匯入路徑。
+import json  # 導入 json 模組，用於輸出結果。
+import time  # 導入 time 模組，用於計時。
+import shutil  # 導入 shutil 模組，用於清除暫存資料夾。
+import argparse  # 導入 argparse 模組，用於命令列參數。
+import platform  # 導入 platform 模組，用於記錄環境。
+import statistics  # 導入 statistics 模組，用於計算中位數。
+import subprocess  # 導入 subprocess 模組，用於讀取 git commit。
+import tempfile  # 導入 tempfile 模組，用於建立暫存資料夾。
+import itertools  # 導入 itertools 模組，用於循環產生查詢變換。
+from datetime import datetime  # 導入 datetime，用於記錄執行時間。
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # 專案根目錄。
+if ROOT not in sys.path:  # 讓腳本可直接執行（python benchmarks/bench_pipeline.py）。
+    sys.path.insert(0, ROOT)
+
+import cv2  # 導入 OpenCV，用於寫出深度圖。
+import numpy as np  # 導入 NumPy 庫。
+import vtk  # 導入 VTK 庫。
+from vtkmodules.util import numpy_support as nps  # 導入 VTK NumPy 支援模組，用於讀取距離陣列。
+from benchmarks import synthetic  # 合成資料。
+from Otherfunction import readmodel, pictureedgblack, fillwhite, trianglegood, trianglegoodobbox  # 待測模組。
+import collision  # 碰撞檢測模組。
+
+# 各尺寸的合成資料參數：arch 為牙弓頰舌向格點數（頂點數約 3 * arch^2）、image 為深度圖邊長、crown 為牙冠球面解析度
+SIZES = {
+    "small": {"arch": 60, "image": 128, "crown": 40},
+    "medium": {"arch": 150, "image": 256, "crown": 80},
+    "large": {"arch": 300, "image": 512, "crown": 160},
+}
+
+def check_contacts(result):  # 檢查 check_collision 的結果。
+    """check_collision 內部捕獲例外並返回 (0, None, None, None)；合成牙弓一定互相接觸，因此沒有結果或接觸數為 0 都視為失敗"""
+    if result is None or result[2] is None:
+        return "collision detection failed"
+    if result[0] == 0:
+        return "no contacts"
+    return None
+
+class BenchmarkRunner:
+    def __init__(self, work_dir, repeat=3, stages=None):  # 初始化方法，接收暫存資料夾、重複次數與要執行的階段。
+        self.work_dir = work_dir  # 暫存資料夾（合成資料與中間檔案）。
+        self.repeat = repeat  # 每個階段的重複次數。
+        self.stages = stages  # 只執行名稱包含這些字串的階段（None 表示全部）。
+        self.results = []  # 計時結果。
+
+    def enabled(self, stage):  # 判斷階段是否需要執行。
+        return not self.stages or any(name in stage for name in self.stages)
+
+    def record(self, stage, size, seconds, error=None, meta=None):  # 記錄一個階段的結果。
+        entry = {"stage": stage, "size": size, "seconds": seconds, "meta": meta or {}}
+        if seconds:
+            entry.update(min=min(seconds), median=statistics.median(seconds), mean=statistics.fmean(seconds))
+        if error:
+            entry["error"] = error
+        self.results.append(entry)
+        status = f"median {entry['median']:.4f} s" if seconds else "no timing"
+        print(f"[{size:>6}] {stage:<40} {status}" + (f"  ({error})" if error else ""))
+
+    def time_stage(self, stage, size, func, setup=None, meta=None, check=None):  # 重複執行並計時一個階段。
+        """
+        計時 `func(setup())`；setup 不列入計時（例如每次重新載入輸入）。發生例外時記錄錯誤並停止重複。
+        check: 可選，接收結果並返回錯誤訊息（結果有效時返回 None），用於內部吞掉例外、以返回值表示失敗的函式；
+               檢查失敗時只記錄錯誤、不記錄時間（失敗路徑的耗時沒有意義），並返回 None。
+        返回最後一次執行的結果。
+        """
+        if not self.enabled(stage):
+            return None
+        seconds, result, error = [], None, None
+        for _ in range(self.repeat):
+            args = setup() if setup else None
+            begin = time.perf_counter()
+            try:
+                result = func(args) if setup else func()
+            except Exception as e:  # 合成資料不一定適用所有階段，記錄錯誤後繼續其他階段。
+                error = f"{type(e).__name__}: {e}"
+                break
+            seconds.append(time.perf_counter() - begin)
+        if error is None and check is not None:
+            error = check(result)
+            if error:
+                seconds, result = [], None
+        self.record(stage, size, seconds, error, meta)
+        return result
+
+    # ------------------------------
+    # 深度圖擷取與後處理
+    # ------------------------------
+    def bench_capture(self, size, lower_path):
+        lower = readmodel.load_3d_model(lower_path)
+        actor = readmodel.create_actor(lower, (0.98, 0.98, 0.92))
+        renderer = vtk.vtkRenderer()
+        render_window = vtk.vtkRenderWindow()
+        render_window.SetOffScreenRendering(1)  # 無介面渲染。
+        render_window.AddRenderer(renderer)
+        render_window.SetSize(256, 256)  # 與 AI 流程相同的擷取尺寸。
+        renderer.AddActor(actor)
+        renderer.ResetCamera()
+        output_path = os.path.join(self.work_dir, f"capture_{size}.png")
+
+        def capture():
+            scale_filter = readmodel.setup_camera(renderer, render_window, None, actor, 0, 0)
+            render_window.Render()
+            readmodel.save_depth_image(output_path, scale_filter)
+
+        self.time_stage("readmodel.capture", size, capture, meta={"points": lower.GetNumberOfPoints()})
+        render_window.Finalize()
+
+    def bench_postprocess(self, size, depth_path):
+        work_path = os.path.join(self.work_dir, f"filled_{size}.png")
+
+        def bound_and_fill():
+            bound_image = pictureedgblack.get_image_bound(depth_path)
+            fillwhite.process_image_pair(bound_image, depth_path, work_path)
+
+        pixels = SIZES[size]["image"] ** 2
+        self.time_stage("pictureedgblack+fillwhite", size, bound_and_fill, meta={"pixels": pixels})
+        self.time_stage("pictureedgblack.mark_boundary_points", size,
+                        lambda: pictureedgblack.mark_boundary_points(depth_path, os.path.join(self.work_dir, "edge")),
+                        meta={"pixels": pixels})
+
+    # ------------------------------
+    # 重建與平滑
+    # ------------------------------
+    def bench_reconstruct(self, size, depth_path, lower_path):
+        pixels = SIZES[size]["image"] ** 2
+        bb_stl = os.path.join(self.work_dir, f"reconstruct_bb_{size}.stl")
+        obb_stl = os.path.join(self.work_dir, f"reconstruct_obb_{size}.stl")
+        self.time_stage("DentalModelReconstructor.reconstruct[BB]", size,
+                        lambda: trianglegood.DentalModelReconstructor(depth_path, lower_path, bb_stl).reconstruct(),
+                        meta={"pixels": pixels})
+        self.time_stage("DentalModelReconstructor.reconstruct[OBB]", size,
+                        lambda: trianglegoodobbox.DentalModelReconstructor(depth_path, lower_path, obb_stl).reconstruct(),
+                        meta={"pixels": pixels})
+        if os.path.exists(bb_stl):  # 以 BB 重建結果測試平滑。
+            self.time_stage("smooth_stl", size,
+                            lambda: trianglegoodobbox.smooth_stl(bb_stl, os.path.join(self.work_dir, f"smooth_{size}.stl")),
+                            meta={"pixels": pixels})
+
+    # ------------------------------
+    # 碰撞檢測
+    # ------------------------------
+    def bench_collision(self, size, lower, upper):
+        meta = {"points": lower.GetNumberOfPoints() + upper.GetNumberOfPoints()}
+        result = self.time_stage("collision.check_collision", size, lambda: collision.check_collision(upper, lower),
+                                 meta=meta, check=check_contacts)
+        if result is not None:
+            contacts, _, clean_upper, clean_lower = result
+            meta["contacts"] = contacts
+            self.time_stage("collision.compute_contact_distances", size,
+                            lambda: collision.compute_contact_distances(clean_lower, clean_upper),
+                            meta={"points": clean_lower.GetNumberOfPoints()})
+        # 參考結果失敗時 check_broad_phase 會記錄錯誤，不會靜默略過
+        self.check_broad_phase(size, upper, lower)
+        self.bench_collision_session(size, upper, lower)
+        # 簡化後的網格三角形邊長常大於距離帶，同樣必須與不篩選的結果一致
+        self.check_broad_phase(size, collision.simplify_mesh(upper, 0.9), collision.simplify_mesh(lower, 0.9),
+                               label="band,decimated")
+
+    def bench_collision_session(self, size, upper, lower):  # 互動式碰撞查詢（目標：每次查詢 < 50 ms）。
+        session = self.time_stage("CollisionSession.__init__", size, lambda: collision.CollisionSession(upper, lower),
+                                  meta={"points": lower.GetNumberOfPoints() + upper.GetNumberOfPoints()})
+        if session is None:
+            return
+        session.query(np.eye(4))  # 第一次查詢會建立 OBB 樹，不列入計時。
+        offsets = itertools.cycle(np.linspace(-0.3, 0.3, 7))  # 模擬使用者沿咬合方向微調下顎。
+
+        def query():
+            matrix = np.eye(4)
+            matrix[2, 3] = next(offsets)
+            return session.query(matrix)
+
+        self.time_stage("CollisionSession.query", size, query,
+                        meta={"points": session.moving.GetNumberOfPoints(), "target_ms": 50})
+
+    def check_broad_phase(self, size, upper, lower, label="band"):  # 寬相位篩選的回歸檢查。
+        """
+        計時帶 band 的 check_collision / compute_contact_distances，並與不篩選的結果比較：
+        接觸數與每個頂點的穿透深度都必須相同，不同時記錄為錯誤；任何一方執行失敗也記錄為錯誤，不會略過檢查。
+        """
+        stage = f"collision.broad_phase_check[{label}]"
+        if not all(self.enabled(name) for name in (stage, f"collision.check_collision[{label}]",
+                                                    f"collision.compute_contact_distances[{label}]")):
+            return
+        band = collision.CONTACT_BAND
+        reference = collision.check_collision(upper, lower)  # 不篩選的參考結果。
+        error = check_contacts(reference)
+        if error:
+            self.record(stage, size, [], f"reference check_collision: {error}")
+            return
+        contacts, _, clean_upper, clean_lower = reference
+        full = collision.compute_contact_distances(clean_lower, clean_upper)
+        expected = nps.vtk_to_numpy(full.GetPointData().GetScalars()).copy()  # 複製，之後的計算會覆寫標量。
+        banded = self.time_stage(f"collision.check_collision[{label}]", size,
+                                 lambda: collision.check_collision(upper, lower, band=band), check=check_contacts)
+        culled = self.time_stage(f"collision.compute_contact_distances[{label}]", size,
+                                 lambda: collision.compute_contact_distances(clean_lower, clean_upper, band=band),
+                                 meta={"points": clean_lower.GetNumberOfPoints()})
+        if banded is None or culled is None:
+            failed = [name for name, value in (("check_collision", banded), ("compute_contact_distances", culled))
+                      if value is None]
+            self.record(stage, size, [], f"banded {', '.join(failed)} failed")
+            return
+        depth = nps.vtk_to_numpy(culled.GetPointData().GetScalars())
+        mismatched = int(np.count_nonzero(~np.isclose(depth, expected, atol=1e-6)))
+        errors = []
+        if banded[0] != contacts:
+            errors.append(f"contacts {banded[0]} != {contacts}")
+        if mismatched:
+            errors.append(f"{mismatched} vertices differ")
+        self.record(stage, size, [], "; ".join(errors) or None,
+                    meta={"contacts": contacts, "mismatched_vertices": mismatched})
+
+    # ------------------------------
+    # FSIM（與舊版參考分數比較）
+    # ------------------------------
+    def bench_fsim(self, size):  # 計時 evaluate.fsim.check_reference，分數與舊版不一致時記錄為錯誤。
+        if not self.enabled("fsim.reference_check"):
+            return
+        try:
+            from evaluate import fsim  # 需要 PyTorch。
+        except ImportError as e:
+            self.record("fsim.reference_check", size, [], f"skipped: {e}")
+            return
+        self.time_stage("fsim.reference_check", size, fsim.check_reference)
+
+    # ------------------------------
+    # ICP 對齊（新舊演算法比較）
+    # ------------------------------
+    def bench_icp(self, size, defect, repair, seed=0):  # 在同一組牙冠上比較 AlignmentEngine 與舊版 VTK ICP。
+        """
+        計時多解析度點到平面 ICP（AlignmentEngine）與舊版 vtkIterativeClosestPointTransform（100 次迭代、
+        先對齊質心），兩者的點到平面 RMS 與平均距離都以同一個 AlignmentEngine.residual 在全解析度來源點上計算。
+        修復牙比缺陷牙多出被挖掉的頂部，殘差較低不代表對齊較準，因此另以 synthetic.crown_offset 的已知偏移
+        計算對齊誤差（來源點與正確位置的平均距離）；新演算法的對齊誤差大於舊版（或超過 0.01 mm）時記錄為錯誤。
+        """
+        try:
+            from meshlibStitching.alignment import AlignmentEngine  # 需要 SciPy。
+        except ImportError as e:
+            self.record("ICP", size, [], f"skipped: {e}")
+            return
+        normals_filter = vtk.vtkPolyDataNormals()  # 與 MeshProcessor.compute_normals 相同的設定。
+        normals_filter.SetInputData(defect)
+        normals_filter.SetAutoOrientNormals(False)
+        normals_filter.SetConsistency(True)
+        normals_filter.SplittingOff()
+        normals_filter.Update()
+        target = normals_filter.GetOutput()
+        engine = AlignmentEngine(nps.vtk_to_numpy(target.GetPoints().GetData()),
+                                 nps.vtk_to_numpy(target.GetPointData().GetNormals()))
+        source_points = nps.vtk_to_numpy(repair.GetPoints().GetData())
+        meta = {"points": repair.GetNumberOfPoints()}
+
+        def vtk_icp():
+            icp = vtk.vtkIterativeClosestPointTransform()
+            icp.SetSource(repair)
+            icp.SetTarget(defect)
+            icp.GetLandmarkTransform().SetModeToRigidBody()
+            icp.SetMaximumNumberOfIterations(100)
+            icp.SetMaximumMeanDistance(0.00001)
+            icp.SetStartByMatchingCentroids(True)
+            icp.Modified()
+            icp.Update()
+            matrix = np.array([icp.GetMatrix().GetElement(i, j) for i in range(4) for j in range(4)]).reshape(4, 4)
+            return matrix, icp.GetNumberOfIterations()
+
+        aligned = self.time_stage("ICP.alignment_engine", size, lambda: engine.align(source_points), meta=dict(meta))
+        reference = self.time_stage("ICP.vtk_icp", size, vtk_icp, meta=dict(meta))
+        if aligned is None or reference is None:
+            return
+        offset = synthetic.crown_offset(seed).GetMatrix()
+        truth = np.linalg.inv(np.array([offset.GetElement(i, j) for i in range(4) for j in range(4)]).reshape(4, 4))
+        expected = source_points @ truth[:3, :3].T + truth[:3, 3]  # 來源點的正確位置。
+        summary = {}
+        for name, (matrix, iterations) in (("alignment_engine", (aligned[0], aligned[1]["iterations"])),
+                                           ("vtk_icp", reference)):
+            rms, mean_distance = engine.residual(source_points, matrix)
+            moved = source_points @ matrix[:3, :3].T + matrix[:3, 3]
+            alignment_error = float(np.linalg.norm(moved - expected, axis=1).mean())
+            summary[name] = {"rms": rms, "mean_distance": mean_distance, "alignment_error": alignment_error,
+                             "iterations": int(iterations)}
+        new, old = summary["alignment_engine"], summary["vtk_icp"]
+        error = None
+        if new["alignment_error"] > max(old["alignment_error"], 0.01):
+            error = f"alignment error {new['alignment_error']:.6f} > VTK {old['alignment_error']:.6f}"
+        for name, label in (("alignment_engine", "新版"), ("vtk_icp", "VTK")):
+            result = summary[name]
+            print(f"[{size:>6}] ICP {label}: RMS {result['rms']:.6f}, 平均距離 {result['mean_distance']:.6f}, "
+                  f"對齊誤差 {result['alignment_error']:.6f}, 迭代 {result['iterations']}")
+        self.record("ICP.compare", size, [], error, meta=summary)
+
+    # ------------------------------
+    # MeshProcessor 縫合流程
+    # ------------------------------
+    def bench_mesh_processor(self, size, defect_path, repair_path):
+        try:
+            from meshlibStitching import stitchmodel  # 需要 meshlib 與 pymeshlab。
+        except ImportError as e:
+            self.record("MeshProcessor", size, [], f"skipped: {e}")
+            return
+
+        stages = ["run_icp", "extract_patch_from_points", "get_merge_source", "merge_meshes", "process_merged_mesh", "remesh", "smooth_subdivision",
+                  "append_stitch_only"]
+        timings = {stage: [] for stage in stages}
+        errors = {}
+        crop_loop = synthetic.make_crop_loop()
+        for index in range(self.repeat):  # 每次重複都使用新的處理器，避免沿用前一次的中間檔案。
+            output_folder = os.path.join(self.work_dir, f"stitch_{size}_{index}")
+            processor = stitchmodel.MeshProcessor(defect_path, repair_path, output_folder)
+            steps = [
+                ("run_icp", processor.run_icp),
+                # 以合成迴圈取代使用者點選，產生 merge_meshes 需要的 inlay_surface_*.stl
+                ("extract_patch_from_points", lambda: processor.extract_patch_from_points(outputs["run_icp"], crop_loop)),
+                ("get_merge_source", processor.get_merge_source),
+                ("merge_meshes", processor.merge_meshes),
+                ("process_merged_mesh", lambda: processor.process_merged_mesh(outputs["merge_meshes"])),
+                ("remesh", lambda: processor.remesh(outputs["process_merged_mesh"])),
+                ("smooth_subdivision", lambda: processor.smooth_subdivision(outputs["remesh"])),
+                ("append_stitch_only", lambda: processor.append_stitch_only(outputs["smooth_subdivision"],
+                                                                            outputs["merge_meshes"])),
+            ]
+            outputs = {}
+            for stage, func in steps:
+                if not self.enabled(f"MeshProcessor.{stage}") or stage in errors:
+                    break
+                begin = time.perf_counter()
+                try:
+                    outputs[stage] = func()
+                except Exception as e:  # 後續階段依賴此階段輸出，直接停止。
+                    errors[stage] = f"{type(e).__name__}: {e}"
+                    break
+                timings[stage].append(time.perf_counter() - begin)
+        for stage in stages:
+            if timings[stage] or stage in errors:
+                self.record(f"MeshProcessor.{stage}", size, timings[stage], errors.get(stage))
+
+    # ------------------------------
+    # 執行全部
+    # ------------------------------
+    def run(self, size, seed=0):
+        params = SIZES[size]
+        lower = synthetic.make_arch_mesh(params["arch"], seed)
+        upper = synthetic.make_arch_mesh(params["arch"], seed, upper=True)
+        lower_path = synthetic.write_polydata(lower, os.path.join(self.work_dir, f"lower_{size}.ply"))
+        depth_path = os.path.join(self.work_dir, f"depth_{size}.png")
+        cv2.imwrite(depth_path, synthetic.make_depth_map(params["image"], seed))
+        defect, repair = synthetic.make_crown_pair(params["crown"], seed)
+        defect_path = synthetic.write_polydata(defect, os.path.join(self.work_dir, f"defect_{size}.ply"))
+        repair_path = synthetic.write_polydata(repair, os.path.join(self.work_dir, f"repair_{size}.stl"))
+
+        self.bench_capture(size, lower_path)
+        self.bench_postprocess(size, depth_path)
+        self.bench_reconstruct(size, depth_path, lower_path)
+        self.bench_collision(size, lower, upper)
+        self.bench_icp(size, defect, repair, seed)
+        self.bench_fsim(size)
+        self.bench_mesh_processor(size, defect_path, repair_path)
+
+def git_commit():  # 取得目前的 commit（非 git 環境時返回 None）。
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(baseline, current):  # 比較兩份結果的中位數。
+    """
+    以 (stage, size) 對應兩份結果，返回文字表格；ratio > 1 表示目前版本較慢。
+    """
+    old = {(r["stage"], r["size"]): r for r in baseline["results"] if "median" in r}
+    header = f"{'stage':<44}{'size':>8}{'before(s)':>12}{'after(s)':>12}{'ratio':>8}"
+    lines = [header, "-" * len(header)]
+    for r in current["results"]:
+        key = (r["stage"], r["size"])
+        if "median" not in r or key not in old:
+            continue
+        ratio = r["median"] / old[key]["median"] if old[key]["median"] else float("inf")
+        flag = "  <-- slower" if ratio > 1.1 else ""
+        lines.append(f"{r['stage']:<44}{r['size']:>8}{old[key]['median']:>12.4f}{r['median']:>12.4f}{ratio:>8.2f}{flag}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="深度圖到網格流程的基準測試（合成資料）")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small", "medium"], help="要測試的尺寸")
+    parser.add_argument("--repeat", type=int, default=3, help="每個階段的重複次數")
+    parser.add_argument("--stages", nargs="*", help="只執行名稱包含這些字串的階段")
+    parser.add_argument("--seed", type=int, default=0, help="合成資料的亂數種子")
+    parser.add_argument("--output", default="bench_results.json", help="結果 JSON 路徑")
+    parser.add_argument("--compare", help="先前的結果 JSON，用於比較")
+    parser.add_argument("--keep", action="store_true", help="保留合成資料與中間檔案")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="pyqt5_bench_")
+    runner = BenchmarkRunner(work_dir, args.repeat, args.stages)
+    try:
+        for size in args.sizes:
+            runner.run(size, args.seed)
+    finally:
+        if args.keep:
+            print(f"合成資料與中間檔案保留於: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "vtk": vtk.vtkVersion.GetVTKVersion(),
+        "numpy": np.__version__,
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": runner.results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"已輸出基準測試結果: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print(compare_results(json.load(f), report))
+
+if __name__ == "__main__":
+    main()
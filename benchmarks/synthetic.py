@@ -0,0 +1,167 @@
+# 主要目的：此程式碼產生基準測試用的合成牙科資料（不需要任何病患資料）。`make_arch_mesh` 以馬蹄形牙弓加上牙冠與牙尖起伏生成上/下顎網格（上顎朝下並與下顎在牙尖處重疊，用於碰撞檢測）；`make_crown_pair` 生成缺陷牙（頂部被挖空）與修復牙（`crown_offset` 為其已知的剛體偏移），`make_crop_loop` 生成修復牙上圍住缺陷區域的裁切迴圈（取代使用者在畫面上點選的點），用於 `MeshProcessor` 的縫合流程；`make_depth_map` 生成與 AI 流程相同格式的 256x256 類深度圖。所有資料都以固定亂數種子產生，確保每次執行結果可重現。
+
+import numpy as np  # 導入 NumPy 庫，用於數值運算。
+import vtk  # 導入 VTK 庫，用於建立網格與寫檔。
+from vtkmodules.util import numpy_support as nps  # 導入 VTK NumPy 支援模組，用於陣列轉換。
+
+ARCH_RADIUS = 25.0  # 牙弓半徑（mm）。
+ARCH_WIDTH = 10.0  # 牙弓寬度（mm）。
+CROWN_HEIGHT = 6.0  # 牙冠高度（mm）。
+CROWN_SCALE = (4.0, 4.5, 3.5)  # 缺陷牙與修復牙的橢球半徑（mm）。
+DEFECT_CUT = 1.5  # 缺陷牙頂部被挖掉的高度（mm）。
+TEETH_COUNT = 14  # 單顎牙齒數量。
+
+def _grid_polydata(u_res, v_res):  # 建立 [0, 1] x [0, 1] 的三角形網格。
+    plane = vtk.vtkPlaneSource()  # 平面來源。
+    plane.SetOrigin(0.0, 0.0, 0.0)
+    plane.SetPoint1(1.0, 0.0, 0.0)
+    plane.SetPoint2(0.0, 1.0, 0.0)
+    plane.SetResolution(u_res, v_res)  # 解析度決定頂點數。
+    triangles = vtk.vtkTriangleFilter()  # 將四邊形轉為三角形。
+    triangles.SetInputConnection(plane.GetOutputPort())
+    triangles.Update()
+    polydata = vtk.vtkPolyData()
+    polydata.DeepCopy(triangles.GetOutput())
+    polydata.GetPointData().Initialize()  # 移除平面的法向量與紋理座標。
+    return polydata
+
+def _set_points(polydata, points):  # 以 NumPy 陣列取代網格頂點。
+    vtk_points = vtk.vtkPoints()
+    vtk_points.SetData(nps.numpy_to_vtk(np.ascontiguousarray(points, dtype=np.float64), deep=True))
+    polydata.SetPoints(vtk_points)
+
+def _crown_profile(u, v, rng):  # 牙弓上的牙冠高度（含牙尖與細微雜訊）。
+    u, v = np.asarray(u, dtype=np.float64), np.asarray(v, dtype=np.float64)  # vtkPlaneSource 的座標為 float32，sin(π) 可能略小於 0。
+    phase = (u * TEETH_COUNT) % 1.0  # 每顆牙內的位置。
+    tooth = np.clip(np.sin(np.pi * phase), 0.0, None) ** 0.5  # 牙齒間的齒間隙（截斷負值，避免開根號得到 NaN）。
+    ridge = np.clip(np.sin(np.pi * v), 0.0, None) ** 0.5  # 頰舌向的牙冠輪廓。
+    cusps = 0.4 * np.cos(2 * np.pi * phase) * np.cos(2 * np.pi * v)  # 牙尖與中央窩。
+    noise = rng.normal(0.0, 0.02, size=u.shape)  # 掃描雜訊。
+    return CROWN_HEIGHT * tooth * ridge + cusps * tooth * ridge + noise
+
+def make_arch_mesh(resolution, seed=0, upper=False):  # 生成合成牙弓網格。
+    """
+    生成馬蹄形牙弓網格。
+
+    參數:
+        resolution: 整數，頰舌向的格點數；沿牙弓方向為其 3 倍，頂點數約為 3 * resolution^2。
+        seed: 整數，亂數種子。
+        upper: 布林值，True 時生成朝下的上顎，牙尖與下顎互相重疊（產生接觸點）。
+
+    返回:
+        vtkPolyData，三角形網格（單位 mm）。
+    """
+    rng = np.random.default_rng(seed + (1 if upper else 0))  # 上下顎使用不同雜訊。
+    polydata = _grid_polydata(resolution * 3, resolution)
+    uv = nps.vtk_to_numpy(polydata.GetPoints().GetData()).astype(np.float64)  # (u, v, 0)，以 float64 計算。
+    u, v = uv[:, 0], uv[:, 1]
+    theta = np.pi * u  # 沿牙弓的角度。
+    radius = ARCH_RADIUS + ARCH_WIDTH * (v - 0.5)  # 頰舌向半徑。
+    z = _crown_profile(u, v, rng)
+    if upper:  # 上顎翻轉並放在下顎上方。
+        z = 2 * CROWN_HEIGHT - 0.2 - z
+    _set_points(polydata, np.column_stack((radius * np.cos(theta), radius * np.sin(theta), z)))
+    if upper:  # 翻轉三角形方向使法向量朝下。
+        reverse = vtk.vtkReverseSense()
+        reverse.SetInputData(polydata)
+        reverse.Update()
+        polydata = reverse.GetOutput()
+    return polydata
+
+def make_crown_pair(resolution, seed=0):  # 生成缺陷牙與修復牙。
+    """
+    生成縫合流程用的缺陷牙與修復牙。
+
+    參數:
+        resolution: 整數，球面的經緯解析度。
+        seed: 整數，亂數種子（決定缺陷牙的微小位移）。
+
+    返回:
+        (defect, repair): 兩個 vtkPolyData；defect 頂部被挖空，repair 為完整牙冠並帶有微小剛體偏移（供 ICP 對齊）。
+    """
+    sphere = vtk.vtkSphereSource()  # 以橢球近似牙冠。
+    sphere.SetThetaResolution(resolution)
+    sphere.SetPhiResolution(resolution)
+    sphere.SetRadius(1.0)
+    sphere.Update()
+
+    scale = vtk.vtkTransform()  # 縮放為牙冠尺寸（mm）。
+    scale.Scale(*CROWN_SCALE)
+    crown_filter = vtk.vtkTransformPolyDataFilter()
+    crown_filter.SetInputConnection(sphere.GetOutputPort())
+    crown_filter.SetTransform(scale)
+    crown_filter.Update()
+    crown = crown_filter.GetOutput()
+
+    plane = vtk.vtkPlane()  # 以平面挖掉頂部，形成缺陷。
+    plane.SetOrigin(0.0, 0.0, DEFECT_CUT)
+    plane.SetNormal(0.0, 0.0, -1.0)
+    clipper = vtk.vtkClipPolyData()
+    clipper.SetInputData(crown)
+    clipper.SetClipFunction(plane)
+    clipper.Update()
+    defect = vtk.vtkPolyData()
+    defect.DeepCopy(clipper.GetOutput())
+
+    repair_filter = vtk.vtkTransformPolyDataFilter()
+    repair_filter.SetInputData(crown)
+    repair_filter.SetTransform(crown_offset(seed))  # 修復牙的微小剛體偏移。
+    repair_filter.Update()
+    repair = vtk.vtkPolyData()
+    repair.DeepCopy(repair_filter.GetOutput())
+    return defect, repair
+
+def crown_offset(seed=0):  # make_crown_pair 中修復牙的剛體偏移。
+    """
+    返回 make_crown_pair 套用在修復牙上的剛體偏移（vtkTransform）；其反矩陣即為修復牙對齊缺陷牙的正確答案，供 ICP 基準測試比較。
+    """
+    rng = np.random.default_rng(seed)
+    offset = vtk.vtkTransform()
+    offset.Translate(*rng.uniform(-0.3, 0.3, size=3))
+    offset.RotateZ(rng.uniform(-3.0, 3.0))
+    return offset
+
+def make_crop_loop(count=48, margin=0.5):  # 生成修復牙上的裁切迴圈。
+    """
+    生成 `extract_patch_from_points` 使用的封閉迴圈：位於挖空邊緣上方 margin 處、落在牙冠表面上的點，
+    迴圈內即為要擷取的嵌體（inlay）表面。以牙冠自身座標表示（ICP 對齊後的修復牙與缺陷牙同一座標）。
+
+    參數:
+        count: 整數，迴圈點數。
+        margin: 浮點數，迴圈高於挖空平面的距離（mm）。
+
+    返回:
+        NumPy 陣列 [count, 3]。
+    """
+    a, b, c = CROWN_SCALE
+    z = DEFECT_CUT + margin
+    ring = np.sqrt(1.0 - (z / c) ** 2)  # 該高度的橢圓截面比例。
+    phi = np.linspace(0.0, 2 * np.pi, count, endpoint=False)
+    return np.column_stack((a * ring * np.cos(phi), b * ring * np.sin(phi), np.full(count, z)))
+
+def make_depth_map(size=256, seed=0):  # 生成類深度圖。
+    """
+    生成與 AI 流程相同格式的灰階深度圖：背景為 0，牙齒區域為 60-255 的圓頂與牙尖起伏。
+
+    參數:
+        size: 整數，影像邊長（像素）。
+        seed: 整數，亂數種子。
+
+    返回:
+        NumPy 陣列（uint8，size x size）。
+    """
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size] / (size - 1.0) * 2.0 - 1.0  # [-1, 1] 座標。
+    ellipse = (x / 0.7) ** 2 + (y / 0.85) ** 2  # 牙冠輪廓。
+    dome = np.clip(1.0 - ellipse, 0.0, 1.0) ** 0.5  # 圓頂。
+    cusps = 0.15 * np.cos(3 * np.pi * x) * np.cos(3 * np.pi * y)  # 牙尖。
+    depth = 60.0 + 195.0 * np.clip(dome + cusps * dome, 0.0, 1.0) + rng.normal(0.0, 1.0, size=x.shape)
+    depth[ellipse >= 1.0] = 0.0  # 背景。
+    return np.clip(depth, 0, 255).astype(np.uint8)
+
+def write_polydata(polydata, file_path):  # 依副檔名寫出網格（.ply 或 .stl）。
+    writer = vtk.vtkPLYWriter() if file_path.lower().endswith(".ply") else vtk.vtkSTLWriter()
+    writer.SetFileName(file_path)
+    writer.SetInputData(polydata)
+    writer.Write()
+    return file_path
@@ -1,7 +1,17 @@
-# 主要目的：此程式碼使用 VTK 庫載入並處理 3D 網格模型（支援 .ply 和 .stl 格式），執行網格簡化、碰撞檢測，並計算網格間的距離，生成包含距離熱圖的視覺化結果。
+# 主要目的：此程式碼使用 VTK 庫載入並處理 3D 網格模型（支援 .ply 和 .stl 格式），執行網格簡化、碰撞檢測（可先以包圍盒與距離帶的寬相位篩選候選單元，再對子網格做精確檢測），並計算網格間的距離，生成包含距離熱圖的視覺化結果。`CollisionSession` 則供互動式調整咬合使用：每個網格的加速結構只建立一次，每次查詢只傳入移動網格的 4x4 變換，並增量更新接觸數與穿透深度圖。
 
 import vtk  # 導入 VTK 庫，用於 3D 圖形處理和視覺化。
 import os  # 導入 os 模組，用於處理文件路徑和擴展名。
+import numpy as np  # 導入 NumPy 庫，用於批次距離計算。
+from vtkmodules.util import numpy_support as nps  # 導入 VTK NumPy 支援模組，用於陣列轉換。
+import scipy  # 導入 SciPy，用於判斷 cKDTree 平行查詢參數的名稱。
+from scipy.spatial import cKDTree  # 導入 KD-tree，用於寬相位（broad phase）的距離篩選。
+from scipy.sparse import coo_matrix  # 導入稀疏矩陣，用於建立網格邊的圖。
+from scipy.sparse.csgraph import connected_components  # 導入連通分量，用於傳遞距離帶外頂點的內外判斷。
+
+# cKDTree.query 的平行參數：SciPy 1.6 起為 workers，之前（專案鎖定的 1.4.1）為 n_jobs。
+KDTREE_PARALLEL = {"workers": -1} if tuple(int(v) for v in scipy.__version__.split(".")[:2]) >= (1, 6) else {"n_jobs": -1}
+CONTACT_BAND = 1.0  # 寬相位距離帶（mm）：只有距離另一顎在此範圍內的頂點與單元才進入精確檢測；應大於預期的最大穿透深度。
 
 # 載入網格模型，支援 .ply 與 .stl 格式
 def load_mesh(file_path):
@@ -31,8 +41,121 @@ def simplify_mesh(polydata, reduction=0.5):
     decimate.Update()  # 更新濾波器以執行簡化。
     return decimate.GetOutput()  # 返回簡化後的網格數據。
 
+# ------------------------------
+# 寬相位（broad phase）：以包圍盒與距離帶先篩選可能接觸的頂點與單元
+# ------------------------------
+def mesh_points(polydata):  # 取得網格頂點（NumPy 陣列，不複製）。
+    return nps.vtk_to_numpy(polydata.GetPoints().GetData())
+
+def _cell_arrays(polydata):  # 取得多邊形的連接陣列、偏移陣列與每個連接項所屬的單元索引。
+    polys = polydata.GetPolys()
+    conn = nps.vtk_to_numpy(polys.GetConnectivityArray())
+    offsets = nps.vtk_to_numpy(polys.GetOffsetsArray())
+    cell_of = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    return conn, offsets, cell_of
+
+def mesh_edges(polydata):  # 網格所有單元的邊（兩個端點索引陣列，內部邊會出現兩次）。
+    conn, offsets, _ = _cell_arrays(polydata)
+    nxt = np.arange(1, len(conn) + 1)  # 每個頂點在單元內的下一個頂點。
+    nxt[offsets[1:] - 1] = offsets[:-1]  # 單元最後一個頂點連回第一個。
+    return conn, conn[nxt]
+
+def max_edge_length(polydata):  # 網格最長邊的長度。
+    a, b = mesh_edges(polydata)
+    if len(a) == 0:
+        return 0.0
+    points = mesh_points(polydata)
+    return float(np.linalg.norm(points[a] - points[b], axis=1).max())
+
+def bounds_overlap(mesh1, mesh2, band):  # 檢查兩個網格擴展 band 後的軸向包圍盒（AABB）是否重疊。
+    b1, b2 = mesh1.GetBounds(), mesh2.GetBounds()
+    return all(b1[2 * k] - band <= b2[2 * k + 1] and b2[2 * k] - band <= b1[2 * k + 1] for k in range(3))
+
+def search_radius(source_mesh, target_mesh, band):  # 寬相位的頂點搜尋半徑。
+    """
+    頂點到目標表面的距離至少為 到最近目標頂點的距離 - 目標最長邊長；來源單元上任一點與其頂點的距離不超過來源最長邊長。
+    因此以 band + 兩者最長邊長 為上限時：
+      - 任何有一點距離目標表面在 band 內的來源單元，其所有頂點都會被選中（不會漏掉長邊三角形的接觸）；
+      - 未被選中的頂點距離表面超過 band + 來源最長邊長，其相連的邊不會穿過目標表面（見 far_inside_vertices）。
+    """
+    return band + max_edge_length(target_mesh) + max_edge_length(source_mesh)
+
+def near_vertices(source_mesh, target_mesh, band):  # 篩選距離目標表面可能在 band 內的頂點。
+    """
+    以目標頂點的 KD-tree 查詢，上限為 search_radius。
+    返回: 布林陣列 [source 頂點數]
+    """
+    tree = cKDTree(mesh_points(target_mesh))
+    d, _ = tree.query(mesh_points(source_mesh), k=1, distance_upper_bound=search_radius(source_mesh, target_mesh, band),
+                      **KDTREE_PARALLEL)
+    return np.isfinite(d)
+
+def far_inside_vertices(edges, points, computed, dist, dist_calc):  # 找出距離帶外、但位於目標內部（深度穿透）的頂點。
+    """
+    距離帶外的頂點離目標表面超過來源最長邊長，與鄰點之間的邊不會穿過表面，因此內外與鄰點相同。
+    以距離帶外頂點組成的連通分量傳遞內外判斷：與已計算頂點相鄰的分量沿用其符號，其餘分量各計算一個代表點。
+    參數:
+        edges: mesh_edges 的返回值
+        points: 頂點座標 [N, 3]（已變換到目標座標系）
+        computed: 布林陣列，已計算簽署距離的頂點（距離帶內）
+        dist: 簽署距離陣列，computed 位置有效
+        dist_calc: build_distance_function 的返回值
+    返回: 布林陣列 [N]，距離帶外且在目標內部的頂點
+    """
+    far = ~computed
+    if not far.any():
+        return far
+    a, b = edges
+    n = len(points)
+    inner = far[a] & far[b]  # 兩端都在距離帶外的邊。
+    graph = coo_matrix((np.ones(inner.sum(), dtype=np.int8), (a[inner], b[inner])), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+
+    inside = np.zeros(labels.max() + 1, dtype=bool)  # 每個分量是否在內部。
+    known = np.zeros(labels.max() + 1, dtype=bool)
+    cross = computed[a] & far[b]  # 已計算頂點 -> 距離帶外頂點的邊（兩個方向都會出現）。
+    known[labels[b[cross]]] = True
+    inside[labels[b[cross]]] = dist[a[cross]] < 0
+
+    far_labels, first = np.unique(labels[far], return_index=True)
+    unknown = ~known[far_labels]  # 沒有相鄰已計算頂點的分量，以一個代表點判斷。
+    if unknown.any():
+        representatives = np.flatnonzero(far)[first[unknown]]
+        inside[far_labels[unknown]] = signed_distances(points[representatives], dist_calc) < 0
+    return far & inside[labels]
+
+def extract_cells(polydata, vertex_mask):  # 取出含有被選頂點的單元（共用原本的點，不複製座標）。
+    conn, offsets, cell_of = _cell_arrays(polydata)
+    cell_mask = np.zeros(len(offsets) - 1, dtype=bool)
+    cell_mask[cell_of[vertex_mask[conn]]] = True  # 任一頂點被選中的單元。
+    sizes = np.diff(offsets)[cell_mask]
+    cells = vtk.vtkCellArray()
+    cells.SetData(nps.numpy_to_vtkIdTypeArray(np.concatenate(([0], np.cumsum(sizes))).astype(nps.ID_TYPE_CODE), deep=True),
+                  nps.numpy_to_vtkIdTypeArray(conn[cell_mask[cell_of]].astype(nps.ID_TYPE_CODE), deep=True))
+    subset = vtk.vtkPolyData()
+    subset.SetPoints(polydata.GetPoints())
+    subset.SetPolys(cells)
+    return subset
+
+def broad_phase(mesh1, mesh2, band=CONTACT_BAND):  # 寬相位篩選。
+    """
+    先以擴展 band 的 AABB 判斷兩網格是否可能接觸，再以距離帶選出雙方可能接觸的頂點與單元。
+    返回: (subset1, subset2, vertices1, vertices2)；包圍盒不重疊時返回 None
+    """
+    if not bounds_overlap(mesh1, mesh2, band):
+        return None
+    vertices1 = near_vertices(mesh1, mesh2, band)  # mesh1 中靠近 mesh2 的頂點。
+    vertices2 = near_vertices(mesh2, mesh1, band)  # mesh2 中靠近 mesh1 的頂點。
+    if not vertices1.any() or not vertices2.any():
+        return None
+    print(f"Broad phase: {vertices1.sum()}/{len(vertices1)} and {vertices2.sum()}/{len(vertices2)} vertices in band")
+    return extract_cells(mesh1, vertices1), extract_cells(mesh2, vertices2), vertices1, vertices2
+
 # 使用 VTK 的碰撞偵測模組檢查兩個模型是否發生碰撞
-def check_collision(mesh1, mesh2):
+def check_collision(mesh1, mesh2, band=None):
+    """
+    band: 可選，寬相位距離帶（mm）；提供時只對距離帶內的單元執行精確碰撞檢測（接觸的單元編號對應篩選後的子網格）
+    """
     try:
         clean1 = vtk.vtkCleanPolyData()  # 創建用於清理網格的濾波器（移除重複點等）。
         clean1.SetInputData(mesh1)  # 設置第一個網格作為輸入。
@@ -42,10 +165,18 @@ def check_collision(mesh1, mesh2):
         clean2.SetInputData(mesh2)  # 設置第二個網格作為輸入。
         clean2.Update()  # 更新濾波器以清理網格。
 
+        narrow1, narrow2 = clean1.GetOutput(), clean2.GetOutput()  # 精確檢測的輸入（預設為完整網格）。
+        if band is not None:  # 寬相位篩選。
+            candidates = broad_phase(narrow1, narrow2, band)
+            if candidates is None:  # 距離帶內沒有任何單元，不可能接觸。
+                print("Number of contacts: 0")
+                return 0, None, clean1.GetOutput(), clean2.GetOutput()
+            narrow1, narrow2 = candidates[0], candidates[1]
+
         collision_filter = vtk.vtkCollisionDetectionFilter()  # 創建碰撞檢測濾波器。
-        collision_filter.SetInputData(0, clean1.GetOutput())  # 設置第一個清理後的網格作為輸入 0。
+        collision_filter.SetInputData(0, narrow1)  # 設置第一個網格作為輸入 0。
         collision_filter.SetTransform(0, vtk.vtkTransform())  # 設置第一個網格的變換（無變換）。
-        collision_filter.SetInputData(1, clean2.GetOutput())  # 設置第二個清理後的網格作為輸入 1。
+        collision_filter.SetInputData(1, narrow2)  # 設置第二個網格作為輸入 1。
         collision_filter.SetMatrix(1, vtk.vtkMatrix4x4())  # 設置第二個網格的變換矩陣（無變換）。
         collision_filter.SetCollisionModeToAllContacts()  # 設置碰撞模式為檢測所有接觸點。
         collision_filter.GenerateScalarsOn()  # 啟用標量生成（用於存儲碰撞資訊）。
@@ -63,25 +194,160 @@ def check_collision(mesh1, mesh2):
         print(f"[Error] Collision detection failed: {e}")  # 打印錯誤訊息。
         return 0, None, None, None  # 返回空值表示碰撞檢測失敗。
 
-# 計算 mesh2 每個點到 mesh1 表面的距離，僅保留內部點（負距離）
-def compute_contact_distances(source_mesh, target_mesh):
+# 建立目標網格的簽署距離函數（使用靜態單元定位器，只建立一次）
+def build_distance_function(target_mesh):
     dist_calc = vtk.vtkImplicitPolyDataDistance()  # 創建距離計算濾波器。
-    dist_calc.SetInput(target_mesh)  # 設置目標網格（mesh1）作為距離計算的參考。
+    dist_calc.SetInput(target_mesh)  # 設置目標網格作為距離計算的參考。
+    if hasattr(dist_calc, "SetLocator"):  # 新版 VTK 可指定定位器；靜態單元定位器建立與查詢都比預設的 vtkCellLocator 快。
+        locator = vtk.vtkStaticCellLocator()
+        locator.SetDataSet(target_mesh)
+        locator.BuildLocator()
+        dist_calc.SetLocator(locator)
+    return dist_calc
 
-    distances = vtk.vtkFloatArray()  # 創建浮點數陣列用於存儲距離值。
-    distances.SetName("ContactDistance")  # 設置陣列名稱為 "ContactDistance"。
+# 一次計算所有點到目標表面的簽署距離（負值表示在目標內部）
+def signed_distances(points, dist_calc):
+    """
+    points: NumPy 陣列 [N, 3] 或 vtkDataArray（例如 polydata.GetPoints().GetData()）
+    dist_calc: build_distance_function 的返回值
+    返回: NumPy 陣列 [N]
+    """
+    if isinstance(points, np.ndarray):  # NumPy 陣列轉為 VTK 陣列（不複製）。
+        points = nps.numpy_to_vtk(np.ascontiguousarray(points, dtype=np.float64), deep=False)
+    values = vtk.vtkDoubleArray()  # 輸出陣列。
+    dist_calc.FunctionValue(points, values)  # 在 C++ 中一次計算所有點，取代逐點的 Python 迴圈。
+    return nps.vtk_to_numpy(values)
 
-    for i in range(source_mesh.GetNumberOfPoints()):  # 遍歷 source_mesh（mesh2）的每個點。
-        p = source_mesh.GetPoint(i)  # 獲取當前點的座標。
-        dist = dist_calc.EvaluateFunction(p)  # 計算該點到 target_mesh 的簽署距離（正負號表示內外）。
-        if dist < 0:  # 如果是內部點（負距離）。
-            distances.InsertNextValue(abs(dist))  # 存儲距離的絕對值（用於熱圖顯示）。
-        else:  # 如果是外部點。
-            distances.InsertNextValue(-1.0)  # 設置為 -1.0，表示外部點。
+# 計算 mesh2 每個點到 mesh1 表面的距離，僅保留內部點（負距離）
+def compute_contact_distances(source_mesh, target_mesh, band=None):
+    """
+    band: 可選，寬相位距離帶（mm）；提供時只對距離帶內的頂點與距離帶外但在目標內部（深度穿透）的頂點計算距離，
+          只有確定在目標外部的頂點才略過（結果與不篩選時相同）
+    """
+    dist_calc = build_distance_function(target_mesh)  # 建立距離函數（定位器只建立一次）。
+    if band is None:
+        dist = signed_distances(source_mesh.GetPoints().GetData(), dist_calc)  # 所有點的簽署距離。
+    else:
+        dist = np.ones(source_mesh.GetNumberOfPoints())  # 確定在外部的點。
+        points = mesh_points(source_mesh)
+        candidates = near_vertices(source_mesh, target_mesh, band)
+        if candidates.any():
+            dist[candidates] = signed_distances(points[candidates], dist_calc)  # 只計算候選頂點。
+        deep = far_inside_vertices(mesh_edges(source_mesh), points, candidates, dist, dist_calc)
+        if deep.any():
+            dist[deep] = signed_distances(points[deep], dist_calc)  # 深度穿透的頂點。
+
+    # 內部點（負距離）存儲距離的絕對值（用於熱圖顯示），外部點設置為 -1.0
+    contact = np.where(dist < 0, np.abs(dist), -1.0).astype(np.float32)
+    distances = nps.numpy_to_vtk(contact, deep=False)  # 以零複製方式包裝為 VTK 陣列（陣列參考由 VTK 物件保留）。
+    distances.SetName("ContactDistance")  # 設置陣列名稱為 "ContactDistance"。
 
     source_mesh.GetPointData().SetScalars(distances)  # 將距離陣列附加到 source_mesh 的點數據。
     return source_mesh  # 返回包含距離資訊的網格。
 
+def clean_mesh(polydata):  # 清理網格（移除重複點等）。
+    clean = vtk.vtkCleanPolyData()
+    clean.SetInputData(polydata)
+    clean.Update()
+    return clean.GetOutput()
+
+def to_vtk_matrix(matrix, target=None):  # 將 4x4 變換（NumPy、巢狀序列或 vtkMatrix4x4）寫入 vtkMatrix4x4。
+    target = target or vtk.vtkMatrix4x4()
+    if isinstance(matrix, vtk.vtkMatrix4x4):
+        target.DeepCopy(matrix)
+    else:
+        target.DeepCopy(np.asarray(matrix, dtype=np.float64).reshape(16).tolist())  # DeepCopy 會呼叫 Modified()。
+    return target
+
+# ------------------------------
+# 互動式碰撞檢測：加速結構只建立一次，每次查詢只更新變換
+# ------------------------------
+class CollisionSession:
+    def __init__(self, fixed_mesh, moving_mesh, band=CONTACT_BAND, reduction=None):  # 初始化方法，接收固定網格與移動網格。
+        """
+        建立一次性的加速結構（OBB 樹、靜態單元定位器、KD-tree），之後每次 query 只需要傳入移動網格的 4x4 變換。
+        參數:
+            fixed_mesh: vtkPolyData，固定的網格（例如上顎）
+            moving_mesh: vtkPolyData，使用者移動的網格（例如下顎），以自身座標表示
+            band: 距離帶（mm）；只有變換後距離固定網格在此範圍內的頂點才計算穿透深度
+            reduction: 可選，簡化比例（與 simplify_mesh 相同）
+        """
+        if reduction:
+            fixed_mesh, moving_mesh = simplify_mesh(fixed_mesh, reduction), simplify_mesh(moving_mesh, reduction)
+        self.fixed = clean_mesh(fixed_mesh)  # 清理後的固定網格。
+        self.moving = clean_mesh(moving_mesh)  # 清理後的移動網格（座標不變；只作為碰撞濾波器的幾何輸入，不附加任何陣列）。
+        self.band = band  # 距離帶。
+        self.matrix = vtk.vtkMatrix4x4()  # 移動網格目前的變換（碰撞濾波器直接參考此矩陣）。
+
+        self.collision_filter = vtk.vtkCollisionDetectionFilter()  # 碰撞濾波器只建立一次；輸入未修改時 OBB 樹會沿用。
+        self.collision_filter.SetInputData(0, self.fixed)
+        self.collision_filter.SetMatrix(0, vtk.vtkMatrix4x4())
+        self.collision_filter.SetInputData(1, self.moving)
+        self.collision_filter.SetMatrix(1, self.matrix)
+        self.collision_filter.SetCollisionModeToAllContacts()  # 設置碰撞模式為檢測所有接觸點。
+        self.collision_filter.GenerateScalarsOn()
+        self.collision_filter.SetBoxTolerance(0.0)
+        self.collision_filter.SetCellTolerance(0.0)
+        self.collision_filter.SetNumberOfCellsPerNode(2)
+
+        self.dist_calc = build_distance_function(self.fixed)  # 固定網格的簽署距離函數（定位器只建立一次）。
+        self.fixed_tree = cKDTree(mesh_points(self.fixed))  # 距離帶篩選用的 KD-tree。
+        self.search_radius = search_radius(self.moving, self.fixed, band)  # 頂點距離上限（見 search_radius）。
+        self.edges = mesh_edges(self.moving)  # 移動網格的邊，用於判斷深度穿透的頂點。
+        self.fixed_bounds = np.array(self.fixed.GetBounds()).reshape(3, 2)  # 固定網格的包圍盒。
+        self.points = np.array(mesh_points(self.moving), dtype=np.float64)  # 移動網格的頂點（自身座標）。
+
+        self.depth = np.full(len(self.points), -1.0, dtype=np.float32)  # 穿透深度圖（外部點為 -1.0）。
+        depth_array = nps.numpy_to_vtk(self.depth, deep=False)  # 以零複製方式包裝，更新陣列即更新熱圖。
+        depth_array.SetName("ContactDistance")
+        # 深度圖附加在共用幾何的顯示用副本上：若附加到 self.moving，每次 Modified() 都會提高碰撞濾波器輸入的 MTime，
+        # 下次 Update() 便會重建移動網格的 OBB 樹。
+        self.display = vtk.vtkPolyData()
+        self.display.ShallowCopy(self.moving)
+        self.display.GetPointData().SetScalars(depth_array)
+        self._touched = np.zeros(0, dtype=np.int64)  # 上次查詢寫入深度的頂點索引。
+
+    def query(self, matrix):  # 以新的變換查詢碰撞。
+        """
+        參數:
+            matrix: 移動網格在固定網格座標系中的 4x4 變換（NumPy、巢狀序列或 vtkMatrix4x4）
+        返回:
+            (num_contacts, depth)；depth 為每個移動網格頂點的穿透深度（外部點為 -1.0），
+            與 self.display 的 "ContactDistance" 標量共用記憶體
+        """
+        to_vtk_matrix(matrix, self.matrix)  # 更新變換（碰撞濾波器會因矩陣修改而重新執行）。
+        m = np.array([[self.matrix.GetElement(i, j) for j in range(4)] for i in range(4)])
+        points = self.points @ m[:3, :3].T + m[:3, 3]  # 變換後的移動網格頂點。
+
+        self.depth[self._touched] = -1.0  # 只重設上次寫入的頂點（增量更新）。
+        self._touched = np.zeros(0, dtype=np.int64)
+        lower, upper = points.min(axis=0), points.max(axis=0)
+        if np.any(lower > self.fixed_bounds[:, 1] + self.band) or np.any(upper < self.fixed_bounds[:, 0] - self.band):  # 包圍盒不重疊，不可能接觸。
+            self._mark_modified()
+            return 0, self.depth
+
+        self.collision_filter.Update()  # 精確碰撞檢測（OBB 樹已建立，只重新查詢）。
+        num_contacts = self.collision_filter.GetNumberOfContacts()
+
+        d, _ = self.fixed_tree.query(points, k=1, distance_upper_bound=self.search_radius, **KDTREE_PARALLEL)
+        near = np.isfinite(d)  # 距離帶內的頂點。
+        dist = np.ones(len(points))
+        if near.any():
+            dist[near] = signed_distances(points[near], self.dist_calc)
+        deep = far_inside_vertices(self.edges, points, near, dist, self.dist_calc)  # 距離帶外的深度穿透頂點。
+        if deep.any():
+            dist[deep] = signed_distances(points[deep], self.dist_calc)
+        self._touched = np.flatnonzero(dist < 0)  # 內部點（穿透）。
+        self.depth[self._touched] = -dist[self._touched]
+        self._mark_modified()
+        return num_contacts, self.depth
+
+    def _mark_modified(self):  # 通知 VTK 深度陣列已更新（重新繪製熱圖）。
+        self.display.GetPointData().GetScalars().Modified()
+
+    def max_depth(self):  # 目前的最大穿透深度（沒有穿透時為 0）。
+        return float(self.depth.max()) if len(self.depth) and self.depth.max() > 0 else 0.0
+
 # 視覺化 mesh1、mesh2（含距離熱圖）
 def visualize(mesh1, mesh2_with_distance):
     colors = vtk.vtkNamedColors()  # 創建 VTK 命名顏色對象，用於設置顏色。
@@ -163,8 +429,8 @@ if __name__ == "__main__":  # 檢查腳本是否直接運行（而非作為模
     # transform_filter.Update()  # 更新濾波器。
     # mesh1 = transform_filter.GetOutput()  # 更新 mesh1 為變換後的網格。
 
-    contacts, collision_filter, out1, out2 = check_collision(mesh1, mesh2)  # 執行碰撞檢測，返回接觸點數量及清理後的網格。
+    contacts, collision_filter, out1, out2 = check_collision(mesh1, mesh2, band=CONTACT_BAND)  # 執行碰撞檢測，返回接觸點數量及清理後的網格。
 
     # 使用完整 mesh2 計算與 mesh1 的距離分布，顯示內部距離熱圖
-    mesh2_with_distance = compute_contact_distances(out1, out2)  # 計算 mesh2 每個點到 mesh1 的距離。
+    mesh2_with_distance = compute_contact_distances(out1, out2, band=CONTACT_BAND)  # 計算 mesh2 每個點到 mesh1 的距離。
     visualize(out1, mesh2_with_distance)  # 視覺化 mesh1 和帶距離熱圖的 mesh2。
\ No newline at end of file
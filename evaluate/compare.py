@@ -1,56 +1,133 @@
-# 主要目的：此程式碼定義了一個函數 `compare_image_folders`，用於比較兩個資料夾中相同名稱的圖像，計算它們的像素級絕對差異（absdiff），並將差異圖像保存到指定的輸出資料夾。圖像會被調整為統一大小（預設 256x256），並轉為灰階進行比較。此程式碼適用於牙科圖像處理流程，例如比較 GAN 模型修復的圖像（來自 `apply_gan_model`）與標準答案圖像（來自 `DentalModelReconstructor` 或 `setup_camera_with_obb`），或檢查邊界檢測結果（來自 `get_image_bound` 或 `mark_boundary_points`）的差異，支援 PNG、JPG、JPEG、BMP 和 TIFF 格式。
+# 主要目的：此程式碼定義了一個函數 `compare_image_folders`，用於比較兩個資料夾中相同名稱的圖像，計算它們的像素級絕對差異（absdiff），並將差異圖像保存到指定的輸出資料夾。圖像會被調整為統一大小（預設 256x256），並轉為灰階進行比較。讀取、調整大小、比較與寫檔以執行緒池平行處理（OpenCV 在這些操作中會釋放 GIL），並限制預取數量以控制記憶體；同一次處理中也會計算每張圖像的平均/最大絕對差（可選擇只計算遮罩區域），`diff_stats` 則只返回統計值而不寫出差異圖。此程式碼適用於牙科圖像處理流程，例如比較 GAN 模型修復的圖像（來自 `apply_gan_model`）與標準答案圖像（來自 `DentalModelReconstructor` 或 `setup_camera_with_obb`），或檢查邊界檢測結果（來自 `get_image_bound` 或 `mark_boundary_points`）的差異，支援 PNG、JPG、JPEG、BMP 和 TIFF 格式。
 
 import os  # 導入 os 模組，用於文件和目錄操作（遍歷文件夾、創建目錄等）。
 import cv2  # 導入 OpenCV 庫，用於圖像讀取、調整大小、像素差異計算和保存。
+import itertools  # 導入 itertools，用於分批提交工作。
+from collections import deque  # 導入 deque，用於保存進行中的工作。
+from concurrent.futures import ThreadPoolExecutor  # 導入執行緒池，用於平行讀寫圖像。
 
-def compare_image_folders(folder1, folder2, output_folder, image_size=(256, 256)):  # 定義比較圖像資料夾的函數。
+VALID_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff'}  # 定義支援的圖像格式副檔名集合。
+
+def find_common_images(folder1, folder2):  # 找出兩個資料夾中檔名相同的圖像。
+    images1 = {f for f in os.listdir(folder1) if os.path.splitext(f)[1].lower() in VALID_EXTENSIONS}  # 獲取第一個資料夾中有效圖像文件名集合。
+    images2 = {f for f in os.listdir(folder2) if os.path.splitext(f)[1].lower() in VALID_EXTENSIONS}  # 獲取第二個資料夾中有效圖像文件名集合。
+    return sorted(images1.intersection(images2))  # 計算交集並排序，確保輸出順序固定。
+
+def bounded_map(func, items, workers, prefetch):  # 以執行緒池依序處理項目，並限制同時進行的數量。
+    """
+    與 map 相同（結果依輸入順序返回），但最多只有 prefetch 個項目同時在處理或等待讀取，
+    避免大資料夾一次把所有圖像載入記憶體。
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque(pool.submit(func, item) for item in itertools.islice(items, prefetch))  # 預先提交的工作。
+        while pending:
+            result = pending.popleft().result()  # 等待最早提交的工作完成。
+            pending.extend(pool.submit(func, item) for item in itertools.islice(items, 1))  # 補上一個新工作。
+            yield result
+
+def compare_image_pair(img1_path, img2_path, image_size=(256, 256), diff_path=None, mask_path=None):  # 比較一對圖像。
+    """
+    讀取並比較一對圖像，返回差異統計值；提供 diff_path 時同時寫出差異圖。
+
+    :param img1_path: 標準答案圖像路徑
+    :param img2_path: 測試結果圖像路徑
+    :param image_size: 重新調整的圖片大小
+    :param diff_path: 差異圖輸出路徑（None 表示不寫檔）
+    :param mask_path: 遮罩圖路徑（可選，非 0 像素為比較區域）
+    :return: 字典 {mean_abs_diff, max_abs_diff[, masked_mean_abs_diff, masked_max_abs_diff, mask_pixels]}；讀取失敗時返回 None
+    """
+    img1 = cv2.imread(img1_path, cv2.IMREAD_GRAYSCALE)  # 以灰階模式讀取第一張圖像。
+    img2 = cv2.imread(img2_path, cv2.IMREAD_GRAYSCALE)  # 以灰階模式讀取第二張圖像。
+    if img1 is None or img2 is None:  # 檢查圖像是否成功讀取。
+        return None
+
+    # 調整圖片大小並計算像素差異
+    img1 = cv2.resize(img1, image_size)  # 將第一張圖像調整為指定大小（預設 256x256）。
+    img2 = cv2.resize(img2, image_size)  # 將第二張圖像調整為指定大小（預設 256x256）。
+    diff = cv2.absdiff(img1, img2)  # 計算兩張圖像的像素級絕對差異。
+
+    stats = {"mean_abs_diff": float(diff.mean()), "max_abs_diff": int(diff.max())}
+    if mask_path and os.path.exists(mask_path):  # 只計算遮罩區域的差異。
+        mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+        if mask is not None:
+            masked = diff[cv2.resize(mask, image_size, interpolation=cv2.INTER_NEAREST) > 0]  # 遮罩內的差異值。
+            stats["mask_pixels"] = int(masked.size)
+            stats["masked_mean_abs_diff"] = float(masked.mean()) if masked.size else 0.0
+            stats["masked_max_abs_diff"] = int(masked.max()) if masked.size else 0
+
+    if diff_path:  # 儲存差異圖片。
+        cv2.imwrite(diff_path, diff)  # 將差異圖像保存到輸出路徑。
+    return stats
+
+def compare_image_folders(folder1, folder2, output_folder, image_size=(256, 256), mask_folder=None, workers=None, prefetch=None):  # 定義比較圖像資料夾的函數。
     """
     比較兩個資料夾中的相同圖片，計算像素差異並輸出到指定資料夾。
     
     :param folder1: 第一個圖片資料夾 (標準答案，字串路徑)
     :param folder2: 第二個圖片資料夾 (測試結果，字串路徑)
-    :param output_folder: 差異圖片輸出資料夾 (字串路徑)
+    :param output_folder: 差異圖片輸出資料夾 (字串路徑；None 表示只計算統計值，不寫出差異圖)
     :param image_size: 重新調整的圖片大小 (預設為 256x256，元組)
+    :param mask_folder: 遮罩圖資料夾 (可選；遮罩檔名與 cal_all 相同，.jpg 對應 .png)
+    :param workers: 執行緒數量 (預設為 CPU 核心數，最多 8)
+    :param prefetch: 同時處理中的圖片數量上限 (預設為 workers 的 4 倍)
+    :return: 字典，圖片檔名 -> 差異統計值（見 compare_image_pair）
     """
-    os.makedirs(output_folder, exist_ok=True)  # 創建輸出資料夾，若已存在則不報錯。
-
-    # 過濾有效的圖片副檔名
-    valid_extensions = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff'}  # 定義支援的圖像格式副檔名集合。
-    images1 = {f for f in os.listdir(folder1) if os.path.splitext(f)[1].lower() in valid_extensions}  # 獲取第一個資料夾中有效圖像文件名集合。
-    images2 = {f for f in os.listdir(folder2) if os.path.splitext(f)[1].lower() in valid_extensions}  # 獲取第二個資料夾中有效圖像文件名集合。
+    if output_folder:
+        os.makedirs(output_folder, exist_ok=True)  # 創建輸出資料夾，若已存在則不報錯。
 
     # 找到共同的圖片
-    common_images = images1.intersection(images2)  # 計算兩個資料夾中相同文件名的交集。
-
+    common_images = find_common_images(folder1, folder2)
     if not common_images:  # 檢查是否有共同圖像。
         print("沒有找到相同的圖片檔案。")  # 若無共同圖像，打印提示並退出。
-        return
+        return {}
 
-    for image_name in common_images:  # 遍歷共同圖像文件名。
-        img1_path = os.path.join(folder1, image_name)  # 構建第一個資料夾中圖像的完整路徑。
-        img2_path = os.path.join(folder2, image_name)  # 構建第二個資料夾中圖像的完整路徑。
+    workers = workers or min(8, os.cpu_count() or 1)
+    prefetch = prefetch or workers * 4
 
-        img1 = cv2.imread(img1_path, cv2.IMREAD_GRAYSCALE)  # 以灰階模式讀取第一張圖像。
-        img2 = cv2.imread(img2_path, cv2.IMREAD_GRAYSCALE)  # 以灰階模式讀取第二張圖像。
+    def compare(image_name):  # 在工作執行緒中處理一張圖片。
+        diff_path = os.path.join(output_folder, f"diff_{image_name}") if output_folder else None  # 構建差異圖像的輸出路徑（添加 "diff_" 前綴）。
+        mask_path = os.path.join(mask_folder, image_name.replace(".jpg", ".png")) if mask_folder else None
+        return image_name, diff_path, compare_image_pair(os.path.join(folder1, image_name), os.path.join(folder2, image_name),
+                                                         image_size, diff_path, mask_path)
 
-        if img1 is None or img2 is None:  # 檢查圖像是否成功讀取。
+    results = {}
+    for image_name, diff_path, stats in bounded_map(compare, common_images, workers, prefetch):
+        if stats is None:
             print(f"讀取失敗: {image_name}")  # 若任一圖像讀取失敗，打印提示並跳過。
             continue
+        results[image_name] = stats
+        if diff_path:
+            print(f"已儲存差異圖: {diff_path}")  # 打印保存的差異圖像路徑。
 
-        # 調整圖片大小
-        img1 = cv2.resize(img1, image_size)  # 將第一張圖像調整為指定大小（預設 256x256）。
-        img2 = cv2.resize(img2, image_size)  # 將第二張圖像調整為指定大小（預設 256x256）。
-
-        # 計算像素差異
-        diff = cv2.absdiff(img1, img2)  # 計算兩張圖像的像素級絕對差異。
-
-        # 儲存差異圖片
-        diff_path = os.path.join(output_folder, f"diff_{image_name}")  # 構建差異圖像的輸出路徑（添加 "diff_" 前綴）。
-        cv2.imwrite(diff_path, diff)  # 將差異圖像保存到輸出路徑。
+    print("比對完成！")  # 提示比較完成。
+    return results
 
-        print(f"已儲存差異圖: {diff_path}")  # 打印保存的差異圖像路徑。
+def diff_stats(folder1, folder2, image_size=(256, 256), mask_folder=None, workers=None):  # 只計算差異統計值。
+    """
+    與 compare_image_folders 相同，但不寫出差異圖。
+    :return: 字典，圖片檔名 -> 差異統計值
+    """
+    return compare_image_folders(folder1, folder2, None, image_size, mask_folder, workers)
 
-    print("比對完成！")  # 提示比較完成。
+def summarize_diff_stats(stats):  # 彙整所有圖片的差異統計值。
+    """
+    :param stats: compare_image_folders 或 diff_stats 的返回值
+    :return: 字典 {count, mean_abs_diff, max_abs_diff[, masked_mean_abs_diff, masked_max_abs_diff]}，平均值為各圖片的平均
+    """
+    values = list(stats.values())
+    summary = {"count": len(values)}
+    if not values:
+        return summary
+    for key in ("mean_abs_diff", "masked_mean_abs_diff"):
+        present = [v[key] for v in values if key in v]
+        if present:
+            summary[key] = sum(present) / len(present)
+    for key in ("max_abs_diff", "masked_max_abs_diff"):
+        present = [v[key] for v in values if key in v]
+        if present:
+            summary[key] = max(present)
+    return summary
 
 # # 使用範例
 # folder1 = 'D:/Users/user/Desktop/weiyundontdelete/GANdata/trainingdepth/DAISdepth/alldata/prdeictdata/evaluted_testdata_answer/'
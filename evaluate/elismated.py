@@ -1,4 +1,4 @@
-# 主要目的：此程式碼定義了一組函數，用於計算兩張圖像之間的多項圖像品質評估指標，包括 PSNR（峰值信噪比）、SSIM（結構相似性）、FSIM（特徵相似性）和 RMSE（均方根誤差）。主函數 `cal_all` 批量處理指定資料夾中的圖像對（修復圖像與真實圖像），支援根據遮罩裁剪圖像，並將結果保存到文本文件。此程式碼適用於牙科圖像處理流程，例如評估 GAN 修復圖像（來自 `apply_gan_model`）與真實圖像的品質，或比較不同視角的深度圖像（來自 `DentalModelReconstructor`），並與邊界檢測（`get_image_bound` 或 `mark_boundary_points`）和遮罩裁剪（`crop_to_mask`）模組整合。
+# 主要目的：此程式碼定義了一組函數，用於計算兩張圖像之間的多項圖像品質評估指標，包括 PSNR（峰值信噪比）、SSIM（結構相似性）、FSIM（特徵相似性）和 RMSE（均方根誤差）。主函數 `cal_all` 一次載入指定資料夾中的所有圖像對（修復圖像與真實圖像；提供遮罩時每個遮罩只讀取一次，快取其邊界框與像素集合，指標只計算遮罩內的像素；先讀檔頭取得尺寸，依尺寸分組直接解碼到預先配置的陣列，小於 SSIM 視窗的圖像略過並提示），再以向量化 NumPy（`batch_psnr`、`batch_ssim`、`batch_rmse`）與共用的 FSIM 模組（`batch_fsim`）分批計算，並將結果保存到文本文件；提供 `store_path` 時結果逐批寫入 CSV/Parquet（`MetricStore`），重跑時只計算新增或修改過的檔案。此程式碼適用於牙科圖像處理流程，例如評估 GAN 修復圖像（來自 `apply_gan_model`）與真實圖像的品質，或比較不同視角的深度圖像（來自 `DentalModelReconstructor`），並與邊界檢測（`get_image_bound` 或 `mark_boundary_points`）模組整合。
 
 import numpy as np  # 導入 NumPy 庫，用於數值運算和陣列處理。
 from skimage.metrics import structural_similarity as mssim  # 導入 SSIM 函數，用於結構相似性計算。
@@ -7,10 +7,12 @@ import os  # 導入 os 模組，用於文件和路徑操作。
 import torch  # 導入 PyTorch 庫，用於 FSIM 計算的張量操作。
 # import matplotlib.pyplot as plt  # 繪圖庫（已註解，暫未使用）。
 import cv2  # 導入 OpenCV 庫，用於圖像讀取和處理。
+from PIL import Image  # 導入 PIL 庫，只讀取檔頭以取得圖像尺寸。
 from .fsim import FSIM, FSIMc  # 導入自定義 FSIM 和 FSIMc 模組，用於特徵相似性計算。
 # import Niqe  # NIQE 模組（已註解，暫未使用）。
 from sklearn.metrics import mean_squared_error  # 導入均方根誤差 (RMSE) 計算函數。
-from .forSSIM.crop import crop_to_mask  # 導入自定義裁剪模組，用於根據遮罩裁剪圖像。
+from scipy.ndimage import uniform_filter  # 導入均勻濾波，用於批次 SSIM 計算。
+from .metricstore import MetricStore, METRICS, file_key, average  # 導入結果儲存模組，用於串流寫入與續算。
 
 # 計算 SSIM 和 PSNR
 def cal_ssim_psnr(img1, img2):  # 定義計算 PSNR 和 SSIM 的函數。
@@ -82,75 +84,299 @@ def cal_rmse(img1, img2):  # 定義計算 RMSE 的函數。
     cal_rmse.append(rms)  # 添加 RMSE 值。
     return np.array(cal_rmse).mean()  # 返回 RMSE 的平均值。
 
+# ------------------------------
+# 批次評估：一次載入所有圖像對，以向量化方式計算各項指標
+# ------------------------------
+SSIM_WIN_SIZE = 7  # SSIM 視窗大小（與 skimage 預設相同）。
+SSIM_K1, SSIM_K2 = 0.01, 0.03  # SSIM 常數（與 skimage 預設相同）。
+DATA_RANGE = 255.0  # uint8 圖像的數值範圍。
+
+def load_mask(mask_file, image_shape, mask_cache):  # 載入遮罩並快取其邊界框與像素集合。
+    """
+    讀取遮罩（非 0 像素為評估區域），計算邊界框並向外擴展 SSIM 視窗半徑，讓遮罩邊緣像素也有完整的鄰域。
+    同一遮罩在同一次評估中只讀取一次。
+    參數:
+        mask_file: 遮罩圖像路徑
+        image_shape: 對應圖像的形狀（遮罩尺寸不同時會調整大小）
+        mask_cache: 字典，(遮罩路徑, 圖像高寬) -> 結果
+    返回:
+        (y0, y1, x0, x1, mask_crop)：裁剪範圍與裁剪後的布林遮罩；遮罩為空時返回 None
+    """
+    key = (mask_file, image_shape[:2])
+    if key not in mask_cache:
+        mask = cv2.imread(mask_file, cv2.IMREAD_GRAYSCALE)  # 以灰階模式讀取遮罩。
+        if mask is not None and mask.shape[:2] != image_shape[:2]:  # 遮罩和原圖大小不同時調整遮罩大小。
+            mask = cv2.resize(mask, (image_shape[1], image_shape[0]), interpolation=cv2.INTER_NEAREST)
+        if mask is None or not mask.any():  # 無法讀取或沒有評估區域。
+            mask_cache[key] = None
+        else:
+            ys, xs = np.nonzero(mask)  # 遮罩像素座標。
+            pad = (SSIM_WIN_SIZE - 1) // 2  # 擴展邊界框，保留 SSIM 視窗所需的鄰域。
+            y0, y1 = max(ys.min() - pad, 0), min(ys.max() + 1 + pad, mask.shape[0])
+            x0, x1 = max(xs.min() - pad, 0), min(xs.max() + 1 + pad, mask.shape[1])
+            mask_cache[key] = (y0, y1, x0, x1, mask[y0:y1, x0:x1] > 0)
+    return mask_cache[key]
+
+def image_size(file_path):  # 只讀取檔頭取得圖像尺寸。
+    """返回 (高, 寬)；無法讀取時返回 None"""
+    try:
+        with Image.open(file_path) as img:
+            return img.height, img.width
+    except OSError:
+        return None
+
+def load_image_pairs(path_high, path, mask_path=None, skip=()):  # 載入所有圖像對。
+    """
+    讀取修復圖像資料夾中所有檔案及其對應的真實圖像，並依圖像尺寸分組。
+    先只讀檔頭決定每張圖像（裁剪後）的尺寸並預先配置各組陣列，再逐張解碼直接寫入，不另外建立圖像列表再堆疊（峰值記憶體約為結果本身）。
+    有遮罩時裁剪到遮罩邊界框（含 SSIM 視窗邊距），並保留遮罩像素集合供指標計算；裁剪後小於 SSIM 視窗的圖像無法計算 SSIM，略過並提示。
+    參數:
+        path_high: 真實圖像資料夾路徑
+        path: 修復圖像資料夾路徑
+        mask_path: 遮罩圖像資料夾路徑（可選）
+        skip: 不需載入的檔名（例如已有最新結果的檔案）
+    返回:
+        names: 成功載入的檔名列表（依資料夾順序）
+        groups: 字典，圖像形狀 -> (索引列表, 修復圖像陣列, 真實圖像陣列, 遮罩陣列)，
+                圖像陣列形狀為 [N, H, W, C]（uint8），遮罩陣列為 [N, H, W]（布林，無遮罩時為 None）
+    """
+    plans = []  # (檔名, 檔頭尺寸, 裁剪範圍, 遮罩)。
+    mask_cache = {}  # 遮罩快取。
+    for i in os.listdir(path):  # 迭代資料夾中的每個文件。
+        if i in skip:  # 已有最新結果。
+            continue
+        mask_file = None
+        if mask_path:  # 有遮罩時確認遮罩存在。
+            mask_file = os.path.join(mask_path, i.replace(".jpg", ".png"))  # 假設遮罩文件為 PNG 格式。
+            if not os.path.exists(mask_file):  # 遮罩不存在時跳過。
+                continue
+        size = image_size(os.path.join(path_high, i))  # 真實圖像尺寸。
+        if size is None or size != image_size(os.path.join(path, i)):  # 無法讀取或尺寸不符時跳過。
+            print(f"跳過無法比較的圖像: {i}")
+            continue
+        region, mask = (0, size[0], 0, size[1]), None
+        if mask_file:  # 裁剪到遮罩邊界框。
+            loaded = load_mask(mask_file, size, mask_cache)
+            if loaded is None:
+                print(f"跳過空白遮罩: {i}")
+                continue
+            region, mask = tuple(int(v) for v in loaded[:4]), loaded[4]
+        if min(region[1] - region[0], region[3] - region[2]) < SSIM_WIN_SIZE:  # SSIM 視窗放不下。
+            print(f"跳過小於 SSIM 視窗（{SSIM_WIN_SIZE}x{SSIM_WIN_SIZE}）的圖像: {i}")
+            continue
+        plans.append((i, size, region, mask))
+
+    groups = {}  # 依尺寸分組（遮罩裁剪後各圖像尺寸可能不同）；cv2.imread 預設一律解碼為 3 通道。
+    for index, (_, _, (y0, y1, x0, x1), _) in enumerate(plans):
+        groups.setdefault((y1 - y0, x1 - x0, 3), []).append(index)
+    arrays = {shape: (np.empty((len(indices),) + shape, dtype=np.uint8), np.empty((len(indices),) + shape, dtype=np.uint8),
+                      np.empty((len(indices),) + shape[:2], dtype=bool) if mask_path else None)
+              for shape, indices in groups.items()}
+    failed = set()
+    for shape, indices in groups.items():
+        tests, gts, masks = arrays[shape]
+        for slot, index in enumerate(indices):
+            name, size, (y0, y1, x0, x1), mask = plans[index]
+            # 讀取 BGR 圖像；忽略 EXIF 方向，解碼尺寸才會與檔頭尺寸一致（否則直式 JPEG 會被旋轉）
+            gt = cv2.imread(os.path.join(path_high, name), cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+            test = cv2.imread(os.path.join(path, name), cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+            if gt is None or test is None or gt.shape[:2] != size or test.shape[:2] != size:  # 無法解碼，或解碼尺寸與檔頭不符。
+                print(f"跳過無法比較的圖像: {name}")
+                failed.add(index)
+                continue
+            gts[slot] = gt[y0:y1, x0:x1]
+            tests[slot] = test[y0:y1, x0:x1]
+            if masks is not None:
+                masks[slot] = mask
+
+    names, renumber = [], {}  # 去除解碼失敗的圖像並重新編號。
+    for index, (name, _, _, _) in enumerate(plans):
+        if index not in failed:
+            renumber[index] = len(names)
+            names.append(name)
+    result = {}
+    for shape, indices in groups.items():
+        keep = [slot for slot, index in enumerate(indices) if index not in failed]
+        if not keep:
+            continue
+        tests, gts, masks = arrays[shape]
+        if len(keep) < len(indices):  # 只有解碼失敗時才需要複製。
+            tests, gts = tests[keep], gts[keep]
+            masks = None if masks is None else masks[keep]
+        result[shape] = ([renumber[indices[slot]] for slot in keep], tests, gts, masks)
+    return names, result
+
+def _masked_mean(values, mask, axis):  # 遮罩區域內的平均值（無遮罩時為一般平均）。
+    if mask is None:
+        return values.mean(axis=axis)
+    weights = mask.reshape(mask.shape + (1,) * (values.ndim - mask.ndim))  # 擴展到通道維度。
+    weights = np.broadcast_to(weights, values.shape)
+    return (values * weights).sum(axis=axis) / weights.sum(axis=axis)
+
+def batch_psnr(test, gt, mask=None):  # 批次計算 PSNR。
+    """
+    向量化計算 PSNR，無遮罩時結果與 skimage 的 peak_signal_noise_ratio 相同（data_range=255）。
+    參數:
+        test, gt: 形狀為 [N, H, W, C] 的 uint8 陣列
+        mask: 可選，形狀為 [N, H, W] 的布林陣列，只計算遮罩像素
+    返回:
+        形狀為 [N] 的 PSNR 陣列（完全相同時為 inf）
+    """
+    diff = test.astype(np.float64) - gt.astype(np.float64)  # 轉為浮點數避免 uint8 溢位。
+    mse = _masked_mean(diff ** 2, mask, (1, 2, 3))  # 每張圖像的均方誤差。
+    with np.errstate(divide='ignore'):  # 完全相同的圖像 MSE 為 0。
+        return 10 * np.log10(DATA_RANGE ** 2 / mse)
+
+def batch_rmse(test, gt, mask=None):  # 批次計算 RMSE。
+    """
+    向量化計算 RMSE，結果與 cal_rmse 相同（各通道 RMSE 的平均）。
+    參數:
+        test, gt: 形狀為 [N, H, W, C] 的 uint8 陣列
+        mask: 可選，形狀為 [N, H, W] 的布林陣列，只計算遮罩像素
+    返回:
+        形狀為 [N] 的 RMSE 陣列
+    """
+    diff = test.astype(np.float64) - gt.astype(np.float64)  # 轉為浮點數避免 uint8 溢位。
+    return np.sqrt(_masked_mean(diff ** 2, mask, (1, 2))).mean(axis=1)  # 先算各通道 RMSE 再平均。
+
+def batch_ssim(test, gt, mask=None):  # 批次計算 SSIM。
+    """
+    向量化計算 SSIM，無遮罩時結果與 skimage 的 structural_similarity（多通道、7x7 均勻視窗、樣本共變異數）相同。
+    參數:
+        test, gt: 形狀為 [N, H, W, C] 的 uint8 陣列
+        mask: 可選，形狀為 [N, H, W] 的布林陣列，只平均遮罩像素的 SSIM（不再排除邊界）
+    返回:
+        形狀為 [N] 的 SSIM 陣列
+    """
+    X = test.astype(np.float64)
+    Y = gt.astype(np.float64)
+    size = (1, SSIM_WIN_SIZE, SSIM_WIN_SIZE, 1)  # 只在空間維度上濾波。
+    NP = SSIM_WIN_SIZE ** 2
+    cov_norm = NP / (NP - 1)  # 樣本共變異數修正。
+    ux, uy = uniform_filter(X, size=size), uniform_filter(Y, size=size)  # 區域平均。
+    vx = cov_norm * (uniform_filter(X * X, size=size) - ux * ux)  # 區域變異數。
+    vy = cov_norm * (uniform_filter(Y * Y, size=size) - uy * uy)
+    vxy = cov_norm * (uniform_filter(X * Y, size=size) - ux * uy)  # 區域共變異數。
+    C1 = (SSIM_K1 * DATA_RANGE) ** 2
+    C2 = (SSIM_K2 * DATA_RANGE) ** 2
+    S = ((2 * ux * uy + C1) * (2 * vxy + C2)) / ((ux ** 2 + uy ** 2 + C1) * (vx + vy + C2))  # SSIM 圖。
+    if mask is not None:  # 遮罩像素的平均。
+        return _masked_mean(S, mask, (1, 2, 3))
+    pad = (SSIM_WIN_SIZE - 1) // 2  # 排除邊界（與 skimage 相同）。
+    return S[:, pad:-pad, pad:-pad, :].mean(axis=(1, 2, 3))
+
+def batch_fsim(test, gt, fsim_module, batch_size=16, mask=None):  # 批次計算 FSIM。
+    """
+    以同一個 FSIM 模組分批計算 FSIM。
+    參數:
+        test, gt: 形狀為 [N, H, W, C] 的 uint8 陣列
+        fsim_module: FSIM 實例（重複使用，避免每張圖像重新建立）
+        batch_size: 每次送入模組的圖像數量
+        mask: 可選，形狀為 [N, H, W] 的布林陣列，只在遮罩像素上加總
+    返回:
+        形狀為 [N] 的 FSIM 陣列
+    """
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'  # 如果有 GPU 可用，則使用 GPU。
+    scores = []
+    with torch.no_grad():  # 評估時不需要梯度。
+        for start in range(0, len(test), batch_size):
+            img1b = torch.from_numpy(test[start:start + batch_size]).permute(0, 3, 1, 2).float().to(device)  # [N, C, H, W]。
+            img2b = torch.from_numpy(gt[start:start + batch_size]).permute(0, 3, 1, 2).float().to(device)
+            maskb = None if mask is None else torch.from_numpy(mask[start:start + batch_size]).to(device)
+            scores.append(fsim_module.scores(img1b, img2b, maskb).cpu().numpy())
+    return np.concatenate(scores)
+
+def compute_metrics(test, gt, fsim_module, batch_size=16, mask=None):  # 計算一組圖像的所有指標。
+    """
+    分塊計算 PSNR、SSIM、FSIM 和 RMSE，限制浮點暫存陣列的記憶體用量；提供遮罩時只計算遮罩像素。
+    返回:
+        字典，指標名稱 -> 形狀為 [N] 的陣列
+    """
+    metrics = {"psnr": [], "ssim": [], "fsim": [], "rmse": []}
+    for start in range(0, len(test), batch_size):
+        t, g = test[start:start + batch_size], gt[start:start + batch_size]
+        m = None if mask is None else mask[start:start + batch_size]
+        metrics["psnr"].append(batch_psnr(t, g, m))
+        metrics["ssim"].append(batch_ssim(t, g, m))
+        metrics["fsim"].append(batch_fsim(t, g, fsim_module, batch_size, m))
+        metrics["rmse"].append(batch_rmse(t, g, m))
+    return {name: np.concatenate(values) for name, values in metrics.items()}
+
 # 計算所有指標並保存結果
-def cal_all(path_high, path, txt_path, mask_path=None):  # 定義批量計算所有指標的函數。
+def cal_all(path_high, path, txt_path, mask_path=None, batch_size=16, fsim_dtype=torch.float64, store_path=None):  # 定義批量計算所有指標的函數。
     """
     計算指定資料夾中所有圖像的 PSNR、SSIM、FSIM 和 RMSE，並將結果保存到文本文件。
+    所有圖像對先一次載入並依尺寸分組（直接寫入預先配置的陣列），再以向量化 NumPy 與共用的 FSIM 模組分批計算。
     參數:
         path_high: 真實圖像資料夾路徑
         path: 修復圖像資料夾路徑
         txt_path: 結果保存的文本文件路徑
-        mask_path: 遮罩圖像資料夾路徑（可選）
+        mask_path: 遮罩圖像資料夾路徑（可選；指標只計算遮罩內的像素）
+        batch_size: 每批計算的圖像數量
+        fsim_dtype: FSIM 相位一致性的計算精度（torch.float64 或較快的 torch.float32）
+        store_path: 可選，結果儲存路徑（.csv 檔或 .parquet 資料夾，見 MetricStore）；
+                    每批結果計算完即寫入，真實圖像與遮罩路徑、各檔案修改時間及 fsim_dtype 都未變的檔案直接沿用已儲存的結果
+    平均值一律以 metricstore.average 計算（有無 store_path 都相同；完全相同圖像的無限 PSNR 不略過）。
+    返回:
+        字典，檔名 -> {psnr, ssim, fsim, rmse}
     """
     print('computing...')  # 提示計算開始。
-    file = open(txt_path, 'w', encoding='utf-8')  # 打開文本文件以寫入結果（使用 UTF-8 編碼）。
-    file_list = os.listdir(path)  # 獲取修復圖像資料夾中的文件列表。
-    c_psnr = []  # 初始化 PSNR 列表。
-    c_ssim = []  # 初始化 SSIM 列表。
-    c_fsim = []  # 初始化 FSIM 列表。
-    c_rmse = []  # 初始化 RMSE 列表。
-
-    # 保存原始的真實圖像路徑
-    original_path_high = path_high  # 複製真實圖像資料夾路徑。
-
-    # 遍歷修復圖像文件
-    for i in file_list:  # 迭代資料夾中的每個文件。
-        gt_image_path = os.path.join(original_path_high, i)  # 構建真實圖像路徑。
-        test_image_path = os.path.join(path, i)  # 構建修復圖像路徑。
-
-        # 如果提供了遮罩路徑，則根據遮罩裁剪圖像
-        if mask_path:  # 檢查是否提供遮罩路徑。
-            mask_file = os.path.join(mask_path, i.replace(".jpg", ".png"))  # 假設遮罩文件為 PNG 格式。
-            if os.path.exists(mask_file):  # 檢查遮罩文件是否存在。
-                cropped_gt, marked_gt = crop_to_mask(gt_image_path, mask_file)  # 裁剪真實圖像。
-                cropped_test, marked_test = crop_to_mask(test_image_path, mask_file)  # 裁剪修復圖像。
-            else:
-                print()  # 如果遮罩文件不存在，打印空行並跳過。
+    store = MetricStore(store_path, fsim_dtype=str(fsim_dtype).replace("torch.", "")) if store_path else None  # 結果儲存（可選）。
+    keys, skip = {}, set()
+    if store:  # 找出已有最新結果的檔案。
+        for i in os.listdir(path):
+            gt_file = os.path.join(path_high, i)
+            mask_file = os.path.join(mask_path, i.replace(".jpg", ".png")) if mask_path else None
+            if not os.path.exists(gt_file) or (mask_file and not os.path.exists(mask_file)):
                 continue
-        else:
-            # 如果沒有遮罩，直接讀取圖像
-            cropped_gt = cv2.imread(gt_image_path)  # 讀取真實圖像（BGR 格式）。
-            cropped_test = cv2.imread(test_image_path)  # 讀取修復圖像（BGR 格式）。
-
-        # 計算各項指標
-        a, b = cal_ssim_psnr(cropped_test, cropped_gt)  # 計算 PSNR 和 SSIM。
-        c = cal_fsim(cropped_test, cropped_gt)  # 計算 FSIM。
-        f = cal_rmse(cropped_test, cropped_gt)  # 計算 RMSE。
-
-        # 將結果添加到列表
-        c_psnr.append(a)  # 添加 PSNR 值。
-        c_ssim.append(b)  # 添加 SSIM 值。
-        c_fsim.append(c)  # 添加 FSIM 值。
-        c_rmse.append(f)  # 添加 RMSE 值。
-
-        # 格式化並寫入單張圖像的結果
-        result_str = (f"{i} - PSNR: {a:.4f}, SSIM: {b:.4f}, "
-                      f"FSIM: {c:.4f}, RMSE: {f:.4f}\n")  # 格式化結果字符串。
-        file.write(result_str)  # 寫入文件。
-        print(result_str)  # 同時打印到控制台。
-
-    # 如果有成功處理的數據，計算並保存平均值
-    if len(c_psnr) > 0:  # 檢查是否有有效數據。
-        avg_psnr = np.mean(c_psnr)  # 計算平均 PSNR。
-        avg_ssim = np.mean(c_ssim)  # 計算平均 SSIM。
-        avg_fsim = np.mean(c_fsim)  # 計算平均 FSIM。
-        avg_rmse = np.mean(c_rmse)  # 計算平均 RMSE。
-
-        # 格式化並寫入平均值
-        avg_str = (f"\nAverages:\nPSNR: {avg_psnr:.4f}\nMS-SSIM: {avg_ssim:.4f}\n"
-                   f"FSIM: {avg_fsim:.4f}\nRMSE: {avg_rmse:.4f}")  # 格式化平均值字符串。
-        file.write(avg_str)  # 寫入文件。
-        print(avg_str)  # 打印到控制台。
-
-    file.close()  # 關閉文件。
-    print('Computation completed')  # 提示計算完成。
\ No newline at end of file
+            keys[i] = file_key(gt_file, os.path.join(path, i), mask_file)
+            if store.is_current(i, keys[i]):
+                skip.add(i)
+        print(f"沿用已儲存的結果: {len(skip)} 張")
+
+    names, groups = load_image_pairs(path_high, path, mask_path, skip)  # 載入需要計算的圖像對。
+    FSIM_loss = FSIM(fsim_dtype)  # 所有圖像共用一個 FSIM 模組。
+    if torch.cuda.is_available():  # 如果有 GPU 可用，則將模組移至 GPU。
+        FSIM_loss.set_arrays_to_cuda()
+
+    results = {}
+    try:
+        for indices, tests, gts, masks in groups.values():  # 每個尺寸群組分別計算。
+            for start in range(0, len(indices), batch_size):  # 逐批計算並寫入，中斷後可接續。
+                chunk = slice(start, start + batch_size)
+                metrics = compute_metrics(tests[chunk], gts[chunk], FSIM_loss, batch_size,
+                                          None if masks is None else masks[chunk])
+                for k, index in enumerate(indices[chunk]):
+                    name = names[index]
+                    results[name] = {metric: float(values[k]) for metric, values in metrics.items()}
+                    if store:
+                        store.append(name, keys[name], results[name])
+    finally:
+        if store:
+            store.close()
+
+    if store:  # 沿用的結果與新結果合併，依資料夾順序輸出。
+        names = [i for i in os.listdir(path) if i in store.records and (i in results or i in skip)]
+        results = {i: {metric: store.records[i][metric] for metric in METRICS} for i in names}
+    else:
+        names = [i for i in names if i in results]
+
+    with open(txt_path, 'w', encoding='utf-8') as file:  # 打開文本文件以寫入結果（使用 UTF-8 編碼）。
+        for i in names:  # 依資料夾順序寫入單張圖像的結果。
+            r = results[i]
+            result_str = (f"{i} - PSNR: {r['psnr']:.4f}, SSIM: {r['ssim']:.4f}, "
+                          f"FSIM: {r['fsim']:.4f}, RMSE: {r['rmse']:.4f}\n")  # 格式化結果字符串。
+            file.write(result_str)  # 寫入文件。
+            print(result_str)  # 同時打印到控制台。
+
+        # 如果有成功處理的數據，計算並保存平均值
+        if len(names) > 0:  # 檢查是否有有效數據。
+            summary = store.aggregate(names) if store else average(results[i] for i in names)  # 兩種情況使用相同的平均規則。
+            avg_psnr, avg_ssim, avg_fsim, avg_rmse = (summary[metric] for metric in METRICS)
+
+            # 格式化並寫入平均值
+            avg_str = (f"\nAverages:\nPSNR: {avg_psnr:.4f}\nMS-SSIM: {avg_ssim:.4f}\n"
+                       f"FSIM: {avg_fsim:.4f}\nRMSE: {avg_rmse:.4f}")  # 格式化平均值字符串。
+            file.write(avg_str)  # 寫入文件。
+            print(avg_str)  # 打印到控制台。
+    return results
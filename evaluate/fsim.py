@@ -1,6 +1,7 @@
-# 主要目的：此程式碼實現了 PyTorch 版本的 FSIM（Feature SIMilarity）和 FSIMc（彩色版本），用於評估兩張圖像的結構相似度，適用於牙科圖像品質評估（例如比較 GAN 修復圖像與參考圖像）。FSIM 基於相位一致性（Phase Congruency）和梯度相似度，FSIMc 額外考慮色彩通道（YIQ 空間的 I 和 Q 分量）。程式碼包括基礎類 `FSIM_base` 以及兩個衍生類 `FSIM`（灰階）和 `FSIMc`（彩色），支援 CUDA 加速，並與 `DentalModelReconstructor`、邊界檢測和 GAN 模組整合，用於牙科圖像處理和 3D 重建流程中的品質控制。
+# 主要目的：此程式碼實現了 PyTorch 版本的 FSIM（Feature SIMilarity）和 FSIMc（彩色版本），用於評估兩張圖像的結構相似度，適用於牙科圖像品質評估（例如比較 GAN 修復圖像與參考圖像）。FSIM 基於相位一致性（Phase Congruency）和梯度相似度，FSIMc 額外考慮色彩通道（YIQ 空間的 I 和 Q 分量）。程式碼包括基礎類 `FSIM_base` 以及兩個衍生類 `FSIM`（灰階）和 `FSIMc`（彩色），以 `torch.fft` 的複數張量計算，可選 float32 精度（`compare_precision` 用於比較兩種精度的結果，`check_reference` 以舊版實作在固定小圖上記錄的分數驗證數值一致性），Log-Gabor 濾波器組依影像尺寸快取於模組上（`filter_bank`），支援 CUDA 加速，並與 `DentalModelReconstructor`、邊界檢測和 GAN 模組整合，用於牙科圖像處理和 3D 重建流程中的品質控制。
 
 import torch as pt  # 導入 PyTorch 庫，用於張量操作和神經網絡。
+import torch.fft  # 導入 torch.fft 模組（torch 1.7 中未明確匯入時 pt.fft 是函式；該版本也沒有 fft2/ifft2，因此以 fftn/ifftn 指定最後兩維）。
 import torch.nn as nn  # 導入 PyTorch 的神經網絡模組。
 import torch.nn.functional as FUN  # 導入 PyTorch 的功能模組，包含卷積等操作。
 import numpy as np  # 導入 NumPy 庫，用於數值運算。
@@ -15,10 +16,12 @@ https://www4.comp.polyu.edu.hk/~cslzhang/IQA/FSIM/FSIM.htm
 '''
 
 class FSIM_base(nn.Module):  # 定義 FSIM 的基礎類，繼承自 nn.Module。
-    def __init__(self):  # 初始化方法。
+    def __init__(self, dtype=pt.float64):  # 初始化方法，dtype 為相位一致性計算的精度（float64 或 float32）。
         nn.Module.__init__(self)  # 調用父類的初始化方法。
         # 是否使用 CUDA 加速
         self.cuda_computation = False  # 預設不使用 CUDA。
+        # 相位一致性（FFT 與濾波器組）的計算精度；float32 約省一半記憶體，CPU 上也較快
+        self.dtype = dtype
 
         # 小波濾波器參數
         self.nscale = 4  # 尺度數（小波分解層數）。
@@ -51,12 +54,23 @@ class FSIM_base(nn.Module):  # 定義 FSIM 的基礎類，繼承自 nn.Module。
         self.T4 = 200  # Q 通道相似度常數。
         self.lambdac = 0.03  # FSIMc 中色彩通道權重。
 
+        # RGB → YIQ 轉換係數（形狀為 [1, 3, 1, 1]，以廣播套用到任意尺寸的批次）
+        self.Ycoef = pt.tensor([0.299, 0.587, 0.114]).view(1, 3, 1, 1)  # Y 分量（亮度）轉換係數。
+        self.Icoef = pt.tensor([0.596, -0.274, -0.322]).view(1, 3, 1, 1)  # I 分量（色度）轉換係數。
+        self.Qcoef = pt.tensor([0.211, -0.523, 0.312]).view(1, 3, 1, 1)  # Q 分量（色度）轉換係數。
+
+        # 各影像尺寸的 Log-Gabor 濾波器組快取（見 filter_bank）
+        self._filter_banks = {}
+
     def set_arrays_to_cuda(self):  # 將內部張量移至 CUDA。
         """將內部張量移至 CUDA"""
         self.cuda_computation = True  # 啟用 CUDA 計算。
         self.fo = self.fo.cuda()  # 將中心頻率張量移至 CUDA。
         self.dx = self.dx.cuda()  # 將水平梯度核移至 CUDA。
         self.dy = self.dy.cuda()  # 將垂直梯度核移至 CUDA。
+        self.Ycoef, self.Icoef, self.Qcoef = self.Ycoef.cuda(), self.Icoef.cuda(), self.Qcoef.cuda()  # 將 YIQ 係數移至 CUDA。
+        self._filter_banks = {key: {name: value.cuda() for name, value in bank.items()}
+                              for key, bank in self._filter_banks.items()}  # 已建立的濾波器組一併移至 CUDA（保留快取）。
 
     def forward_gradloss(self, imgr, imgd):  # 計算梯度相似度損失。
         """
@@ -136,12 +150,6 @@ class FSIM_base(nn.Module):  # 定義 FSIM 的基礎類，繼承自 nn.Module。
         PCm = pt.where(PC1 > PC2, PC1, PC2)  # 取相位一致性的最大值。
         return PCSimMatrix, PCm
 
-    def roll_1(self, x, n):  # 張量循環平移。
-        """
-        將張量沿著某一維度循環平移 n 個元素
-        """
-        return pt.cat((x[:, -n:, :, :, :], x[:, :-n, :, :, :]), dim=1)  # 沿指定維度平移。
-
     def ifftshift(self, tens, var_axis):  # 調整頻率中心位置。
         """
         用於調整頻率中心位置
@@ -170,7 +178,7 @@ class FSIM_base(nn.Module):  # 定義 FSIM 的基礎類，繼承自 nn.Module。
         else:  # 若行數為偶數。
             yrange = pt.arange(-(rows) / 2, (rows) / 2, step=1, requires_grad=False) / (rows)  # 計算 y 範圍。
 
-        x, y = pt.meshgrid([xrange, yrange])  # 生成網格座標。
+        x, y = pt.meshgrid(xrange, yrange)  # 生成網格座標（ij 排列；torch 1.7 的 meshgrid 沒有 indexing 參數）。
 
         if self.cuda_computation:  # 若啟用 CUDA。
             x, y = x.cuda(), y.cuda()  # 將座標移至 CUDA。
@@ -182,27 +190,15 @@ class FSIM_base(nn.Module):  # 定義 FSIM 的基礎類，繼承自 nn.Module。
         將輸入 RGB 轉換成 YIQ 色彩空間，提取亮度 Y、I、Q 分量
         並進行下採樣（根據輸入尺寸）
         """
-        batch, rows, cols = img.shape[0], img.shape[2], img.shape[3]  # 獲取批次、行數和列數。
+        rows, cols = img.shape[2], img.shape[3]  # 獲取行數和列數。
 
         minDimension = min(rows, cols)  # 獲取最小尺寸。
 
-        # RGB → YIQ 轉換係數
-        Ycoef = pt.tensor([[0.299, 0.587, 0.114]])  # Y 分量（亮度）轉換係數。
-        Icoef = pt.tensor([[0.596, -0.274, -0.322]])  # I 分量（色度）轉換係數。
-        Qcoef = pt.tensor([[0.211, -0.523, 0.312]])  # Q 分量（色度）轉換係數。
-
-        if self.cuda_computation:  # 若啟用 CUDA。
-            Ycoef, Icoef, Qcoef = Ycoef.cuda(), Icoef.cuda(), Qcoef.cuda()  # 將係數移至 CUDA。
-
-        Yfilt = pt.cat(batch * [pt.cat(rows * cols * [Ycoef.unsqueeze(2)], dim=2).view(1, 3, rows, cols)], 0)  # 構建 Y 分量濾波器。
-        Ifilt = pt.cat(batch * [pt.cat(rows * cols * [Icoef.unsqueeze(2)], dim=2).view(1, 3, rows, cols)], 0)  # 構建 I 分量濾波器。
-        Qfilt = pt.cat(batch * [pt.cat(rows * cols * [Qcoef.unsqueeze(2)], dim=2).view(1, 3, rows, cols)], 0)  # 構建 Q 分量濾波器。
-
         # 如果輸入是 RGB
         if img.size()[1] == 3:  # 若輸入為 RGB 圖像（3 通道）。
-            Y = pt.sum(Yfilt * img, 1).unsqueeze(1)  # 計算 Y 分量。
-            I = pt.sum(Ifilt * img, 1).unsqueeze(1)  # 計算 I 分量。
-            Q = pt.sum(Qfilt * img, 1).unsqueeze(1)  # 計算 Q 分量。
+            Y = pt.sum(self.Ycoef * img, 1).unsqueeze(1)  # 計算 Y 分量（係數以廣播套用到每個像素）。
+            I = pt.sum(self.Icoef * img, 1).unsqueeze(1)  # 計算 I 分量。
+            Q = pt.sum(self.Qcoef * img, 1).unsqueeze(1)  # 計算 Q 分量。
         else:  # 若輸入為灰階圖像（1 通道）。
             Y = pt.mean(img, 1).unsqueeze(1)  # 取平均值作為 Y 分量。
             I = pt.ones(Y.size(), dtype=pt.float64)  # I 分量設為全 1。
@@ -222,114 +218,100 @@ class FSIM_base(nn.Module):  # 定義 FSIM 的基礎類，繼承自 nn.Module。
         Y = aveKernel(Y)  # 下採樣 Y 分量。
         return I, Q, Y  # 返回 YIQ 分量。
 
-    def phasecong2(self, img):  # 計算相位一致性。
+    def filter_bank(self, rows, cols):  # 取得指定影像尺寸的濾波器組（快取）。
         """
-        計算圖像的相位一致性（Phase Congruency），基於 Log-Gabor 濾波器。
-        濾波器由徑向分量（控制頻率帶）和角度分量（控制方向）組成。
+        建立 Log-Gabor 濾波器組（徑向分量乘以角度分量）及噪聲估計所需的濾波器常數。
+        這些值只與影像尺寸有關，因此每個 (rows, cols) 只計算一次並快取在模組上；
+        批次維度在 phasecong2 中以廣播處理，不再複製。
+        返回:
+            字典：filter 為 [nscale, norient, rows, cols]，EM_n、sumEstSumAn2、sumEstSumAiAj 皆為 [norient]
         """
-        batch, rows, cols = img.shape[0], img.shape[2], img.shape[3]  # 獲取批次、行數和列數。
-
-        imagefft = pt.rfft(img, signal_ndim=2, onesided=False)  # 對圖像進行 2D 快速傅里葉變換。
+        key = (rows, cols)
+        if key in self._filter_banks:  # 已建立過。
+            return self._filter_banks[key]
 
         x, y = self.create_meshgrid(cols, rows)  # 生成網格座標。
-
-        radius = pt.cat(batch * [pt.sqrt(pt.pow(x, 2) + pt.pow(y, 2)).unsqueeze(0)], 0)  # 計算頻率域半徑。
-        theta = pt.cat(batch * [pt.atan2(-y, x).unsqueeze(0)], 0)  # 計算頻率域角度。
-
-        radius = self.ifftshift2d(radius)  # 將半徑張量進行 ifftshift。
-        theta = self.ifftshift2d(theta)  # 將角度張量進行 ifftshift。
-
-        radius[:, 0, 0] = 1  # 設置中心頻率點為 1（避免除零）。
+        radius = self.ifftshift2d(pt.sqrt(pt.pow(x, 2) + pt.pow(y, 2)).unsqueeze(0))[0]  # 計算頻率域半徑並進行 ifftshift。
+        theta = self.ifftshift2d(pt.atan2(-y, x).unsqueeze(0))[0]  # 計算頻率域角度並進行 ifftshift。
+        radius[0, 0] = 1  # 設置中心頻率點為 1（避免除零）。
 
         sintheta = pt.sin(theta)  # 計算角度的正弦值。
         costheta = pt.cos(theta)  # 計算角度的餘弦值。
 
-        lp = self.lowpassfilter(rows, cols)  # 創建低通濾波器。
-        lp = pt.cat(batch * [lp.unsqueeze(0)], 0)  # 將低通濾波器擴展到批次。
-
-        term1 = pt.cat(rows * cols * [self.fo.unsqueeze(2)], dim=2).view(-1, self.nscale, rows, cols)  # 構建中心頻率項。
-        term1 = pt.cat(batch * [term1.unsqueeze(0)], 0).view(-1, self.nscale, rows, cols)  # 擴展到批次。
+        lp = self.lowpassfilter(rows, cols)  # 創建低通濾波器（[1, rows, cols]）。
 
-        term2 = pt.log(pt.cat(self.nscale * [radius.unsqueeze(1)], 1) / term1)  # 計算 Log-Gabor 濾波器的徑向分量。
-        logGabor = pt.exp(-pt.pow(term2, 2) / self.den)  # 計算 Log-Gabor 濾波器。
+        term2 = pt.log(radius.unsqueeze(0) / self.fo.view(self.nscale, 1, 1))  # 計算 Log-Gabor 濾波器的徑向分量。
+        logGabor = pt.exp(-pt.pow(term2, 2) / self.den)  # 計算 Log-Gabor 濾波器（[nscale, rows, cols]）。
         logGabor = logGabor * lp  # 應用低通濾波器。
-        logGabor[:, :, 0, 0] = 0  # 設置中心頻率點為 0。
+        logGabor[:, 0, 0] = 0  # 設置中心頻率點為 0。
 
         # 構建角度濾波器分量
         angl = pt.arange(0, self.norient, dtype=pt.float64) / self.norient * self.pi  # 計算方向角度。
-
         if self.cuda_computation:  # 若啟用 CUDA。
             angl = angl.cuda()  # 將角度移至 CUDA。
+        angl = angl.view(self.norient, 1, 1)
 
-        ds_t1 = pt.cat(self.norient * [sintheta.unsqueeze(1)], 1) * pt.cos(angl).view(-1, self.norient, 1, 1)  # 正弦差分項 1。
-        ds_t2 = pt.cat(self.norient * [costheta.unsqueeze(1)], 1) * pt.sin(angl).view(-1, self.norient, 1, 1)  # 正弦差分項 2。
-        dc_t1 = pt.cat(self.norient * [costheta.unsqueeze(1)], 1) * pt.cos(angl).view(-1, self.norient, 1, 1)  # 餘弦差分項 1。
-        dc_t2 = pt.cat(self.norient * [sintheta.unsqueeze(1)], 1) * pt.sin(angl).view(-1, self.norient, 1, 1)  # 餘弦差分項 2。
-        ds = ds_t1 - ds_t2  # 正弦差分。
-        dc = dc_t1 + dc_t2  # 餘弦差分。
+        ds = sintheta * pt.cos(angl) - costheta * pt.sin(angl)  # 正弦差分。
+        dc = costheta * pt.cos(angl) + sintheta * pt.sin(angl)  # 餘弦差分。
         dtheta = pt.abs(pt.atan2(ds, dc))  # 計算角度距離。
-        spread = pt.exp(-pt.pow(dtheta, 2) / (2 * self.thetaSigma ** 2))  # 計算角度濾波器分量。
+        spread = pt.exp(-pt.pow(dtheta, 2) / (2 * self.thetaSigma ** 2))  # 計算角度濾波器分量（[norient, rows, cols]）。
 
-        logGabor_rep = pt.repeat_interleave(logGabor, self.norient, 1).view(-1, self.nscale, self.norient, rows, cols)  # 重複 Log-Gabor 濾波器。
+        filter_log_spread = logGabor.unsqueeze(1) * spread.unsqueeze(0)  # 結合徑向和角度濾波器。
+        ifftFilterArray = pt.fft.ifftn(filter_log_spread, dim=(-2, -1)).real * math.sqrt(rows * cols)  # 計算濾波器的逆傅里葉變換（取實部）。
 
-        spread_rep = pt.cat(self.nscale * [spread]).view(-1, self.nscale, self.norient, rows, cols)  # 重複角度濾波器。
-        filter_log_spread = logGabor_rep * spread_rep  # 結合徑向和角度濾波器。
-        array_of_zeros = pt.zeros(filter_log_spread.unsqueeze(5).size(), dtype=pt.float64)  # 創建零張量。
-        if self.cuda_computation:  # 若啟用 CUDA。
-            array_of_zeros = array_of_zeros.cuda()  # 將零張量移至 CUDA。
-        filter_log_spread_zero = pt.cat((filter_log_spread.unsqueeze(5), array_of_zeros), dim=5)  # 添加零通道。
-        ifftFilterArray = pt.ifft(filter_log_spread_zero, signal_ndim=2).select(5, 0) * math.sqrt(rows * cols)  # 計算濾波器的逆傅里葉變換。
+        # 噪聲估計所需的濾波器常數
+        EM_n = pt.sum(pt.sum(pt.pow(filter_log_spread[0], 2), 2), 1)  # 最小尺度濾波器能量。
+        EstSumAn2 = pt.sum(pt.pow(ifftFilterArray, 2), 0)  # 計算濾波器響應平方和。
+        sumEstSumAn2 = pt.sum(pt.sum(EstSumAn2, 1), 1)  # 求和。
+        rolling_mult = sum(ifftFilterArray * pt.roll(ifftFilterArray, n, 0) for n in (1, 2, 3))  # 尺度間滾動乘積。
+        EstSumAiAj = pt.sum(rolling_mult, 0) / 2  # 計算濾波器間交互項。
+        sumEstSumAiAj = pt.sum(pt.sum(EstSumAiAj, 1), 1)  # 求和。
+
+        bank = {"filter": filter_log_spread, "EM_n": EM_n, "sumEstSumAn2": sumEstSumAn2, "sumEstSumAiAj": sumEstSumAiAj}
+        bank = {name: value.to(self.dtype) for name, value in bank.items()}  # 以 float64 建立，再轉為計算精度。
+        self._filter_banks[key] = bank
+        return bank
 
-        imagefft_repeat = pt.cat(self.nscale * self.norient * [imagefft], dim=1).view(-1, self.nscale, self.norient, rows, cols, 2)  # 重複圖像傅里葉變換。
-        filter_log_spread_repeat = pt.cat(2 * [filter_log_spread.unsqueeze(5)], dim=5)  # 重複濾波器。
-        EO = pt.ifft(filter_log_spread_repeat * imagefft_repeat, signal_ndim=2)  # 卷積操作（頻率域）。
+    def phasecong2(self, img):  # 計算相位一致性。
+        """
+        計算圖像的相位一致性（Phase Congruency），基於 Log-Gabor 濾波器。
+        濾波器由徑向分量（控制頻率帶）和角度分量（控制方向）組成，取自 filter_bank 的快取。
+        """
+        batch, rows, cols = img.shape[0], img.shape[2], img.shape[3]  # 獲取批次、行數和列數。
+        bank = self.filter_bank(rows, cols)  # 取得濾波器組。
+        filter_log_spread = bank["filter"]
+
+        imagefft = pt.fft.fftn(img.to(self.dtype), dim=(-2, -1))  # 對圖像進行 2D 快速傅里葉變換（實數輸入，結果為複數張量）。
+        imagefft = imagefft.view(batch, 1, 1, rows, cols)  # 以廣播對應所有尺度與方向。
+        EO = pt.fft.ifftn(filter_log_spread * imagefft, dim=(-2, -1))  # 卷積操作（頻率域）。
 
-        E = EO.select(5, 0)  # 提取偶數濾波結果。
-        O = EO.select(5, 1)  # 提取奇數濾波結果。
+        E = EO.real  # 提取偶數濾波結果。
+        O = EO.imag  # 提取奇數濾波結果。
         An = pt.sqrt(pt.pow(E, 2) + pt.pow(O, 2))  # 計算響應幅度。
         sumAn_ThisOrient = pt.sum(An, 1)  # 按尺度求和。
         sumE_ThisOrient = pt.sum(E, 1)  # 偶數濾波結果求和。
         sumO_ThisOrient = pt.sum(O, 1)  # 奇數濾波結果求和。
 
         XEnergy = pt.sqrt(pt.pow(sumE_ThisOrient, 2) + pt.pow(sumO_ThisOrient, 2)) + self.epsilon  # 計算加權平均能量。
-        MeanE = sumE_ThisOrient / XEnergy  # 計算加權平均偶數響應。
-        MeanO = sumO_ThisOrient / XEnergy  # 計算加權平均奇數響應。
-
-        MeanO = pt.cat(self.nscale * [MeanO.unsqueeze(1)], 1)  # 擴展奇數響應。
-        MeanE = pt.cat(self.nscale * [MeanE.unsqueeze(1)], 1)  # 擴展偶數響應。
+        MeanE = (sumE_ThisOrient / XEnergy).unsqueeze(1)  # 計算加權平均偶數響應（廣播到各尺度）。
+        MeanO = (sumO_ThisOrient / XEnergy).unsqueeze(1)  # 計算加權平均奇數響應（廣播到各尺度）。
 
         # 計算能量（相位一致性乘以幅度）
         Energy = pt.sum(E * MeanE + O * MeanO - pt.abs(E * MeanO - O * MeanE), 1)  # 計算能量。
-        abs_EO = pt.sqrt(pt.pow(E, 2) + pt.pow(O, 2))  # 計算濾波響應幅度。
 
         # 估計噪聲功率
-        medianE2n = pt.pow(abs_EO.select(1, 0), 2).view(-1, self.norient, rows * cols).median(2).values  # 計算最小尺度的中位能量。
-        EM_n = pt.sum(pt.sum(pt.pow(filter_log_spread.select(1, 0), 2), 3), 2)  # 計算濾波器能量。
-        noisePower = -(medianE2n / math.log(0.5)) / EM_n  # 估計噪聲功率。
+        medianE2n = pt.pow(An.select(1, 0), 2).view(-1, self.norient, rows * cols).median(2).values  # 計算最小尺度的中位能量。
+        noisePower = -(medianE2n / math.log(0.5)) / bank["EM_n"]  # 估計噪聲功率。
 
         # 估計總噪聲能量
-        EstSumAn2 = pt.sum(pt.pow(ifftFilterArray, 2), 1)  # 計算濾波器響應平方和。
-        sumEstSumAn2 = pt.sum(pt.sum(EstSumAn2, 2), 2)  # 求和。
-        roll_t1 = ifftFilterArray * self.roll_1(ifftFilterArray, 1)  # 計算滾動濾波器乘積。
-        roll_t2 = ifftFilterArray * self.roll_1(ifftFilterArray, 2)  # 計算滾動濾波器乘積。
-        roll_t3 = ifftFilterArray * self.roll_1(ifftFilterArray, 3)  # 計算滾動濾波器乘積。
-        rolling_mult = roll_t1 + roll_t2 + roll_t3  # 結合滾動濾波器。
-        EstSumAiAj = pt.sum(rolling_mult, 1) / 2  # 計算濾波器間交互項。
-        sumEstSumAiAj = pt.sum(pt.sum(EstSumAiAj, 2), 2)  # 求和。
-
-        EstNoiseEnergy2 = 2 * noisePower * sumEstSumAn2 + 4 * noisePower * sumEstSumAiAj  # 估計噪聲能量平方。
+        EstNoiseEnergy2 = 2 * noisePower * bank["sumEstSumAn2"] + 4 * noisePower * bank["sumEstSumAiAj"]  # 估計噪聲能量平方。
         tau = pt.sqrt(EstNoiseEnergy2 / 2)  # 計算噪聲閾值參數。
         EstNoiseEnergy = tau * math.sqrt(self.pi / 2)  # 估計噪聲能量。
         EstNoiseEnergySigma = pt.sqrt((2 - self.pi / 2) * pt.pow(tau, 2))  # 估計噪聲標準差。
 
         T = (EstNoiseEnergy + self.k * EstNoiseEnergySigma) / 1.7  # 計算噪聲閾值（經驗調整）。
-        T_exp = pt.cat(rows * cols * [T.unsqueeze(2)], dim=2).view(-1, self.norient, rows, cols)  # 擴展閾值。
         AnAll = pt.sum(sumAn_ThisOrient, 1)  # 總幅度。
-        array_of_zeros_energy = pt.zeros(Energy.size(), dtype=pt.float64)  # 創建零張量。
-        if self.cuda_computation:  # 若啟用 CUDA。
-            array_of_zeros_energy = array_of_zeros_energy.cuda()  # 將零張量移至 CUDA。
-
-        EnergyAll = pt.sum(pt.where((Energy - T_exp) < 0.0, array_of_zeros_energy, Energy - T_exp), 1)  # 計算最終能量。
+        EnergyAll = pt.sum(pt.clamp(Energy - T.view(batch, self.norient, 1, 1), min=0.0), 1)  # 計算最終能量（低於閾值者設為 0）。
         ResultPC = EnergyAll / AnAll  # 計算相位一致性。
 
         return ResultPC
@@ -338,11 +320,18 @@ class FSIM(FSIM_base):  # 定義 FSIM 類（灰階版本）。
     """
     Note, the input is expected to be from 0 to 255
     """
-    def __init__(self):  # 初始化方法。
-        super().__init__()  # 調用父類初始化。
+    def __init__(self, dtype=pt.float64):  # 初始化方法，dtype 見 FSIM_base。
+        super().__init__(dtype)  # 調用父類初始化。
 
     def forward(self, imgr, imgd):  # 前向傳播。
-        if imgr.is_cuda:  # 若輸入在 CUDA 上。
+        return self.scores(imgr, imgd).mean()  # 返回平均 FSIM 分數。
+
+    def scores(self, imgr, imgd, mask=None):  # 計算批次中每張圖像的 FSIM 分數。
+        """
+        與 forward 相同，但返回形狀為 [batch] 的張量（每張圖像一個分數），供批次評估使用。
+        mask: 可選，形狀為 [batch, height, width] 的遮罩（非 0 為評估區域），只在遮罩像素上加總 FSIM
+        """
+        if imgr.is_cuda and not self.cuda_computation:  # 若輸入在 CUDA 上（只需移動一次）。
             self.set_arrays_to_cuda()  # 將內部張量移至 CUDA。
 
         I1, Q1, Y1 = self.process_image_channels(imgr)  # 處理參考圖像，提取 YIQ。
@@ -356,19 +345,21 @@ class FSIM(FSIM_base):  # 定義 FSIM 類（灰階版本）。
 
         gradientSimMatrix = self.calculate_gradient_sim(gradientMap1, gradientMap2)  # 計算梯度相似度。
         gradientSimMatrix = gradientSimMatrix.view(PCSimMatrix.size())  # 調整形狀。
-        FSIM = self.calculate_fsim(gradientSimMatrix, PCSimMatrix, PCm)  # 計算 FSIM 分數。
-
-        return FSIM.mean()  # 返回平均 FSIM 分數。
+        if mask is not None:  # 遮罩以與圖像相同的比例下採樣，作為 PCm 的權重。
+            F = max(1, round(min(imgr.shape[2], imgr.shape[3]) / 256))  # 與 process_image_channels 相同的下採樣比例。
+            mask = FUN.avg_pool2d(mask.to(PCm.dtype).unsqueeze(1), kernel_size=F, stride=F).view(PCm.size())
+            PCm = PCm * mask  # 遮罩外的像素權重為 0。
+        return self.calculate_fsim(gradientSimMatrix, PCSimMatrix, PCm)  # 計算每張圖像的 FSIM 分數。
 
 class FSIMc(FSIM_base, nn.Module):  # 定義 FSIMc 類（彩色版本）。
     """
     Note, the input is expected to be from 0 to 255
     """
-    def __init__(self):  # 初始化方法。
-        super().__init__()  # 調用父類初始化。
+    def __init__(self, dtype=pt.float64):  # 初始化方法，dtype 見 FSIM_base。
+        super().__init__(dtype)  # 調用父類初始化。
 
     def forward(self, imgr, imgd):  # 前向傳播。
-        if imgr.is_cuda:  # 若輸入在 CUDA 上。
+        if imgr.is_cuda and not self.cuda_computation:  # 若輸入在 CUDA 上（只需移動一次）。
             self.set_arrays_to_cuda()  # 將內部張量移至 CUDA。
 
         I1, Q1, Y1 = self.process_image_channels(imgr)  # 處理參考圖像，提取 YIQ。
@@ -384,4 +375,70 @@ class FSIMc(FSIM_base, nn.Module):  # 定義 FSIMc 類（彩色版本）。
         gradientSimMatrix = gradientSimMatrix.view(PCSimMatrix.size())  # 調整形狀。
         FSIMc = self.calculate_fsimc(I1.squeeze(), Q1.squeeze(), I2.squeeze(), Q2.squeeze(), gradientSimMatrix, PCSimMatrix, PCm)  # 計算 FSIMc 分數。
 
-        return FSIMc.mean()  # 返回平均 FSIMc 分數。
\ No newline at end of file
+        return FSIMc.mean()  # 返回平均 FSIMc 分數。
+
+# 舊版實作在 reference_fixture 上算出的分數，用於確認改寫後的數值與舊版一致。
+# 來源：commit ec3813a 的 evaluate/fsim.py（改用 torch.fft 之前、以 `torch.rfft(onesided=False)` / `torch.ifft(signal_ndim=2)`
+# 計算並逐批複製濾波器的版本），輸入為 reference_fixture() 的 float32 張量，以 FSIM().scores 與 FSIMc()(imgr, imgd) 在 CPU 上計算（torch 1.7.1，即 pyqt3.8.txt 鎖定的版本；舊版程式未經修改）。
+# 執行方式：python -m evaluate.fsim，或 benchmarks.bench_pipeline 的 fsim.reference_check 階段。
+REFERENCE_FSIM = (0.9837375554539319, 0.9605728667175242, 0.9521361805897317)  # 逐張 FSIM 分數。
+REFERENCE_FSIMC = 0.9607106310487769  # FSIMc 平均分數。
+REFERENCE_TOLERANCE = {pt.float64: 1e-6, pt.float32: 1e-4}  # 各計算精度允許的最大絕對差。
+
+def reference_fixture(count=3, size=64):  # 建立固定的小型測試圖像。
+    """
+    以固定公式與亂數種子產生 count 對 3 通道圖像（正弦紋理加雜訊，待評估圖像再加上遞增的雜訊），
+    數值為 0 到 255 的整數，與舊版參考分數 REFERENCE_FSIM、REFERENCE_FSIMC 對應。
+    返回:
+        (imgr, imgd)：float32 張量，形狀為 [count, 3, size, size]
+    """
+    rng = np.random.default_rng(2024)  # 固定種子，確保結果可重現。
+    y, x = np.mgrid[0:size, 0:size] / size
+    ref, dis = [], []
+    for k in range(count):
+        channels = [127.5 + 70 * np.sin(2 * np.pi * ((k + 1) * x + (c + 1) * y * 0.5)) * np.cos(2 * np.pi * (k + 2) * y) for c in range(3)]
+        image = np.clip(np.stack(channels) + rng.normal(0, 6, (3, size, size)), 0, 255).round()
+        noisy = np.clip(image + rng.normal(0, 4 * (k + 1), image.shape), 0, 255).round()
+        ref.append(image)
+        dis.append(noisy)
+    return pt.from_numpy(np.stack(ref)).float(), pt.from_numpy(np.stack(dis)).float()
+
+def check_reference(device="cpu"):  # 以舊版參考分數驗證 FSIM 與 FSIMc。
+    """
+    在 reference_fixture 上以 float64 與 float32 模式計算 FSIM、以 float64 計算 FSIMc，
+    與 REFERENCE_FSIM、REFERENCE_FSIMC 比較；任一差值超過 REFERENCE_TOLERANCE 時拋出 AssertionError。
+    參數:
+        device: 計算裝置（"cpu" 或 "cuda"）
+    返回:
+        字典：各模式的最大絕對差
+    """
+    imgr, imgd = (img.to(device) for img in reference_fixture())
+    expected = np.asarray(REFERENCE_FSIM, dtype=np.float64)
+    result = {}
+    with pt.no_grad():
+        for dtype in (pt.float64, pt.float32):
+            scores = FSIM(dtype).scores(imgr, imgd).cpu().numpy()
+            result[str(dtype).replace("torch.", "")] = float(np.max(np.abs(scores - expected)))
+        result["fsimc"] = abs(float(FSIMc(pt.float64)(imgr, imgd)) - REFERENCE_FSIMC)
+    limits = {"float64": REFERENCE_TOLERANCE[pt.float64], "float32": REFERENCE_TOLERANCE[pt.float32],
+              "fsimc": REFERENCE_TOLERANCE[pt.float64]}
+    failed = {name: diff for name, diff in result.items() if not diff <= limits[name]}  # NaN 也視為不一致。
+    if failed:
+        raise AssertionError(f"FSIM 與舊版參考分數不一致：{failed}（允許差值 {limits}）")
+    return result
+
+def compare_precision(imgr, imgd):  # 比較 float64 與 float32 模式的 FSIM 結果。
+    """
+    以同一批圖像分別在 float64 與 float32 模式下計算 FSIM，用於確認數值一致性（與舊版的比較見 check_reference）。
+    imgr, imgd: 批次張量，形狀為 [batch, 3, height, width]，數值範圍 0 到 255
+    返回:
+        字典：float64、float32 逐張分數（NumPy 陣列）及最大絕對差
+    """
+    with pt.no_grad():
+        scores64 = FSIM(pt.float64).scores(imgr, imgd).cpu().numpy()
+        scores32 = FSIM(pt.float32).scores(imgr, imgd).cpu().numpy()
+    return {"float64": scores64, "float32": scores32, "max_abs_diff_float32": float(np.max(np.abs(scores64 - scores32)))}
+
+if __name__ == "__main__":  # 直接執行時驗證與舊版的一致性（python -m evaluate.fsim；不一致時以非 0 結束）。
+    print(check_reference("cuda" if pt.cuda.is_available() else "cpu"))
+    print("FSIM 與舊版參考分數一致")
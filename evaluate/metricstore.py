@@ -0,0 +1,142 @@
+# 主要目的：此程式碼定義 `MetricStore` 類，將 `cal_all` 的逐張評估結果（PSNR、SSIM、FSIM、RMSE）逐筆串流寫入 CSV 檔或 Parquet 資料夾，並記錄每筆結果對應的真實圖像與遮罩路徑、真實圖像、修復圖像與遮罩的修改時間以及 FSIM 計算精度。重新評估時，路徑、修改時間與精度都未變的檔案（換用其他真實圖像或遮罩資料夾時會重新計算）會直接沿用已儲存的結果，只計算新增或更新的預測；平均值等彙整結果也直接由儲存的紀錄計算，並與不使用儲存時採用相同的平均規則（`average`）。CSV 只需標準函式庫，Parquet 需要 pyarrow（每次寫入一個 part 檔，讀取時合併）。
+
+import os  # 導入 os 模組，用於檔案路徑操作。
+import csv  # 導入 csv 模組，用於讀寫 CSV。
+import time  # 導入 time 模組，用於產生 Parquet part 檔名。
+
+METRICS = ("psnr", "ssim", "fsim", "rmse")  # 評估指標欄位。
+PATH_FIELDS = ("gt_path", "mask_path")  # 真實圖像與遮罩的絕對路徑（沒有遮罩時為空字串）。
+KEY_FIELDS = PATH_FIELDS + ("gt_mtime", "result_mtime", "mask_mtime")  # 判斷結果是否過期的欄位。
+TEXT_FIELDS = ("name", "fsim_dtype") + PATH_FIELDS  # 文字欄位（其餘欄位皆為浮點數）。
+FIELDS = ("name", "fsim_dtype") + KEY_FIELDS + METRICS  # 所有欄位。
+
+def average(records):  # cal_all 的平均規則（有無儲存都使用此函數）。
+    """
+    直接以算術平均計算各指標，與原本 cal_all 的 np.mean 相同：
+    完全相同的圖像 PSNR 為無限值，只要有一張，平均 PSNR 就是 inf（不略過，避免同一資料夾因設定不同而得到不同的平均）。
+    參數:
+        records: 可迭代的字典 {psnr, ssim, fsim, rmse}
+    返回:
+        字典 {count, psnr, ssim, fsim, rmse}；沒有紀錄時各指標為 nan
+    """
+    records = list(records)
+    summary = {"count": len(records)}
+    for key in METRICS:
+        summary[key] = sum(r[key] for r in records) / len(records) if records else float("nan")
+    return summary
+
+def file_key(gt_path, result_path, mask_path=None):  # 取得一組檔案的路徑與修改時間。
+    """
+    返回:
+        字典 {gt_path, mask_path, gt_mtime, result_mtime, mask_mtime}；沒有遮罩時 mask_path 為空字串、mask_mtime 為 0
+    """
+    return {
+        "gt_path": os.path.abspath(gt_path),
+        "mask_path": os.path.abspath(mask_path) if mask_path else "",
+        "gt_mtime": os.path.getmtime(gt_path),
+        "result_mtime": os.path.getmtime(result_path),
+        "mask_mtime": os.path.getmtime(mask_path) if mask_path else 0.0,
+    }
+
+class MetricStore:
+    def __init__(self, path, flush_every=256, fsim_dtype=""):  # 初始化方法，接收儲存路徑（.csv 檔或 .parquet 資料夾）。
+        self.path = path  # 儲存路徑。
+        self.fsim_dtype = fsim_dtype  # FSIM 計算精度（例如 "float64"）；精度不同的紀錄視為過期。
+        self._rewrite = False  # CSV 欄位與目前版本不同時，第一次寫入改為覆寫。
+        self.parquet = path.lower().endswith(".parquet")  # 依副檔名決定格式。
+        self.flush_every = flush_every  # Parquet 每累積多少筆寫出一個 part 檔。
+        self._buffer = []  # 尚未寫出的 Parquet 紀錄。
+        self._file = None  # CSV 檔案物件（附加模式）。
+        self._writer = None  # CSV 寫入器。
+        self.records = self.load()  # 已儲存的紀錄（檔名 -> 最新一筆）。
+
+    # ------------------------------
+    # 讀取
+    # ------------------------------
+    def load(self):  # 讀取已儲存的紀錄，同一檔名以最後寫入者為準。
+        records = {}
+        if self.parquet:
+            if not os.path.isdir(self.path):
+                return records
+            import pyarrow.parquet as pq  # Parquet 為可選功能，需要 pyarrow。
+            parts = sorted(f for f in os.listdir(self.path) if f.endswith(".parquet"))  # 依寫入順序讀取。
+            for part in parts:
+                for row in pq.read_table(os.path.join(self.path, part)).to_pylist():
+                    records[row["name"]] = row
+        elif os.path.exists(self.path):
+            with open(self.path, "r", newline="", encoding="utf-8") as f:
+                reader = csv.DictReader(f)
+                if reader.fieldnames and tuple(reader.fieldnames) != FIELDS:  # 舊版欄位：紀錄全部視為過期，寫入時覆寫。
+                    self._rewrite = True
+                    return records
+                for row in reader:
+                    records[row["name"]] = {key: row[key] if key in TEXT_FIELDS else float(row[key]) for key in FIELDS}
+        return records
+
+    def is_current(self, name, key):  # 判斷檔案的結果是否已儲存且未過期（路徑、修改時間與精度都相同）。
+        record = self.records.get(name)
+        return (record is not None and record.get("fsim_dtype") == self.fsim_dtype
+                and all(record.get(field) == key[field] for field in KEY_FIELDS))  # 舊版 Parquet 紀錄沒有路徑欄位，視為過期。
+
+    # ------------------------------
+    # 寫入
+    # ------------------------------
+    def append(self, name, key, metrics):  # 寫入一筆結果。
+        """
+        參數:
+            name: 檔名
+            key: file_key 的返回值
+            metrics: 字典 {psnr, ssim, fsim, rmse}
+        """
+        record = {"name": name, "fsim_dtype": self.fsim_dtype, **{field: key[field] if field in TEXT_FIELDS else float(key[field]) for field in KEY_FIELDS},
+                  **{metric: float(metrics[metric]) for metric in METRICS}}
+        self.records[name] = record
+        if self.parquet:  # Parquet 先累積，達到數量後寫出一個 part 檔。
+            self._buffer.append(record)
+            if len(self._buffer) >= self.flush_every:
+                self.flush()
+            return
+        if self._writer is None:  # 第一次寫入時以附加模式開啟 CSV。
+            new_file = self._rewrite or not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            self._file = open(self.path, "w" if self._rewrite else "a", newline="", encoding="utf-8")
+            self._rewrite = False
+            self._writer = csv.DictWriter(self._file, fieldnames=FIELDS)
+            if new_file:
+                self._writer.writeheader()
+        self._writer.writerow({key: repr(value) if isinstance(value, float) else value for key, value in record.items()})  # repr 保留完整精度，修改時間才能精確比對。
+        self._file.flush()  # 每筆立即寫入，中斷後可從已寫入的紀錄繼續。
+
+    def flush(self):  # 寫出尚未儲存的 Parquet 紀錄。
+        if not self._buffer:
+            return
+        import pyarrow as pa  # Parquet 為可選功能，需要 pyarrow。
+        import pyarrow.parquet as pq
+        os.makedirs(self.path, exist_ok=True)
+        part_path = os.path.join(self.path, f"part-{time.time_ns()}.parquet")  # 以時間命名，讀取時依序合併。
+        pq.write_table(pa.Table.from_pylist(self._buffer), part_path)
+        self._buffer = []
+
+    def close(self):  # 寫出緩衝並關閉檔案。
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file, self._writer = None, None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # ------------------------------
+    # 彙整
+    # ------------------------------
+    def aggregate(self, names=None):  # 由儲存的紀錄計算平均值。
+        """
+        參數:
+            names: 可選，只彙整這些檔名（例如目前資料夾中仍存在的檔案）
+        返回:
+            字典 {count, psnr, ssim, fsim, rmse}（平均規則見 average）
+        """
+        records = [self.records[n] for n in names if n in self.records] if names is not None else list(self.records.values())
+        return average(records)
@@ -0,0 +1,151 @@
+# 主要目的：此程式碼計算重建牙冠（`DentalModelReconstructor` 輸出的 STL）與真實牙冠之間的 3D 表面偏差，包括 Hausdorff 距離、平均/均方根（RMS）表面距離與百分位偏差。每個查詢點（網格頂點，可選擇再依面積在三角形上均勻取樣加密）都計算到另一網格三角形上最近點的距離（`vtkImplicitPolyDataDistance` 搭配靜態單元定位器，一次在 C++ 中批次計算），而不是到最近頂點的距離，因此結果不受網格密度影響；並計算雙向距離。主函數 `cal_all_3d` 以與 `cal_all` 相同的文本格式批量處理兩個資料夾中檔名相同的網格，是 2D 深度圖指標（PSNR/SSIM/FSIM/RMSE）之外的 3D 品質評估。
+
+import os  # 導入 os 模組，用於文件和路徑操作。
+import numpy as np  # 導入 NumPy 庫，用於數值運算和陣列處理。
+import vtk  # 導入 VTK 庫，用於讀取網格。
+from vtkmodules.util import numpy_support as nps  # 導入 VTK NumPy 支援模組，用於陣列轉換。
+
+MESH_EXTENSIONS = ('.stl', '.ply', '.obj')  # 支援的網格格式。
+
+# 載入網格模型並轉為三角形網格
+def load_mesh(file_path):  # 定義載入網格的函數。
+    ext = os.path.splitext(file_path)[1].lower()  # 獲取文件擴展名並轉為小寫。
+    if ext == '.ply':  # 根據副檔名選擇讀取器。
+        reader = vtk.vtkPLYReader()
+    elif ext == '.stl':
+        reader = vtk.vtkSTLReader()
+    elif ext == '.obj':
+        reader = vtk.vtkOBJReader()
+    else:
+        raise ValueError(f"Unsupported file format: {ext}")  # 不支援的格式，拋出錯誤。
+    reader.SetFileName(file_path)
+    triangles = vtk.vtkTriangleFilter()  # 轉為三角形，方便取樣。
+    triangles.SetInputConnection(reader.GetOutputPort())
+    triangles.Update()
+    polydata = triangles.GetOutput()
+    if polydata.GetNumberOfPoints() == 0:  # 檢查網格是否有效。
+        raise ValueError(f"Failed to load mesh from {file_path}")
+    return polydata
+
+def mesh_points(polydata):  # 取得網格頂點（NumPy 陣列，[N, 3]）。
+    return nps.vtk_to_numpy(polydata.GetPoints().GetData()).astype(np.float64)
+
+def sample_surface(polydata, spacing, seed=0):  # 依面積在三角形上均勻取樣。
+    """
+    在網格表面上以約 spacing 的間距隨機取樣，讓最近點距離更接近點到面的距離。
+    參數:
+        polydata: 三角形網格
+        spacing: 取樣間距（mm）；樣本數約為 總面積 / spacing^2
+        seed: 亂數種子（確保結果可重現）
+    返回:
+        NumPy 陣列，[M, 3] 的表面取樣點（含原頂點）
+    """
+    points = mesh_points(polydata)
+    cells = nps.vtk_to_numpy(polydata.GetPolys().GetData()).reshape(-1, 4)[:, 1:]  # 三角形頂點索引（每列以點數 3 開頭）。
+    a, b, c = points[cells[:, 0]], points[cells[:, 1]], points[cells[:, 2]]
+    areas = 0.5 * np.linalg.norm(np.cross(b - a, c - a), axis=1)  # 三角形面積。
+    total = areas.sum()
+    if not np.isfinite(total) or total <= 0:  # 退化網格（總面積為 0）無法依面積取樣，只使用頂點。
+        return points
+    count = int(total / spacing ** 2)  # 取樣數。
+    if count == 0:
+        return points
+    rng = np.random.default_rng(seed)
+    chosen = rng.choice(len(cells), size=count, p=areas / total)  # 依面積選擇三角形。
+    u, v = rng.random(count), rng.random(count)  # 均勻的重心座標。
+    flip = u + v > 1
+    u[flip], v[flip] = 1 - u[flip], 1 - v[flip]
+    samples = a[chosen] + u[:, None] * (b[chosen] - a[chosen]) + v[:, None] * (c[chosen] - a[chosen])
+    return np.vstack((points, samples))
+
+def directed_distances(source_points, target_mesh):  # 單向點到表面距離。
+    """
+    計算每個來源點到目標網格三角形上最近點的距離（不是到最近頂點），一次在 C++ 中批次計算。
+    參數:
+        source_points: NumPy 陣列 [N, 3]
+        target_mesh: vtkPolyData，三角形網格
+    返回:
+        NumPy 陣列 [N]
+    """
+    dist_calc = vtk.vtkImplicitPolyDataDistance()  # 點到表面的距離函數。
+    dist_calc.SetInput(target_mesh)
+    if hasattr(dist_calc, "SetLocator"):  # 新版 VTK 可指定定位器；靜態單元定位器建立與查詢都較快。
+        locator = vtk.vtkStaticCellLocator()
+        locator.SetDataSet(target_mesh)
+        locator.BuildLocator()
+        dist_calc.SetLocator(locator)
+    values = vtk.vtkDoubleArray()
+    dist_calc.FunctionValue(nps.numpy_to_vtk(np.ascontiguousarray(source_points, dtype=np.float64), deep=False), values)
+    return np.abs(nps.vtk_to_numpy(values))  # 簽署距離的絕對值即到表面的距離。
+
+def surface_deviation(result_mesh, gt_mesh, percentiles=(95,), spacing=None):  # 計算兩個網格的表面偏差。
+    """
+    計算重建網格與真實網格的雙向表面偏差。
+    參數:
+        result_mesh: vtkPolyData，重建網格
+        gt_mesh: vtkPolyData，真實網格
+        percentiles: 要回報的百分位偏差
+        spacing: 可選，查詢點的表面取樣間距（mm）；None 時只以頂點查詢（距離仍量到對方的三角形表面）
+    返回:
+        字典 {hausdorff, mean, rms, p<百分位>...}（單位與網格相同，通常為 mm）
+    """
+    result_points = sample_surface(result_mesh, spacing) if spacing else mesh_points(result_mesh)  # 查詢點（可加密）。
+    gt_points = sample_surface(gt_mesh, spacing) if spacing else mesh_points(gt_mesh)
+    forward = directed_distances(result_points, gt_mesh)  # 重建 -> 真實表面。
+    backward = directed_distances(gt_points, result_mesh)  # 真實 -> 重建表面。
+    distances = np.concatenate((forward, backward))  # 雙向距離。
+    metrics = {
+        "hausdorff": float(max(forward.max(), backward.max())),
+        "mean": float(distances.mean()),
+        "rms": float(np.sqrt(np.mean(distances ** 2))),
+    }
+    for q in percentiles:  # 百分位偏差。
+        metrics[f"p{q:g}"] = float(np.percentile(distances, q))
+    return metrics
+
+def find_common_meshes(path_gt, path_result):  # 以不含副檔名的檔名配對兩個資料夾中的網格。
+    def index(folder):
+        return {os.path.splitext(f)[0]: f for f in sorted(os.listdir(folder)) if f.lower().endswith(MESH_EXTENSIONS)}
+    gt_files, result_files = index(path_gt), index(path_result)
+    return [(name, gt_files[name], result_files[name]) for name in result_files if name in gt_files]
+
+def _label(key):  # 報告中的指標名稱（例如 Hausdorff、RMS、P95）。
+    return {"rms": "RMS"}.get(key, key.upper() if key.startswith("p") else key.capitalize())
+
+# 計算所有網格的表面偏差並保存結果
+def cal_all_3d(path_gt, path_result, txt_path, percentiles=(95,), spacing=None):  # 定義批量計算 3D 指標的函數。
+    """
+    計算兩個資料夾中所有同名網格的 Hausdorff、平均、RMS 與百分位表面偏差，並以與 cal_all 相同的格式保存到文本文件。
+    參數:
+        path_gt: 真實網格資料夾路徑
+        path_result: 重建網格資料夾路徑
+        txt_path: 結果保存的文本文件路徑
+        percentiles: 要回報的百分位偏差
+        spacing: 可選，查詢點的表面取樣間距（mm）
+    返回:
+        字典，檔名 -> 指標字典
+    """
+    print('computing...')  # 提示計算開始。
+    results = {}
+    with open(txt_path, 'w', encoding='utf-8') as file:  # 打開文本文件以寫入結果（使用 UTF-8 編碼）。
+        for name, gt_file, result_file in find_common_meshes(path_gt, path_result):
+            try:
+                r = surface_deviation(load_mesh(os.path.join(path_result, result_file)),
+                                      load_mesh(os.path.join(path_gt, gt_file)), percentiles, spacing)
+            except ValueError as e:  # 無法讀取的網格跳過。
+                print(f"跳過無法比較的網格: {result_file} ({e})")
+                continue
+            results[result_file] = r
+            result_str = f"{result_file} - " + ", ".join(f"{_label(key)}: {value:.4f}" for key, value in r.items()) + "\n"  # 格式化結果字符串。
+            file.write(result_str)  # 寫入文件。
+            print(result_str)  # 同時打印到控制台。
+
+        # 如果有成功處理的數據，計算並保存平均值
+        if results:
+            keys = next(iter(results.values())).keys()
+            avg_str = "\nAverages:\n" + "\n".join(
+                f"{_label(key)}: {np.mean([r[key] for r in results.values()]):.4f}"
+                for key in keys)  # 格式化平均值字符串。
+            file.write(avg_str)  # 寫入文件。
+            print(avg_str)  # 打印到控制台。
+    return results
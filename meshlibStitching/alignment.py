@@ -0,0 +1,132 @@
+# 主要目的：此程式碼提供 `MeshProcessor` 使用的多解析度剛體對齊（coarse-to-fine ICP），取代對全解析度網格直接執行 100 次迭代的 `vtkIterativeClosestPointTransform`。目標網格（缺陷牙）的頂點只建立一次 KD-tree，來源網格（修復牙）先以體素（voxel）降採樣、必要時再隨機抽樣，從粗到細逐層以點到平面（point-to-plane）最小平方法求解，最後以全解析度微調。每一層都記錄點數、迭代次數與殘差，方便確認加速沒有犧牲精度。
+
+import numpy as np  # 導入 NumPy 庫，用於數值運算。
+import scipy  # 導入 SciPy，用於判斷 cKDTree 平行查詢參數的名稱。
+from scipy.spatial import cKDTree  # 導入 KD-tree，用於最近點查詢。
+
+LEVELS = (0.04, 0.02, 0.01)  # 各層體素大小（相對於目標包圍盒對角線），由粗到細。
+# cKDTree.query 的平行參數：SciPy 1.6 起為 workers，之前（專案鎖定的 1.4.1）為 n_jobs。
+KDTREE_PARALLEL = {"workers": -1} if tuple(int(v) for v in scipy.__version__.split(".")[:2]) >= (1, 6) else {"n_jobs": -1}
+MAX_LEVEL_POINTS = 20000  # 降採樣層的最大點數，超過時隨機抽樣。
+REJECT_FACTOR = 3.0  # 距離超過中位數此倍數的對應點視為離群值。
+
+def voxel_subsample(points, voxel_size, max_points=None, seed=0):
+    """
+    體素降採樣：每個體素只保留一個點；點數仍超過 max_points 時再隨機抽樣。
+    返回:
+        降採樣後的點（[M, 3]）
+    """
+    if voxel_size > 0:
+        keys = np.floor((points - points.min(axis=0)) / voxel_size).astype(np.int64)
+        _, first = np.unique(keys, axis=0, return_index=True)  # 每個體素的第一個點。
+        points = points[np.sort(first)]
+    if max_points is not None and len(points) > max_points:
+        rng = np.random.default_rng(seed)  # 固定種子，確保結果可重現。
+        points = points[np.sort(rng.choice(len(points), max_points, replace=False))]
+    return points
+
+def transform_points(points, matrix):
+    """以 4x4 矩陣變換點"""
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
+
+def twist_to_matrix(x):
+    """將小角度解 (ωx, ωy, ωz, tx, ty, tz) 轉為剛體 4x4 矩陣（Rodrigues 公式，保持正交）"""
+    w, t = x[:3], x[3:]
+    matrix = np.eye(4)
+    theta = np.linalg.norm(w)
+    if theta > 1e-12:
+        k = w / theta
+        K = np.array([[0, -k[2], k[1]], [k[2], 0, -k[0]], [-k[1], k[0], 0]])
+        matrix[:3, :3] = np.eye(3) + np.sin(theta) * K + (1 - np.cos(theta)) * (K @ K)
+    matrix[:3, 3] = t
+    return matrix
+
+def point_to_plane_step(source, target, normals):
+    """
+    點到平面的一步線性化最小平方法：最小化 Σ((R p + t - q)·n)²。
+    返回:
+        此步的 4x4 增量變換
+    """
+    A = np.hstack((np.cross(source, normals), normals))
+    b = np.einsum("ij,ij->i", target - source, normals)
+    x, *_ = np.linalg.lstsq(A, b, rcond=None)
+    return twist_to_matrix(x)
+
+class AlignmentEngine:
+    """對固定目標網格的多解析度 ICP；目標 KD-tree 只建立一次，可重複對齊多個來源"""
+
+    def __init__(self, target_points, target_normals):
+        """
+        參數:
+            target_points: 目標網格頂點（[N, 3]）
+            target_normals: 目標網格頂點法向量（[N, 3]）
+        """
+        self.points = np.asarray(target_points, dtype=np.float64)
+        self.normals = np.asarray(target_normals, dtype=np.float64)
+        self.tree = cKDTree(self.points)  # 靜態 KD-tree。
+        self.diagonal = float(np.linalg.norm(self.points.max(axis=0) - self.points.min(axis=0)))
+
+    def residual(self, source, matrix):
+        """
+        計算目前變換下的殘差。
+        返回:
+            (點到平面 RMS, 平均最近距離)
+        """
+        moved = transform_points(source, matrix)
+        distances, index = self.tree.query(moved, **KDTREE_PARALLEL)
+        plane = np.einsum("ij,ij->i", moved - self.points[index], self.normals[index])
+        return float(np.sqrt(np.mean(plane ** 2))), float(distances.mean())
+
+    def iterate(self, source, matrix, max_iterations, tolerance):
+        """
+        以固定點集執行點到平面 ICP，直到殘差變化小於 tolerance。
+        返回:
+            (matrix, 迭代次數)
+        """
+        previous = np.inf
+        iterations = 0
+        for iterations in range(1, max_iterations + 1):
+            moved = transform_points(source, matrix)
+            distances, index = self.tree.query(moved, **KDTREE_PARALLEL)
+            keep = distances <= REJECT_FACTOR * np.median(distances) + 1e-12  # 剔除離群的對應點。
+            target, normals = self.points[index[keep]], self.normals[index[keep]]
+            rms = np.sqrt(np.mean(np.einsum("ij,ij->i", moved[keep] - target, normals) ** 2))
+            if abs(previous - rms) < tolerance:
+                break
+            previous = rms
+            matrix = point_to_plane_step(moved[keep], target, normals) @ matrix
+        return matrix, iterations
+
+    def align(self, source_points, initial=None, levels=LEVELS, max_iterations=30, final_iterations=10,
+              tolerance=1e-6, max_points=MAX_LEVEL_POINTS):
+        """
+        將來源點由粗到細對齊到目標。
+        參數:
+            source_points: 來源網格頂點（[M, 3]）
+            initial: 可選，4x4 起始變換；None 時先對齊兩者質心
+            levels: 各層體素大小（相對於目標對角線）；傳入空序列時只做全解析度微調
+            max_iterations: 每個降採樣層的最大迭代次數
+            final_iterations: 全解析度微調的最大迭代次數
+            tolerance: 殘差變化小於此值即停止
+            max_points: 降採樣層的最大點數
+        返回:
+            (4x4 變換矩陣, 報告字典 {levels, iterations, rms, mean_distance})
+        """
+        source = np.asarray(source_points, dtype=np.float64)
+        if initial is None:
+            matrix = np.eye(4)
+            matrix[:3, 3] = self.points.mean(axis=0) - source.mean(axis=0)  # 對齊質心。
+        else:
+            matrix = np.array(initial, dtype=np.float64)
+
+        report = {"levels": []}
+        stages = [(level * self.diagonal, max_iterations, max_points) for level in levels]
+        stages.append((0, final_iterations, None))  # 最後以全解析度微調。
+        for voxel, iterations, limit in stages:
+            points = voxel_subsample(source, voxel, limit)
+            matrix, used = self.iterate(points, matrix, iterations, tolerance)
+            rms, _ = self.residual(points, matrix)
+            report["levels"].append({"voxel": voxel, "points": len(points), "iterations": used, "rms": rms})
+        report["iterations"] = sum(level["iterations"] for level in report["levels"])
+        report["rms"], report["mean_distance"] = self.residual(source, matrix)
+        return matrix, report
@@ -0,0 +1,93 @@
+# 主要目的：此程式碼提供 vtkPolyData、meshlib 的 mrmeshpy.Mesh 與 pymeshlab.Mesh 之間的記憶體內轉換，讓 `MeshProcessor` 的各階段直接傳遞網格，而不需要在每個階段之間寫出再讀回 STL 檔。三者都以相同的頂點陣列 [N, 3] 與三角形索引陣列 [M, 3] 交換資料：VTK 端以 `vtk_to_numpy` / `numpy_to_vtk`（deep=False）共用記憶體，不複製；meshlib 與 pymeshlab 各自管理記憶體，建立網格時各複製一次陣列（仍遠快於寫檔與讀檔）。
+
+import numpy as np  # 導入 NumPy 庫，用於頂點與面陣列。
+import vtkmodules.all as vtk  # 導入 VTK 庫。
+from vtkmodules.util import numpy_support as nps  # 導入 VTK NumPy 支援模組，用於陣列轉換。
+
+# ------------------------------
+# vtkPolyData <-> 陣列
+# ------------------------------
+def polydata_to_arrays(polydata):
+    """
+    取得 vtkPolyData 的頂點與三角形陣列（不複製）；含非三角形單元時先轉為三角形。
+    返回:
+        (verts [N, 3], faces [M, 3])
+    """
+    offsets = nps.vtk_to_numpy(polydata.GetPolys().GetOffsetsArray())
+    if polydata.GetNumberOfStrips() or np.any(np.diff(offsets) != 3):  # 非三角形網格。
+        triangles = vtk.vtkTriangleFilter()
+        triangles.SetInputData(polydata)
+        triangles.Update()
+        polydata = triangles.GetOutput()
+    verts = nps.vtk_to_numpy(polydata.GetPoints().GetData())
+    faces = nps.vtk_to_numpy(polydata.GetPolys().GetConnectivityArray()).reshape(-1, 3)
+    return verts, faces
+
+def arrays_to_polydata(verts, faces):
+    """
+    以頂點與三角形陣列建立 vtkPolyData；陣列型別相符時直接共用記憶體（VTK 物件保留陣列參考）。
+    """
+    verts = np.ascontiguousarray(verts, dtype=np.float32 if verts.dtype == np.float32 else np.float64)
+    faces = np.ascontiguousarray(faces, dtype=nps.ID_TYPE_CODE).reshape(-1)
+    points = vtk.vtkPoints()
+    points.SetData(nps.numpy_to_vtk(verts, deep=False))
+    cells = vtk.vtkCellArray()
+    cells.SetData(nps.numpy_to_vtkIdTypeArray(np.arange(0, len(faces) + 1, 3, dtype=nps.ID_TYPE_CODE), deep=True),
+                  nps.numpy_to_vtkIdTypeArray(faces, deep=False))
+    polydata = vtk.vtkPolyData()
+    polydata.SetPoints(points)
+    polydata.SetPolys(cells)
+    return polydata
+
+# ------------------------------
+# mrmeshpy.Mesh <-> 陣列
+# ------------------------------
+def mrmesh_to_arrays(mesh):
+    """
+    取得 mrmeshpy.Mesh 的頂點與有效的三角形陣列。
+    getNumpyVerts / getNumpyFaces 會包含已刪除的頂點與面（例如補洞、刪除區域後留下的空位），
+    因此網格含無效項目時先以 pack() 就地重新編號（網格幾何不變，但頂點與面的索引會改變）。
+    返回:
+        (verts [N, 3], faces [M, 3])
+    """
+    from meshlib import mrmeshnumpy
+    topology = mesh.topology
+    if topology.numValidFaces() != topology.faceSize() or topology.numValidVerts() != topology.vertSize():  # 含無效項目。
+        mesh.pack()
+    return mrmeshnumpy.getNumpyVerts(mesh), mrmeshnumpy.getNumpyFaces(mesh.topology)
+
+def arrays_to_mrmesh(verts, faces):
+    """以頂點與三角形陣列建立 mrmeshpy.Mesh"""
+    from meshlib import mrmeshnumpy
+    return mrmeshnumpy.meshFromFacesVerts(np.ascontiguousarray(faces, dtype=np.int32),
+                                          np.ascontiguousarray(verts, dtype=np.float32))
+
+# ------------------------------
+# pymeshlab.Mesh <-> 陣列
+# ------------------------------
+def pymesh_to_arrays(mesh):
+    """取得 pymeshlab.Mesh 的頂點與三角形陣列"""
+    return mesh.vertex_matrix(), mesh.face_matrix()
+
+def arrays_to_pymesh(verts, faces):
+    """以頂點與三角形陣列建立 pymeshlab.Mesh"""
+    import pymeshlab
+    return pymeshlab.Mesh(vertex_matrix=np.asarray(verts, dtype=np.float64), face_matrix=np.asarray(faces, dtype=np.int32))
+
+# ------------------------------
+# 組合轉換
+# ------------------------------
+def polydata_to_mrmesh(polydata):
+    return arrays_to_mrmesh(*polydata_to_arrays(polydata))
+
+def mrmesh_to_polydata(mesh):
+    return arrays_to_polydata(*mrmesh_to_arrays(mesh))
+
+def polydata_to_pymesh(polydata):
+    return arrays_to_pymesh(*polydata_to_arrays(polydata))
+
+def pymesh_to_polydata(mesh):
+    return arrays_to_polydata(*pymesh_to_arrays(mesh))
+
+def mrmesh_to_pymesh(mesh):
+    return arrays_to_pymesh(*mrmesh_to_arrays(mesh))
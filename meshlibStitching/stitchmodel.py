@@ -2,22 +2,68 @@ import vtk
 import numpy as np
 from meshlib import mrmeshpy
 import os
+import json
+import hashlib
 import pymeshlab
 # import meshlib.mrmeshpy as mr
 import vtkmodules.all as vtk
 import numpy as np
+from vtkmodules.util import numpy_support as nps
+from . import meshconvert
+from .alignment import AlignmentEngine
+
+ICP_CACHE_FILE = "icp_cache.json"  # ICP 變換快取檔（存於輸出資料夾）
+ICP_CACHE_VERSION = "alignment-engine-1"  # 對齊演算法版本；與快取檔記錄的不同時整份快取作廢（例如舊版 vtkIterativeClosestPointTransform 的矩陣）
+ICP_REFINE_ITERATIONS = 20  # 輸入改變時，以上次變換為起點的全解析度微調迭代次數
+ICP_CACHE_LIMIT = 64  # 快取最多保留的變換數與檔案組合數；超過時捨棄最久未使用者
+_icp_cache = {}  # 輸出資料夾 -> 快取內容；跨 MeshProcessor 實例共用（每個按鈕都會建立新的處理器）
+
+def touch_cache_entry(entries, key, value=None, limit=ICP_CACHE_LIMIT):
+    """
+    將 key 移到最近使用的位置（dict 與 JSON 都保留插入順序，最前面即最久未使用），超過 limit 時捨棄最舊的項目
+    value 為 None 時沿用原本的值；返回被捨棄的 key 列表
+    """
+    entries[key] = entries.pop(key) if value is None else value
+    evicted = list(entries)[:max(len(entries) - limit, 0)]
+    for old in evicted:
+        del entries[old]
+    return evicted
+
+def file_digest(file_path):
+    """以 SHA-1 計算檔案內容雜湊（分塊讀取）"""
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def matrix_to_list(matrix):
+    """vtkMatrix4x4 -> 16 個元素的列表（列優先）"""
+    return [matrix.GetElement(i, j) for i in range(4) for j in range(4)]
+
+def list_to_matrix(values):
+    """16 個元素的列表（列優先） -> vtkMatrix4x4"""
+    matrix = vtk.vtkMatrix4x4()
+    matrix.DeepCopy(list(values))
+    return matrix
 
 class MeshProcessor:
-    def __init__(self, defect_file_path, repair_file_path, output_folder):
-        """初始化函數，使用輸入的STL檔案路徑和輸出資料夾"""
+    def __init__(self, defect_file_path, repair_file_path, output_folder, debug=False):
+        """
+        初始化函數，使用輸入的STL檔案路徑和輸出資料夾
+        debug: 為 True 時才將各階段的中間網格（aligned_、hole_、merge_、stitched_ 等）寫成檔案；
+               各階段之間一律在記憶體中傳遞網格，只有最終結果一定會寫檔
+        """
         self.inlay_file_path = None  # 初始化賦予自動摳出inlay_surface的檔案路徑
-        self.hole_file_path = None   # 初始化賦予自動摳出hole的檔案路徑
+        self.hole_file_path = None   # 初始化賦予自動摳出hole的檔案路徑（僅 debug 時寫出）
+        self.hole_polydata = None    # 記憶體中的hole網格
+        self.icp_report = None       # 最近一次 ICP 的迭代次數與殘差
+        self.debug = debug
         self.defect_file_path = defect_file_path  # 缺陷牙檔案路徑
         self.repair_file_path = repair_file_path  # 修復牙檔案路徑
         self.output_folder = output_folder  # 指定的輸出資料夾
         self.file_name = os.path.splitext(os.path.basename(repair_file_path))[0]  # 從修復牙檔案提取檔案名稱（不含副檔名）
     def run_icp(self):
-        icp= vtk.vtkIterativeClosestPointTransform()
         repair_reader = self.get_vtk_reader(self.repair_file_path)
         repair_reader.SetFileName(self.repair_file_path)
         repair_reader.Update()
@@ -27,23 +73,97 @@ class MeshProcessor:
         defect_reader.SetFileName(self.defect_file_path)
         defect_reader.Update()
         defect_polydata = defect_reader.GetOutput()
-        icp.SetSource(repair_polydata)
-        icp.SetTarget(defect_polydata)
-        icp.GetLandmarkTransform().SetModeToRigidBody()
-        icp.SetMaximumNumberOfIterations(100)
-        icp.SetMaximumMeanDistance(0.00001)
-        icp.StartByMatchingCentroidsOn()
-        icp.Modified()
-        icp.Update()
         transform_filter = vtk.vtkTransformPolyDataFilter()
         transform_filter.SetInputData(repair_polydata)
-        transform_filter.SetTransform(icp)
+        transform_filter.SetTransform(self.icp_transform(repair_polydata, defect_polydata))
         transform_filter.Update()
         target_file_name = f"only_align_{self.file_name}.stl"
         aligned_polydata = vtk.vtkPolyData()
         aligned_polydata.DeepCopy(transform_filter.GetOutput())
         self.save_to_stitch_folder(target_file_name, aligned_polydata)  # 儲存對齊後的模型
         return transform_filter.GetOutput()  # 返回對齊後的模型
+
+    def icp_cache(self):
+        """取得此輸出資料夾的 ICP 快取（第一次使用時從檔案載入；演算法版本不同時捨棄）"""
+        folder = os.path.normpath(os.path.abspath(self.output_folder))
+        if folder not in _icp_cache:
+            cache = {"version": ICP_CACHE_VERSION, "pairs": {}, "latest": {}, "reports": {}}
+            cache_path = os.path.join(folder, ICP_CACHE_FILE)
+            if os.path.exists(cache_path):
+                try:
+                    with open(cache_path, "r", encoding="utf-8") as f:
+                        stored = json.load(f)
+                    if stored.get("version") == ICP_CACHE_VERSION:
+                        cache.update(stored)
+                    else:  # 由其他版本的對齊演算法產生，矩陣不可沿用。
+                        print(f"ICP 快取版本不符（{stored.get('version')}），重新計算對齊")
+                except (OSError, ValueError, AttributeError) as e:  # 快取損壞時重新建立。
+                    print(f"無法讀取 ICP 快取: {e}")
+            _icp_cache[folder] = cache
+        return _icp_cache[folder]
+
+    def save_icp_cache(self):
+        """將 ICP 快取寫回輸出資料夾"""
+        if not os.path.exists(self.output_folder):
+            os.makedirs(self.output_folder)
+        with open(os.path.join(self.output_folder, ICP_CACHE_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.icp_cache(), f)
+
+    def run_icp_alignment(self, source_polydata, target_polydata, initial_matrix=None):
+        """
+        以多解析度點到平面 ICP（alignment.AlignmentEngine）將 source 對齊到 target，返回 vtkMatrix4x4
+        initial_matrix: 可選，作為起點的變換；有起點時略過粗層，只做全解析度微調
+        迭代次數與殘差記錄在 self.icp_report
+        """
+        _, target_points, target_normals = self.point_normals(target_polydata)
+        engine = AlignmentEngine(target_points, target_normals)  # 目標 KD-tree 只建立一次
+        source_points = nps.vtk_to_numpy(source_polydata.GetPoints().GetData())
+        if initial_matrix is None:
+            matrix, report = engine.align(source_points)
+        else:
+            initial = np.array(matrix_to_list(initial_matrix)).reshape(4, 4)
+            matrix, report = engine.align(source_points, initial, levels=(), final_iterations=ICP_REFINE_ITERATIONS)
+        self.icp_report = report
+        for level in report["levels"]:
+            print(f"ICP 層級: 點數 {level['points']}, 迭代 {level['iterations']}, 殘差 {level['rms']:.6f}")
+        print(f"ICP 完成: 總迭代 {report['iterations']}, 點到平面 RMS {report['rms']:.6f}, "
+              f"平均距離 {report['mean_distance']:.6f}")
+        return list_to_matrix(matrix.ravel())
+
+    def icp_transform(self, source_polydata, target_polydata):
+        """
+        取得修復牙（source）對齊到缺陷牙（target）的變換，以兩個檔案的內容雜湊快取
+        - 內容相同：直接沿用快取的 4x4 矩陣，不執行 ICP
+        - 同一組檔案但內容改變：以上次的矩陣為起點做微調
+        - 沒有任何記錄：完整執行 ICP
+        返回:
+            vtkTransform
+        """
+        cache = self.icp_cache()
+        key = f"{file_digest(self.defect_file_path)}:{file_digest(self.repair_file_path)}"
+        pair = f"{os.path.abspath(self.defect_file_path)}|{os.path.abspath(self.repair_file_path)}"
+        if key in cache["pairs"]:
+            print("沿用快取的 ICP 變換")
+            matrix = list_to_matrix(cache["pairs"][key])
+            self.icp_report = cache["reports"].get(key)
+            if list(cache["pairs"])[-1] != key:  # 更新使用順序（已是最近使用時不必重寫快取檔）
+                touch_cache_entry(cache["pairs"], key)
+                self.save_icp_cache()
+        else:
+            previous = cache["latest"].get(pair)
+            if previous is not None:
+                print("輸入已改變，以上次的 ICP 變換為起點微調")
+            matrix = self.run_icp_alignment(source_polydata, target_polydata,
+                                            None if previous is None else list_to_matrix(previous))
+            values = matrix_to_list(matrix)
+            for old in touch_cache_entry(cache["pairs"], key, values):  # 變換與報告一起捨棄
+                cache["reports"].pop(old, None)
+            cache["reports"][key] = self.icp_report
+            touch_cache_entry(cache["latest"], pair, values)
+            self.save_icp_cache()
+        transform = vtk.vtkTransform()
+        transform.SetMatrix(matrix)
+        return transform
     def extract_patch_from_points(self, mesh, points):
         vtk_points = vtk.vtkPoints()
         polyline = vtk.vtkPolyLine()
@@ -89,28 +209,20 @@ class MeshProcessor:
 
     def align_models_icp(self, source_polydata, target_polydata):
         """
-        使用 VTK 的 ICP 對齊 source 到 target
+        以多解析度點到平面 ICP（alignment.AlignmentEngine）對齊 source 到 target（變換依內容雜湊快取，與 run_icp 共用）
         :param source_polydata: 要移動的模型（修復牙）
         :param target_polydata: 目標模型（缺陷牙）
-        :return: 回傳修復牙對齊後的絕對路徑
+        :return: 回傳修復牙對齊後的模型（vtkPolyData）；debug 時另外輸出中間檔案
         """
-        icp = vtk.vtkIterativeClosestPointTransform()
-        icp.SetSource(source_polydata)
-        icp.SetTarget(target_polydata)
-        icp.GetLandmarkTransform().SetModeToRigidBody()
-        icp.SetMaximumNumberOfIterations(100)
-        icp.SetMaximumMeanDistance(0.00001)
-        icp.StartByMatchingCentroidsOn()
-        icp.Modified()
-        icp.Update()
-
         transform_filter = vtk.vtkTransformPolyDataFilter()
         transform_filter.SetInputData(source_polydata)
-        transform_filter.SetTransform(icp)
+        transform_filter.SetTransform(self.icp_transform(source_polydata, target_polydata))
         transform_filter.Update()
 
         aligned_polydata = vtk.vtkPolyData()
         aligned_polydata.DeepCopy(transform_filter.GetOutput())
+        if not self.debug:
+            return aligned_polydata
         output_file_name = f"only_align_{self.file_name}.stl"
 
         append_both = vtk.vtkAppendPolyData() # 將對齊後的模型與缺陷牙合併
@@ -123,8 +235,8 @@ class MeshProcessor:
         self.save_to_stitch_folder(both_file_name, append_both_polydata) # 儲存合併後的模型
         source_file_name = f"./source_{self.file_name}.stl" # 設定對齊後的模型輸出檔案名稱
         self.save_to_stitch_folder(source_file_name, aligned_polydata)
-        return self.save_to_stitch_folder(output_file_name, aligned_polydata)
-            
+        self.save_to_stitch_folder(output_file_name, aligned_polydata)
+        return aligned_polydata
 
 
     def get_hole(self, defect_teeth, repair_teeth):
@@ -163,9 +275,12 @@ class MeshProcessor:
         connectivity_filter.Update()
         main_patch = connectivity_filter.GetOutput()
 
-        output_file = f"hole_{self.file_name}.stl"
-        self.hole_file_path = output_file
-        return self.save_to_stitch_folder(output_file, main_patch)
+        hole_polydata = vtk.vtkPolyData()
+        hole_polydata.ShallowCopy(main_patch)
+        self.hole_polydata = hole_polydata
+        if self.debug:
+            self.hole_file_path = self.save_to_stitch_folder(f"hole_{self.file_name}.stl", hole_polydata)
+        return hole_polydata
 
     def get_merge_source(self):
         repair_file_reader = vtk.vtkSTLReader()
@@ -174,32 +289,48 @@ class MeshProcessor:
         defect_file_reader = self.get_vtk_reader(self.defect_file_path)
         defect_file_reader.SetFileName(self.defect_file_path)
         defect_file_reader.Update()
-        self.repair_file_path = self.align_models_icp(repair_file_reader.GetOutput(), defect_file_reader.GetOutput())
-        align_repair_file_reader = vtk.vtkSTLReader()
-        align_repair_file_reader.SetFileName(self.repair_file_path)
-        align_repair_file_reader.Update()
+        aligned_repair = self.align_models_icp(repair_file_reader.GetOutput(), defect_file_reader.GetOutput())
 
         file_name = f"inlay_surface_{self.file_name}.stl"
         open_path = os.path.join(self.output_folder, file_name)
         open_path = os.path.normpath(open_path)  # 確保路徑格式正確
 
         self.inlay_file_path = open_path
-        self.hole_file_path = self.get_hole(defect_file_reader.GetOutput(), align_repair_file_reader.GetOutput())
-        print(f"已儲存合併源檔案")
+        self.get_hole(defect_file_reader.GetOutput(), aligned_repair)
+        print(f"已取得合併源網格")
 
-    def is_white_surface_facing_down(self, polydata):
-        """檢查平均法向量是否朝下（Z軸負方向）"""
+    def compute_normals(self, polydata):
+        """計算一致的點法向量（不分裂、不自動定向），供方向檢查與合併共用"""
         normals_filter = vtk.vtkPolyDataNormals()
         normals_filter.SetInputData(polydata)
+        normals_filter.SetAutoOrientNormals(False)
+        normals_filter.SetConsistency(True)
+        normals_filter.SplittingOff()
         normals_filter.Update()
+        return normals_filter.GetOutput()
+
+    def flip_normals(self, polydata):
+        """翻轉法向量與多邊形頂點順序（等同 vtkPolyDataNormals 的 FlipNormals，但不重新計算法向量）"""
+        reverse = vtk.vtkReverseSense()
+        reverse.SetInputData(polydata)
+        reverse.ReverseCellsOn()
+        reverse.ReverseNormalsOn()
+        reverse.Update()
+        return reverse.GetOutput()
+
+    def point_normals(self, polydata):
+        """以 NumPy 視圖取得點座標與法向量；網格已有法向量時直接沿用，否則才計算"""
+        if polydata.GetPointData().GetNormals() is None:
+            polydata = self.compute_normals(polydata)
+        points = nps.vtk_to_numpy(polydata.GetPoints().GetData())
+        normals = nps.vtk_to_numpy(polydata.GetPointData().GetNormals())
+        return polydata, points, normals
 
-        poly_with_normals = normals_filter.GetOutput()
-        normals = poly_with_normals.GetPointData().GetNormals()
+    def is_white_surface_facing_down(self, polydata):
+        """檢查平均法向量是否朝下（Z軸負方向）"""
+        _, _, normals = self.point_normals(polydata)
 
-        avg_normal = np.zeros(3)
-        for i in range(normals.GetNumberOfTuples()):
-            avg_normal += np.array(normals.GetTuple(i))
-        avg_normal /= normals.GetNumberOfTuples()
+        avg_normal = normals.mean(axis=0)
 
         direction = avg_normal / np.linalg.norm(avg_normal)
         print("平均法向量方向:", direction)
@@ -207,24 +338,12 @@ class MeshProcessor:
 
     def is_white_surface_facing_inner(self, polydata, threshold=0.6):
         """檢查大多數法向量是否朝內"""
-        normals_filter = vtk.vtkPolyDataNormals()
-        normals_filter.SetInputData(polydata)
-        normals_filter.Update()
-
-        polydata = normals_filter.GetOutput()
+        polydata, points, normals = self.point_normals(polydata)
         center = np.array(polydata.GetCenter())
-        points = polydata.GetPoints()
-        normals = polydata.GetPointData().GetNormals()
-
-        inward_count = 0
-        for i in range(points.GetNumberOfPoints()):
-            pt = np.array(points.GetPoint(i))
-            n = np.array(normals.GetTuple(i))
-            to_center = center - pt
-            if np.dot(n, to_center) > 0:
-                inward_count += 1
-
-        ratio = inward_count / points.GetNumberOfPoints()
+
+        inward_count = np.count_nonzero(np.einsum("ij,ij->i", normals, center - points) > 0)
+
+        ratio = inward_count / len(points)
         print(f"朝內法向比例: {ratio}")
         print(f"閾值: {threshold}")
         print(ratio > threshold)
@@ -232,53 +351,44 @@ class MeshProcessor:
 
     def merge_meshes(self):
         """合併嵌體和缺陷牙凹洞網格，並確保正確的法向量方向"""
-        inlay_reader = vtk.vtkSTLReader()
-        inlay_reader.SetFileName(self.inlay_file_path)
-        inlay_reader.Update()
-
-        hole_reader = vtk.vtkSTLReader()
-        hole_reader.SetFileName(self.hole_file_path)
-        hole_reader.Update()
-
-        inlay_normal = vtk.vtkPolyDataNormals()
-        inlay_normal.SetInputData(inlay_reader.GetOutput())
-        if self.is_white_surface_facing_down(inlay_reader.GetOutput()):
-            inlay_normal.SetAutoOrientNormals(False)
+        # 嵌體由裁切步驟寫出（extract_patch_from_points），hole 則優先使用記憶體中的網格
+        hole = self.hole_polydata if self.hole_polydata is not None else self.hole_file_path
+
+        # 法向量只計算一次，方向檢查與合併共用
+        inlay_polydata = self.compute_normals(self.as_polydata(self.inlay_file_path))
+        if self.is_white_surface_facing_down(inlay_polydata):
             print("嵌體: 不翻轉法向量")
         else:
-            inlay_normal.SetAutoOrientNormals(False)
-            inlay_normal.SetFlipNormals(True)
+            inlay_polydata = self.flip_normals(inlay_polydata)
             print("嵌體: 翻轉法向量")
-        inlay_normal.SetConsistency(True)
-        inlay_normal.SplittingOff()
-        inlay_normal.Update()
-
-        hole_normal = vtk.vtkPolyDataNormals()
-        hole_normal.SetInputData(hole_reader.GetOutput())
-        if self.is_white_surface_facing_inner(hole_reader.GetOutput()):
-            hole_normal.SetAutoOrientNormals(False)
+
+        hole_polydata = self.compute_normals(self.as_polydata(hole))
+        if self.is_white_surface_facing_inner(hole_polydata):
             print("缺陷牙: 不翻轉法向量")
         else:
-            hole_normal.SetAutoOrientNormals(False)
-            hole_normal.SetFlipNormals(True)
+            hole_polydata = self.flip_normals(hole_polydata)
             print("缺陷牙: 翻轉法向量")
-        hole_normal.SetConsistency(True)
-        hole_normal.SplittingOff()
-        hole_normal.Update()
 
         merge_file = vtk.vtkAppendPolyData()
-        merge_file.AddInputData(inlay_normal.GetOutput())
-        merge_file.AddInputData(hole_normal.GetOutput())
+        merge_file.AddInputData(inlay_polydata)
+        merge_file.AddInputData(hole_polydata)
         merge_file.Update()
 
-        output_file = f"merge_{self.file_name}.stl"
-
-        return self.save_to_stitch_folder(output_file, merge_file.GetOutput())
+        merged_polydata = merge_file.GetOutput()
+        self.export(f"merge_{self.file_name}.stl", merged_polydata)
+        return merged_polydata
 
-    def process_merged_mesh(self, merged_file_path, thickness=0):
-        """處理合併後的網格：修復、偏移、拼接和平滑"""
-        mesh = mrmeshpy.loadMesh(merged_file_path)
-        original_file_name = os.path.splitext(os.path.basename(merged_file_path))[0]
+    def process_merged_mesh(self, merged, thickness=0):
+        """
+        處理合併後的網格：修復、偏移、拼接和平滑
+        merged: 合併後的網格（vtkPolyData、mrmeshpy.Mesh）或檔案路徑
+        返回縫合後的 mrmeshpy.Mesh
+        """
+        mesh = self.as_mrmesh(merged)
+        if isinstance(merged, str):
+            original_file_name = os.path.splitext(os.path.basename(merged))[0]
+        else:
+            original_file_name = f"merge_{self.file_name}"
 
         mrmeshpy.uniteCloseVertices(mesh, mesh.computeBoundingBox().diagonal() * 1e-6)
 
@@ -297,11 +407,11 @@ class MeshProcessor:
             mrmeshpy.buildCylinderBetweenTwoHoles(shell, holes[0], holes[1], stitch_params)
 
 
-            stitch_only = mrmeshpy.Mesh()
-            stitch_only.addPartByMask(shell, new_faces)
-            stitch_only_file = os.path.join(self.output_folder, f"stitch_only_{original_file_name}.stl")
-            mrmeshpy.saveMesh(stitch_only, stitch_only_file)
-            print(f"已儲存縫合區域至: {stitch_only_file}")
+            if self.debug:
+                stitch_only = mrmeshpy.Mesh()
+                stitch_only.addPartByMask(shell, new_faces)
+                stitch_only_file = self.export(f"stitch_only_{original_file_name}.stl", stitch_only)
+                print(f"已儲存縫合區域至: {stitch_only_file}")
             subdiv_settings = mrmeshpy.SubdivideSettings()
             subdiv_settings.region = new_faces
             subdiv_settings.maxEdgeSplits = 10000000
@@ -310,15 +420,11 @@ class MeshProcessor:
 
             mrmeshpy.positionVertsSmoothly(shell, mrmeshpy.getInnerVerts(shell.topology, new_faces))
 
-        output_file = os.path.join(self.output_folder, f"stitched_{original_file_name}.stl")
-        if not os.path.exists(self.output_folder):
-            os.makedirs(self.output_folder)
-        mrmeshpy.saveMesh(shell, output_file)
-        print(f"已儲存檔案至: {output_file}")
-        return output_file
+        self.export(f"stitched_{original_file_name}.stl", shell)
+        return shell
     def offset_smooth_subdivision(self, smooth_subdivision_file, offset_distance=0.1):
         """對平滑細分後的模型進行偏移處理"""
-        ms_smooth = mrmeshpy.loadMesh(smooth_subdivision_file)
+        ms_smooth = self.as_mrmesh(smooth_subdivision_file)
 
         params = mrmeshpy.OffsetParameters()
         params.voxelSize = ms_smooth.computeBoundingBox().diagonal() * 0.01
@@ -342,6 +448,52 @@ class MeshProcessor:
         writer.Write()
         print(f"已儲存檔案至: {output_path}")
         return output_path
+
+    def export(self, input_file_name, mesh):
+        """debug 模式下才輸出中間網格（任一種網格型別），否則不寫檔並返回 None"""
+        if not self.debug:
+            return None
+        if isinstance(mesh, mrmeshpy.Mesh):
+            if not os.path.exists(self.output_folder):
+                os.makedirs(self.output_folder)
+            output_path = os.path.normpath(os.path.join(self.output_folder, input_file_name))
+            mrmeshpy.saveMesh(mesh, output_path)
+            print(f"已儲存檔案至: {output_path}")
+            return output_path
+        return self.save_to_stitch_folder(input_file_name, self.as_polydata(mesh))
+
+    def as_polydata(self, mesh):
+        """將檔案路徑、mrmeshpy.Mesh 或 pymeshlab.Mesh 轉為 vtkPolyData（已是 vtkPolyData 時直接返回）"""
+        if isinstance(mesh, vtk.vtkPolyData):
+            return mesh
+        if isinstance(mesh, str):
+            reader = self.get_vtk_reader(mesh)
+            reader.SetFileName(mesh)
+            reader.Update()
+            return reader.GetOutput()
+        if isinstance(mesh, mrmeshpy.Mesh):
+            return meshconvert.mrmesh_to_polydata(mesh)
+        return meshconvert.pymesh_to_polydata(mesh)
+
+    def as_mrmesh(self, mesh):
+        """將檔案路徑或 vtkPolyData 轉為 mrmeshpy.Mesh"""
+        if isinstance(mesh, mrmeshpy.Mesh):
+            return mesh
+        if isinstance(mesh, str):
+            return mrmeshpy.loadMesh(mesh)
+        return meshconvert.polydata_to_mrmesh(self.as_polydata(mesh))
+
+    def as_meshset(self, mesh):
+        """建立只含此網格的 pymeshlab.MeshSet"""
+        ms = pymeshlab.MeshSet()
+        if isinstance(mesh, str):
+            ms.load_new_mesh(mesh)
+        elif isinstance(mesh, mrmeshpy.Mesh):
+            ms.add_mesh(meshconvert.mrmesh_to_pymesh(mesh))
+        else:
+            ms.add_mesh(meshconvert.polydata_to_pymesh(mesh))
+        return ms
+
     def open_file(self, file_name):
         """打開指定的檔案"""
         if not os.path.exists(file_name):
@@ -361,9 +513,8 @@ class MeshProcessor:
         return reader.GetOutput()
 
     def remesh(self, row_final_file):
-        """重網格化處理"""
-        ms = pymeshlab.MeshSet()
-        ms.load_new_mesh(row_final_file)
+        """重網格化處理，返回 vtkPolyData"""
+        ms = self.as_meshset(row_final_file)
 
         ms.apply_filter("meshing_isotropic_explicit_remeshing",
                         iterations=30,
@@ -378,21 +529,14 @@ class MeshProcessor:
                         smoothflag=True,
                         reprojectflag=True)
 
-        output_file = os.path.join(self.output_folder, f"remesh_{self.file_name}.stl")
-        if not os.path.exists(self.output_folder):
-            os.makedirs(self.output_folder)
-        ms.save_current_mesh(output_file)
-        print(f"已儲存檔案至: {output_file}")
-        return output_file
+        remeshed = meshconvert.pymesh_to_polydata(ms.current_mesh())
+        self.export(f"remesh_{self.file_name}.stl", remeshed)
+        return remeshed
 
     def smooth_subdivision(self, remesh_final_file):
-        """平滑和細分處理"""
-        remesh_final_file_reader = vtk.vtkSTLReader()
-        remesh_final_file_reader.SetFileName(remesh_final_file)
-        remesh_final_file_reader.Update()
-
+        """平滑和細分處理，返回 vtkPolyData"""
         smoother = vtk.vtkSmoothPolyDataFilter()
-        smoother.SetInputConnection(remesh_final_file_reader.GetOutputPort())
+        smoother.SetInputData(self.as_polydata(remesh_final_file))
         smoother.SetNumberOfIterations(20)
         smoother.SetRelaxationFactor(0.1)
         smoother.FeatureEdgeSmoothingOff()
@@ -404,44 +548,31 @@ class MeshProcessor:
         subdivision.SetNumberOfSubdivisions(2)
         subdivision.Update()
 
-        output_file = os.path.join(self.output_folder, f"smooth_subdivision_{self.file_name}.stl")
-        if not os.path.exists(self.output_folder):
-            os.makedirs(self.output_folder)
-        return self.save_to_stitch_folder(output_file, subdivision.GetOutput())
+        smoothed = subdivision.GetOutput()
+        self.export(f"smooth_subdivision_{self.file_name}.stl", smoothed)
+        return smoothed
     def combine_defect_and_smooth(self, smooth_subdivision_file):
         """將缺陷牙和平滑細分後的模型合併"""
         defect_reader = self.get_vtk_reader(self.defect_file_path)
         defect_reader.SetFileName(self.defect_file_path)
         defect_reader.Update()
 
-        smooth_reader = vtk.vtkSTLReader()
-        smooth_reader.SetFileName(smooth_subdivision_file)
-        smooth_reader.Update()
-
         append_filter = vtk.vtkAppendPolyData()
         append_filter.AddInputData(defect_reader.GetOutput())
-        append_filter.AddInputData(smooth_reader.GetOutput())
+        append_filter.AddInputData(self.as_polydata(smooth_subdivision_file))
         append_filter.Update()
 
         output_file = os.path.join(self.output_folder, f"final_combined_{self.file_name}.stl")
         return self.save_to_stitch_folder(output_file, append_filter.GetOutput())
     def append_stitch_only(self, stitch_only_file,merge_file):
-        """將縫合區域與合併後的模型進行拼接"""
-        stitch_reader = vtk.vtkSTLReader()
-        stitch_reader.SetFileName(stitch_only_file)
-        stitch_reader.Update()
-
-        merge_reader = vtk.vtkSTLReader()
-        merge_reader.SetFileName(merge_file)
-        merge_reader.Update()
-
+        """將縫合區域與合併後的模型進行拼接（輸入可為網格或檔案路徑），最終結果一定寫檔並返回路徑"""
         #翻轉merge_reader的法向量
-        merge_polydata = merge_reader.GetOutput()
+        merge_polydata = self.as_polydata(merge_file)
         merge_normals = vtk.vtkPolyDataNormals()
         merge_normals.SetInputData(merge_polydata)
 
         append_filter = vtk.vtkAppendPolyData()
-        append_filter.AddInputData(stitch_reader.GetOutput())
+        append_filter.AddInputData(self.as_polydata(stitch_only_file))
         append_filter.AddInputData(merge_normals.GetOutput())
         append_filter.Update()
          
@@ -451,15 +582,20 @@ class MeshProcessor:
     
 
     
-    def process_complete_workflow(self, thickness=0):
-        """執行完整的工作流程"""
+    def process_complete_workflow(self, thickness=0, debug=None):
+        """
+        執行完整的工作流程；各階段在記憶體中傳遞網格，只寫出最終檔案
+        debug: 可選，覆寫建構時的 debug 設定（True 時輸出所有中間檔案）
+        """
+        if debug is not None:
+            self.debug = debug
 
         self.get_merge_source()  
-        merged_file = self.merge_meshes()
-        row_final_file = self.process_merged_mesh(merged_file, thickness)
-        remesh_final_file = self.remesh(row_final_file)
-        smooth_subdivision_file = self.smooth_subdivision(remesh_final_file)
-        final_file = self.append_stitch_only(smooth_subdivision_file, merged_file)
+        merged = self.merge_meshes()
+        stitched = self.process_merged_mesh(merged, thickness)
+        remeshed = self.remesh(stitched)
+        smoothed = self.smooth_subdivision(remeshed)
+        final_file = self.append_stitch_only(smoothed, merged)
 
 
         